@@ -1,8 +1,12 @@
 # pylint: disable=unspecified-encoding
+import hashlib
 import json
+import os
 import random
-from itertools import combinations, islice
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice, product
 from tqdm import tqdm
+from buildCatalog import BuildCatalog, load_index, save_index
 
 leader_teams = {
     "Brock": [["Geodude", 1], ["Onix", 7]],
@@ -85,224 +89,318 @@ with open('UsefulDatasets/red-blue_pokemon_availability.json', 'r') as file:
 with open('UsefulDatasets/gen_1_pokemon_evolutions.json', 'r') as file:
     pokemon_evos = json.load(file)
 
-def find_line_number(pokemon_dict, line_number_dict, species, moves):
-    """
-    Find the line number for a specific pokemon species and moveset.
+def normalize_move(move):
+    # "Leech-Seed" -> "leechseed", the key format of move_data
+    return move.lower().replace('_', '').replace('-', '').replace(' ', '').replace('.', '')
 
-    :param pokemon_dict: Dictionary of pokemons and their movesets.
-    :param line_number_dict: Dictionary of pokemons and the line numbers of their builds.
-    :param species: The pokemon species to search for.
-    :param moves: A set of moves to search for.
-    :return: The line number if found, otherwise None.
-    """
-    species = species.lower()
-    moves = set(m.lower() for m in moves)
-
-    if species in pokemon_dict:
-        for index, move_set in enumerate(pokemon_dict[species]):
-            if moves == move_set:
-                return line_number_dict[species][index]
-    return None
-
-# Function to check if there are two damage-dealing moves of the same type
-def check_moves1(moves_list):
-    damage_dealing_types = {}
-    for move in moves_list:
-        move_formatted = move.lower().replace('_', '').replace('-', '').replace(' ', '').replace('.', '')
-        if move_formatted in move_data and move_data[move_formatted]['Power'] != "\u2014":
-            move_type = move_data[move_formatted]['Type']
-            if move_type in damage_dealing_types:
-                return False
-            damage_dealing_types[move_type] = False
-    # print(moves_list)
-    return True
+# (type, power) of every damaging move, by normalized name. Status moves aren't in here
+damaging_moves = {name: (info['Type'], int(info['Power'])) for name, info in move_data.items() if info['Power'] != "\u2014"}
+move_damage = {} # move name as written in the learnsets -> (type, power) or None
 
-# check if the pokemon has a move with higher damage of the same type
-def check_moves2(available_moves, moves_list):
-    moves_list = [move.lower().replace('_', '').replace('-', '').replace(' ', '').replace('.', '') for move in moves_list]
-    for move1 in moves_list:
-        for move2 in available_moves:
-            move2_formatted = move2.lower().replace('_', '').replace('-', '').replace(' ', '').replace('.', '')
-            if move1 in move_data and move2_formatted in move_data:
-                move1_info = move_data[move1]
-                move2_info = move_data[move2_formatted]
-                if move1_info['Power'] != "\u2014" and move2_info['Power'] != "\u2014":
-                    if int(move1_info['Power']) > int(move2_info['Power']) and move1_info['Type'] == move2_info['Type']: # has an objectively better move available
-                        return False
-    return True
+def damage_info(move):
+    if move not in move_damage:
+        move_damage[move] = damaging_moves.get(normalize_move(move))
+    return move_damage[move]
 
-# check that there is a damage dealing move
-def check_moves3(moves_list):
-    moves_list = [move.lower().replace('_', '').replace('-', '').replace(' ', '').replace('.', '') for move in moves_list]
-    for move in moves_list:
-        if move in move_data:
-            move_info = move_data[move]
-            if move_info['Power'] != "\u2014":
-                    return True
-    return False
+def useful_movesets(available_moves):
+    """
+    Every set of 4 available moves that is worth building, generated directly rather than
+    filtering all combinations. A moveset is useful if it has
+    - at least one damaging move
+    - no two damaging moves of the same type
+    - no damaging move with more power than another available damaging move of its type
+    Moves missing from move_data count as status moves.
+
+    :param available_moves: Sorted list of the moves the pokemon can know.
+    :return: List of movesets, each a set of moves.
+    """
+    weakest = {}
+    for move in available_moves:
+        info = damage_info(move)
+        if info is not None and (info[0] not in weakest or info[1] < weakest[info[0]]):
+            weakest[info[0]] = info[1]
+    damaging_by_type = {}
+    status_moves = []
+    for move in available_moves:
+        info = damage_info(move)
+        if info is None:
+            status_moves.append(move)
+        elif info[1] == weakest[info[0]]:
+            damaging_by_type.setdefault(info[0], []).append(move)
+
+    movesets = []
+    types = sorted(damaging_by_type)
+    for damaging_count in range(1, min(4, len(types)) + 1):
+        if 4 - damaging_count > len(status_moves):
+            continue
+        for chosen_types in combinations(types, damaging_count):
+            for damaging in product(*(damaging_by_type[move_type] for move_type in chosen_types)):
+                for others in combinations(status_moves, 4 - damaging_count):
+                    movesets.append(set(damaging + others))
+    return movesets
+
+def add_build(species, moveset):
+    # Add a moveset to all_builds unless the species already has it
+    key = frozenset(moveset)
+    if species not in build_keys: build_keys[species] = set()
+    if species not in all_builds.keys(): all_builds[species] = []
+    if key not in build_keys[species]:
+        build_keys[species].add(key)
+        all_builds[species].append(moveset)
+
+def is_available(species, gym_number):
+    # Need to check if the species has an evolution that's available at this gym
+    return (pokemon_availability[species] <= gym_number) and (gym_number != 0) and (pokemon_availability[species] != 0) \
+        and ([pokemon_availability[mon] for mon in pokemon_evos[species] if pokemon_availability[mon] <= gym_number and pokemon_availability[mon] != 0] == [])
 
 # Function to get combinations
 def get_move_combinations(pokemon_list, level_cap, gym_number):
+    """
+    Movesets of every species available against a leader, without touching all_builds.
+
+    :return: Dictionary of species to a list of its useful movesets and the moveset to
+        fall back on if the species has no builds at all.
+    """
     result = {}
-    for species, pokemonMoves in tqdm(pokemon_list.items()):
-        # Need to check if the species has an evolution that's available at this gym
-        if (pokemon_availability[species] <= gym_number) and (gym_number != 0) and (pokemon_availability[species] != 0) \
-        and ([pokemon_availability[mon] for mon in pokemon_evos[species] if pokemon_availability[mon] <= gym_number and pokemon_availability[mon] != 0] == []):
+    for species, pokemonMoves in pokemon_list.items():
+        if is_available(species, gym_number):
             level_up_moves = [i[0] for i in [move for move in pokemonMoves['learned_moves'] if move[1] <= level_cap]]
             TMHM_moves = [i for i in [move for move in pokemonMoves['tm_moves'] if tm_availability[move] <= gym_number and tm_availability[move] != 0]]
-            available_moves = set(level_up_moves + TMHM_moves)
+            available_moves = sorted(set(level_up_moves + TMHM_moves))
+
+            # only pokemon with more than four moves have a choice of moveset
+            useful = []
             if len(available_moves) > 4:
-                combinations_list = list(set(i) for i in combinations(available_moves, 4))
-            else:
-                combinations_list = [set(available_moves)]
-
-            result[species] = []
-            if species not in all_builds.keys(): all_builds[species] = []
-            if species in all_builds.keys():
-                for moveset in combinations_list:
-                    # remove useless movesets (e.g. ones that have two damaging moves of the same type and mon has more than six moves total)
-                    # don't include moveset if for some move in the moveset, the pokemon has a move with a higher damage of the same type and it isn't a multi turn move
-                    # Add the new set only if it's not already present
-                    if len(combinations_list) > 4 and check_moves1(moveset) \
-                    and check_moves2(available_moves, moveset) \
-                    and check_moves3(moveset):
-                        if moveset not in all_builds[species]:
-                            all_builds[species].append(moveset)
-                        result[species].append(moveset)
-                    elif all_builds[species] == []:
-                        all_builds[species] = [moveset]
-                        result[species].append(moveset)
+                key = frozenset(available_moves)
+                if key not in moveset_cache:
+                    moveset_cache[key] = useful_movesets(available_moves)
+                useful = moveset_cache[key]
+            result[species] = (useful, set(available_moves[:4]))
         if species == 'blastoise':
             break
     return result
 
+def add_leader_builds(movesets):
+    # Add a leader's movesets from get_move_combinations to all_builds, returning the ones the leader's matchups use
+    result = {}
+    for species, (useful, fallback) in movesets.items():
+        result[species] = []
+        if species not in all_builds.keys(): all_builds[species] = []
+        for moveset in useful:
+            add_build(species, moveset)
+            result[species].append(moveset)
+        if all_builds[species] == []:
+            # no useful moveset and no build yet, use the first one so the species still gets a build
+            add_build(species, fallback)
+            result[species].append(fallback)
+    return result
+
+def ideal_builds_file(trainer):
+    return "UsefulDatasets/gen_1_ideal_builds/ideal_builds_" + trainer.lower() + ".json"
+
 def read_ideal_builds(trainer, gym_number):
-    filename = "UsefulDatasets/gen_1_ideal_builds/ideal_builds_" + trainer.lower() + ".json"
+    filename = ideal_builds_file(trainer)
     try:
         with open(filename, 'r') as file:
             data = json.load(file)
         filtered_data = {key: [set([i.lower() for i in value])] for key, value in data.items() if value and value != 0} # remove empty movesets
-
-        for species, value in filtered_data.items():
-            moveset = value[0]
-            if (pokemon_availability[species] <= gym_number) and (gym_number != 0) and (pokemon_availability[species] != 0) \
-                and ([pokemon_availability[mon] for mon in pokemon_evos[species] if pokemon_availability[mon] <= gym_number and pokemon_availability[mon] != 0] == []):
-                    if species not in all_builds.keys(): all_builds[species] = []
-                    if moveset not in all_builds[species]:
-                        all_builds[species].append(moveset)
-                    elif all_builds[species] == []:
-                        all_builds[species] = [moveset]
-            else: filtered_data = {k: v for k, v in filtered_data.items() if k != species}
-        return(filtered_data)
+        return {species: value for species, value in filtered_data.items() if is_available(species, gym_number)}
     except:
         print("Couldn't find ideal builds for", trainer)
         return({})
 
-# Get the combinations
-combinations_results = {}
-ideal_builds = {}
-all_builds = {} # collect builds to place in file
-print("Getting pokemon movesets")
-for trainer in leader_teams.keys():
-    print(trainer)
-    team = leader_teams[trainer]
-    level_cap = leader_level_caps[trainer]
-    gym_number = leader_gym_numbers[trainer]
-    # Get the combinations
-    combinations_results[trainer] = get_move_combinations(pokemon_data, level_cap, gym_number)
-    ideal_builds[trainer] = read_ideal_builds(trainer, gym_number)
+# =============================================================================
+# Each leader's movesets only depend on its level cap, gym number, ideal builds
+# and the datasets, so they are generated in a process pool and cached in
+# BuildCache/ under a hash of those inputs. Only leaders whose inputs changed
+# are generated again, and the output files are only written if they changed.
+# =============================================================================
+
+CACHE_DIR = "BuildCache"
+GENERATOR_VERSION = 1 # bump when the moveset rules change, so cached leaders are generated again
+SHUFFLE_SEED = 0 # the matchups are shuffled the same way every run, so unchanged inputs give unchanged files
+DATASET_FILES = ['UsefulDatasets/gen_1_moves.json', 'UsefulDatasets/gen_1_pokemon_learnsets.json', 'UsefulDatasets/red-blue_tm_availability.json',
+                 'UsefulDatasets/red-blue_pokemon_availability.json', 'UsefulDatasets/gen_1_pokemon_evolutions.json']
+
+def file_hash(filename):
+    # sha1 of a file's contents, or of nothing if it doesn't exist
+    digest = hashlib.sha1()
+    if os.path.exists(filename):
+        with open(filename, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def leader_input_hash(trainer, datasets_hash):
+    inputs = [GENERATOR_VERSION, datasets_hash, leader_level_caps[trainer], leader_gym_numbers[trainer], file_hash(ideal_builds_file(trainer))]
+    return hashlib.sha1(json.dumps(inputs).encode()).hexdigest()
+
+def cache_file(trainer):
+    return os.path.join(CACHE_DIR, trainer + ".json")
+
+def generate_leader(trainer):
+    # Movesets and ideal builds of one leader, in the JSON form they are cached in
+    movesets = get_move_combinations(pokemon_data, leader_level_caps[trainer], leader_gym_numbers[trainer])
+    ideal = read_ideal_builds(trainer, leader_gym_numbers[trainer])
+    return {
+        "movesets": {species: [[sorted(moveset) for moveset in useful], sorted(fallback)] for species, (useful, fallback) in movesets.items()},
+        "ideal": {species: [sorted(moveset) for moveset in value] for species, value in ideal.items()},
+    }
+
+def load_leader(trainer, input_hash):
+    # Cached output of a leader, or None if its inputs changed since
+    try:
+        with open(cache_file(trainer), 'r') as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return cached if cached.get("hash") == input_hash else None
+
+def save_leader(trainer, input_hash, generated):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_file(trainer), 'w') as file:
+        json.dump({"hash": input_hash, **generated}, file)
+
+def generate_leaders(trainers):
+    """
+    Movesets and ideal builds of every leader, from the cache where the leader's inputs haven't changed.
 
-for species in all_builds.keys():
-    print(species, len(all_builds[species]))
+    :return: Dictionary of leader to (movesets as from get_move_combinations, ideal builds as from read_ideal_builds).
+    """
+    datasets_hash = hashlib.sha1("".join(file_hash(filename) for filename in DATASET_FILES).encode()).hexdigest()
+    input_hashes = {trainer: leader_input_hash(trainer, datasets_hash) for trainer in trainers}
+    generated = {trainer: load_leader(trainer, input_hashes[trainer]) for trainer in trainers}
+    stale = [trainer for trainer in trainers if generated[trainer] is None]
+    print(f"Generating movesets for {len(stale)} leaders, {len(trainers) - len(stale)} cached")
+    if len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(stale), os.cpu_count() or 1)) as executor:
+            for trainer, result in zip(stale, executor.map(generate_leader, stale)):
+                generated[trainer] = result
+    elif stale:
+        generated[stale[0]] = generate_leader(stale[0])
+    for trainer in stale:
+        save_leader(trainer, input_hashes[trainer], generated[trainer])
+    return {trainer: ({species: ([set(moveset) for moveset in useful], set(fallback)) for species, (useful, fallback) in generated[trainer]["movesets"].items()},
+                      {species: [set(moveset) for moveset in value] for species, value in generated[trainer]["ideal"].items()})
+            for trainer in trainers}
+
+def write_if_changed(filename, text):
+    # Write text to a file unless it already holds exactly that, returns whether it was written
+    if os.path.exists(filename):
+        with open(filename, 'r') as file:
+            if file.read() == text:
+                return False
+    with open(filename, 'w') as file:
+        file.write(text)
+    return True
 
-# create pokemon builds file PokemonBuilds
-line_number_dict = {}
-line_counter = 1
-with open('Inputs/PokemonBuilds.txt', 'w') as file:
+all_builds = {} # collect builds to place in file
+build_keys = {} # species -> frozensets of the movesets in all_builds, to skip duplicates
+moveset_cache = {} # frozenset of available moves -> useful movesets, leaders often allow the same moves
+
+if __name__ == "__main__":
+    # Get the combinations
+    combinations_results = {}
+    ideal_builds = {}
+    print("Getting pokemon movesets")
+    leader_builds = generate_leaders(list(leader_teams.keys()))
+    # builds are added leader by leader in order, so the fallback builds and line numbers don't depend on which leaders were cached
+    for trainer in leader_teams.keys():
+        movesets, ideal = leader_builds[trainer]
+        combinations_results[trainer] = add_leader_builds(movesets)
+        for species, value in ideal.items():
+            add_build(species, value[0])
+        ideal_builds[trainer] = ideal
+
+    for species in all_builds.keys():
+        print(species, len(all_builds[species]))
+
+    # create pokemon builds file PokemonBuilds
+    # teams refer to builds by their id in the catalog, so adding or editing a build doesn't move the others
+    catalog = BuildCatalog()
+    line_counter = 1
+    builds_text = []
     for pokemon, builds in all_builds.items():
-        line_number_dict[pokemon] = []
         for build in builds:
-            line_number_dict[pokemon].append(line_counter)
-            file.write(f"|{pokemon.capitalize()}\n")
-            line_counter += 1
-            file.write("Level: 50\n")
-            line_counter += 1
-            for move in build:
-                file.write(f"- {move.capitalize()}\n")
-                line_counter += 1
-
-# Create teams list file PokemonVsLeaderTeams.json
-trainer_teams = {}
-trainer_teams_lookup = {}
-print("Creating team file")
-for leader, team in tqdm(leader_teams.items()):
-    trainer_teams[leader] = team
-    trainer_teams_lookup[leader] = [leader]
-    for i, pokemon in enumerate(team, start=1):
-        new_leader = f"{leader}_{i}_({pokemon[0]})"
-        trainer_teams[new_leader] = [pokemon]
-        trainer_teams_lookup[leader] += [new_leader]
-pokemon_teams = {}
-for species, builds in tqdm(all_builds.items()):
-    for i, build in enumerate(builds, start=1):
-        line_number = find_line_number(all_builds, line_number_dict, species, build)
-        key = f"{species.capitalize()}-{i}"
-        pokemon_teams[key] = [[species.lower(), line_number]]
-new_teams = {**trainer_teams, **pokemon_teams}
-with open('Inputs/PokemonVsLeaderTeams.json', 'w') as file:
-    file.write("{\n")
+            lines = [f"{pokemon.capitalize()}\n", "Level: 50\n"] + [f"- {move.capitalize()}\n" for move in sorted(build)]
+            catalog.add(pokemon.capitalize(), lines, line_counter)
+            builds_text.append("|" + "".join(lines))
+            line_counter += len(lines)
+    written = [write_if_changed('Inputs/PokemonBuilds.txt', "".join(builds_text))]
+    if written[0] or load_index('Inputs/PokemonBuilds.txt') is None:
+        save_index(catalog, 'Inputs/PokemonBuilds.txt')
+
+    # Create teams list file PokemonVsLeaderTeams.json
+    trainer_teams = {}
+    trainer_teams_lookup = {}
+    print("Creating team file")
+    for leader, team in tqdm(leader_teams.items()):
+        trainer_teams[leader] = team
+        trainer_teams_lookup[leader] = [leader]
+        for i, pokemon in enumerate(team, start=1):
+            new_leader = f"{leader}_{i}_({pokemon[0]})"
+            trainer_teams[new_leader] = [pokemon]
+            trainer_teams_lookup[leader] += [new_leader]
+    pokemon_teams = {}
+    for species, builds in tqdm(all_builds.items()):
+        for i, build in enumerate(builds, start=1):
+            key = f"{species.capitalize()}-{i}"
+            pokemon_teams[key] = [[species.lower(), catalog.find(species, build)]]
+    new_teams = {**trainer_teams, **pokemon_teams}
+    teams_text = ["{\n"]
     last_key = list(new_teams.keys())[-1]  # Get the last key for formatting
     for leader, team in tqdm(new_teams.items()):
         # Convert team list to JSON string
         team_str = json.dumps(team).replace("], ", "],")
         if leader == last_key:
-            file.write(f'    "{leader}": {team_str}\n')  # No comma for last item
+            teams_text.append(f'    "{leader}": {team_str}\n')  # No comma for last item
         else:
-            file.write(f'    "{leader}": {team_str},\n')
-    file.write("}")
-
- # How many times to run each battle
-RUN_N_TIMES = 1
-
-# make matchups
-finalMatchups = []
-IdealMatchups = []
-for trainer in leader_teams.keys():
-    print(trainer)
-    trainersTeamsCurrentTrainer = trainer_teams_lookup[trainer] # list containing full team, and a team for each individual pokemon
-    trainersTeamsCurrentTrainer = trainersTeamsCurrentTrainer[1:] + trainersTeamsCurrentTrainer[:1]
-    MonTeams = combinations_results[trainer]
-    # need to figure out line numbers for each pokemon build in MonTeams and make a team for it
-    print("Building Final Matchups")
-    for species, pokemonBuildSet in tqdm(MonTeams.items()):
-        for build in pokemonBuildSet:
-            line_number = find_line_number(all_builds, line_number_dict, species, build)
-            if line_number == None: print("Can't find line number for useful build:", species, build)
-            MonTeam = [species, line_number]
-            temp_matchups = []
-            for trainerTeam in trainersTeamsCurrentTrainer:
-                for _ in range(RUN_N_TIMES):
-                    temp_matchups.append([new_teams[trainerTeam], MonTeam])
-            finalMatchups.append(temp_matchups)
-
-    print("Building Ideal Matchups")
-    MonTeams = ideal_builds[trainer]
-    # need to figure out line numbers for each pokemon build in MonTeams and make a team for it
-    for species, pokemonBuildSet in tqdm(MonTeams.items()):
-        for build in pokemonBuildSet:
-            line_number = find_line_number(all_builds, line_number_dict, species, build)
-            if line_number == None: print("Can't find line number for ideal build:", species, build)
-            MonTeam = [species, line_number]
-            temp_matchups = []
-            for trainerTeam in trainersTeamsCurrentTrainer:
-                for _ in range(RUN_N_TIMES):
-                    temp_matchups.append([new_teams[trainerTeam], MonTeam])
-            IdealMatchups.append(temp_matchups)
-
-# Write the matchups to the output JSON file
-random.shuffle(finalMatchups)
-Output = IdealMatchups + finalMatchups
-print(len(Output))
-
-with open('Inputs/tournament_battles.json', 'w') as file:
-    json.dump(Output, file, indent=2)
+            teams_text.append(f'    "{leader}": {team_str},\n')
+    teams_text.append("}")
+    written.append(write_if_changed('Inputs/PokemonVsLeaderTeams.json', "".join(teams_text)))
+
+     # How many times to run each battle
+    RUN_N_TIMES = 1
+
+    # make matchups
+    finalMatchups = []
+    IdealMatchups = []
+    for trainer in leader_teams.keys():
+        print(trainer)
+        trainersTeamsCurrentTrainer = trainer_teams_lookup[trainer] # list containing full team, and a team for each individual pokemon
+        trainersTeamsCurrentTrainer = trainersTeamsCurrentTrainer[1:] + trainersTeamsCurrentTrainer[:1]
+        MonTeams = combinations_results[trainer]
+        # need to figure out line numbers for each pokemon build in MonTeams and make a team for it
+        print("Building Final Matchups")
+        for species, pokemonBuildSet in tqdm(MonTeams.items()):
+            for build in pokemonBuildSet:
+                build_id = catalog.find(species, build)
+                if build_id == None: print("Can't find build id for useful build:", species, build)
+                MonTeam = [species, build_id]
+                temp_matchups = []
+                for trainerTeam in trainersTeamsCurrentTrainer:
+                    for _ in range(RUN_N_TIMES):
+                        temp_matchups.append([new_teams[trainerTeam], MonTeam])
+                finalMatchups.append(temp_matchups)
+
+        print("Building Ideal Matchups")
+        MonTeams = ideal_builds[trainer]
+        # need to figure out line numbers for each pokemon build in MonTeams and make a team for it
+        for species, pokemonBuildSet in tqdm(MonTeams.items()):
+            for build in pokemonBuildSet:
+                build_id = catalog.find(species, build)
+                if build_id == None: print("Can't find build id for ideal build:", species, build)
+                MonTeam = [species, build_id]
+                temp_matchups = []
+                for trainerTeam in trainersTeamsCurrentTrainer:
+                    for _ in range(RUN_N_TIMES):
+                        temp_matchups.append([new_teams[trainerTeam], MonTeam])
+                IdealMatchups.append(temp_matchups)
+
+    # Write the matchups to the output JSON file
+    random.Random(SHUFFLE_SEED).shuffle(finalMatchups)
+    Output = IdealMatchups + finalMatchups
+    print(len(Output))
+
+    written.append(write_if_changed('Inputs/tournament_battles.json', json.dumps(Output, indent=2)))
+    if not any(written):
+        print("Inputs are unchanged")
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from outputParser import BATTLE_END, BATTLE_START, CHUNK_SIZE, MARKER_LENGTH, TIE_LINE, battle_header, battle_outcome, decode_header
+
+# =============================================================================
+# Scans an output file once and writes a copy without the battles that hit
+# an error, a list of those matchups to rerun in the tournament_battles.json
+# format, and an index of every error with its category. Replaces running
+# findErrors.py, get_battles_to_rerun.py and removeErrors.py in turn.
+#
+# runSimulations.py writes every simulation followed by a ]]]]] line, so the
+# output is read as records ending in that line. A record is kept if it holds
+# a complete battle ([[[[[, an "A vs B" header and a result) and no error lines.
+# =============================================================================
+
+ERROR_LINE = re.compile(rb"^(?:(?P<type_error>TypeError)|(?P<js_error>\w*Error\b)|(?P<node_warning>\(node:)"
+                        rb"|(?P<node_internal>node:internal)|(?P<node_crash>Node\.js v)|(?P<runtime>runtime))", re.MULTILINE)
+# only records containing one of these can match ERROR_LINE, checking for them first skips the regex for clean battles
+ERROR_HINTS = (b"Error", b"node:", b"Node.js", b"runtime")
+
+def error_categories(data, start, end):
+    # Categories of the error lines in data[start:end] and the first error line
+    if not any(data.find(hint, start, end) >= 0 for hint in ERROR_HINTS):
+        return [], None
+    categories = []
+    first_line = None
+    for match in ERROR_LINE.finditer(data, start, end):
+        if match.lastgroup not in categories:
+            categories.append(match.lastgroup)
+        if first_line is None:
+            line_end = data.find(b"\n", match.start(), end)
+            first_line = data[match.start():end if line_end < 0 else line_end].rstrip(b"\r").decode("utf-8", errors="replace")
+    return categories, first_line
+
+def check_record(data, start, end):
+    """
+    Problems with the record in data[start:end].
+
+    :return: Tuple of a list of error categories (empty if the battle is fine), the
+        (bot 1, bot 2) matchup or None if it has no header, and the first error line.
+    """
+    categories, message = error_categories(data, start, end)
+    marker = data.rfind(BATTLE_END, start, end)
+    battle_end = end if marker < 0 else marker
+    battle_start = data.rfind(BATTLE_START, start, battle_end)
+    if battle_start < 0:
+        # a crash before the battle started prints no [[[[[ line
+        categories.append("missing_start")
+        battle_start = start
+    else:
+        battle_start += MARKER_LENGTH
+    header = battle_header(data, battle_start, battle_end)
+    matchup = decode_header(header) if header is not None and b"|" not in header else None
+    if matchup is None:
+        categories.append("missing_header")
+    elif not categories and battle_outcome(data, battle_start, battle_end) is None and not TIE_LINE.search(data, battle_start, battle_end):
+        categories.append("no_result")
+    return categories, matchup, message
+
+def for_each_record(file_path, handle_record, chunk_size=CHUNK_SIZE):
+    """
+    Call handle_record(data, start, end, offset) for every record of an output file.
+
+    A record runs from the end of the previous one up to and including the next
+    ]]]]] line, offset is its position in the file. Anything after the last ]]]]]
+    line is passed on as a final record too.
+    """
+    with open(file_path, "rb") as f:
+        carry = b""
+        offset = 0  # file offset of carry[0]
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data = carry + chunk
+            position = 0
+            while True:
+                marker = data.find(BATTLE_END, position)
+                if marker < 0:
+                    break
+                line_end = data.find(b"\n", marker)
+                if line_end < 0:
+                    break
+                handle_record(data, position, line_end + 1, offset + position)
+                position = line_end + 1
+            carry = data[position:]
+            offset += position
+        if carry:
+            handle_record(carry, 0, len(carry), offset)
+
+def scan_errors(file_path, clean_path=None, rerun_path=None, index_path=None, chunk_size=CHUNK_SIZE):
+    """
+    Scan an output file for battles with errors in one pass.
+
+    :param clean_path: Write the output without the records that have errors here.
+    :param rerun_path: Write the [leader 1, leader 2] pairs of those records here,
+        in the same format as Inputs/tournament_battles.json.
+    :param index_path: Write one JSON line per bad record here, with its byte offset,
+        length, line number, categories, matchup and first error line.
+    :return: Dict of summary counts, by category and in total.
+    """
+    clean = open(clean_path, "wb") if clean_path else None
+    index = open(index_path, "w", encoding="utf-8") if index_path else None
+    reruns = []
+    summary = {"records": 0, "clean": 0, "errors": 0, "unknown_matchups": 0, "categories": {}}
+    line_number = [1]
+
+    def handle_record(data, start, end, offset):
+        line = line_number[0]
+        line_number[0] += data.count(b"\n", start, end)
+        if data.find(BATTLE_END, start, end) < 0 and not data[start:end].strip():
+            return  # blank lines after the last record
+        summary["records"] += 1
+        categories, matchup, message = check_record(data, start, end)
+        if not categories:
+            summary["clean"] += 1
+            if clean is not None:
+                clean.write(data[start:end])
+            return
+        if data.find(BATTLE_END, start, end) < 0:
+            categories.append("unterminated")
+        summary["errors"] += 1
+        for category in categories:
+            summary["categories"][category] = summary["categories"].get(category, 0) + 1
+        if matchup is None:
+            summary["unknown_matchups"] += 1
+        else:
+            reruns.append(list(matchup))
+        if index is not None:
+            index.write(json.dumps({"offset": offset, "length": end - start, "line": line, "categories": categories,
+                                    "matchup": list(matchup) if matchup else None, "message": message}) + "\n")
+
+    try:
+        for_each_record(file_path, handle_record, chunk_size)
+    finally:
+        if clean is not None:
+            clean.close()
+        if index is not None:
+            index.close()
+    if rerun_path is not None:
+        with open(rerun_path, "w", encoding="utf-8") as outfile:
+            json.dump(reruns, outfile, indent=2)
+    return summary
+
+def remove_intervals(file_path, output_path, intervals, chunk_size=CHUNK_SIZE):
+    """
+    Copy a file without the given byte ranges, e.g. the records of an edited error index.
+
+    The (offset, length) intervals are sorted once and then swept in step with the
+    copy, instead of searching the interval list for every line.
+    """
+    intervals = sorted(intervals)
+    with open(file_path, "rb") as source, open(output_path, "wb") as output:
+        position = 0
+        for offset, length in intervals + [(os.path.getsize(file_path), 0)]:
+            source.seek(position)
+            remaining = offset - position
+            while remaining > 0:
+                chunk = source.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                output.write(chunk)
+                remaining -= len(chunk)
+            position = max(position, offset + length)
+
+def load_index(index_path):
+    with open(index_path, "r", encoding="utf-8") as infile:
+        return [json.loads(line) for line in infile if line.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find battles with errors, write a clean output and a list of battles to rerun.")
+    parser.add_argument("output", nargs="?", default="output.txt")
+    parser.add_argument("--clean", default="output_clean.txt", help="output without the battles that have errors")
+    parser.add_argument("--rerun", default="rerun_battles.json", help="matchups to rerun, in the tournament_battles.json format")
+    parser.add_argument("--index", default="error_index.jsonl", help="one line per error with its offset, categories and message")
+    parser.add_argument("--apply-index", action="store_true",
+                        help="don't scan, remove the records listed in --index from the output and write the result to --clean")
+    args = parser.parse_args()
+
+    if args.apply_index:
+        entries = load_index(args.index)
+        remove_intervals(args.output, args.clean, [(entry["offset"], entry["length"]) for entry in entries])
+        print(f"Removed {len(entries)} records, written to {args.clean}")
+    else:
+        summary = scan_errors(args.output, args.clean, args.rerun, args.index)
+        print(f"{summary['errors']} of {summary['records']} records have errors, {summary['unknown_matchups']} without a known matchup")
+        for category, count in sorted(summary["categories"].items(), key=lambda item: item[1], reverse=True):
+            print(f"  {category}: {count}")
+        print(f"Clean output written to {args.clean}, battles to rerun to {args.rerun}, error index to {args.index}")
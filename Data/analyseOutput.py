@@ -0,0 +1,109 @@
+import argparse
+
+from battleMatrix import BattleMatrix
+from outputParser import (load_aggregate, merge_aggregates, parse_aggregate_parallel, save_aggregate,
+                          scan_aggregate_incremental, worker_output_files)
+from ratings import load_ratings, rate, save_ratings
+from reports import print_battle_matrix, plot_battle_matrix, save_matrix_to_csv, save_to_csv, save_to_json
+from resultSnapshots import is_snapshot, load_snapshot
+
+# =============================================================================
+# Single entry point for every report. The output is parsed once (or a saved
+# aggregate/matrix is loaded) and each requested report is made from the same
+# BattleMatrix, so asking for more reports never costs another parse.
+# =============================================================================
+
+def load_matrix(file_paths=("output.txt",), cached=None, incremental=False, shard_count=None, save_aggregate_path=None):
+    """
+    Parse output files, or load cached results, into a BattleMatrix.
+
+    :param file_paths: Output files to parse, e.g. output.txt or the files in WorkerOutputs/.
+    :param cached: A saved aggregate (.json), BattleMatrix (.npz) or snapshot (see resultSnapshots.py) to load instead of parsing.
+    :param incremental: Only parse what was appended since the last incremental parse.
+    :param shard_count: Processes to parse with, defaults to the number of CPUs. Not used when incremental.
+    :param save_aggregate_path: Also save the parsed aggregate here, to merge or reload later. A saved matrix has no
+        aggregate, so this can't be used with one as cached.
+    """
+    if cached is not None and cached.endswith(".npz") and is_snapshot(cached):
+        aggregate = load_snapshot(cached)["aggregate"]
+    elif cached is not None and cached.endswith(".npz"):
+        if save_aggregate_path is not None:
+            raise ValueError(f"{cached} is a saved matrix, it has no aggregate to save")
+        return BattleMatrix.load(cached)
+    elif cached is not None:
+        aggregate = load_aggregate(cached)
+    elif incremental:
+        aggregate = merge_aggregates(*[scan_aggregate_incremental(file_path) for file_path in file_paths])
+    else:
+        aggregate = parse_aggregate_parallel(list(file_paths), shard_count)
+    if save_aggregate_path is not None:
+        save_aggregate(aggregate, save_aggregate_path)
+    return BattleMatrix.from_aggregate(aggregate)
+
+def print_trainer_stats(trainer_stats):
+    for trainer, record in trainer_stats:
+        print(f"{trainer}: {record['wins']} Wins, {record['losses']} Losses, {record['ties']} Ties, Win/Loss Ratio: {record['win_loss_ratio']:.2f}")
+
+def analyse_output(file_paths=("output.txt",), cached=None, incremental=False, shard_count=None, save_aggregate_path=None,
+                   stats=True, matrix=False, plot_path=None, stats_csv_path=None, matrix_csv_path=None,
+                   json_path=None, npz_path=None, cell_size=48, tile_size=None, ratings_path=None, resamples=1000):
+    """
+    Parse once and write every requested report. Reports with a path of None are skipped.
+
+    :param stats: Print each trainer's overall record.
+    :param matrix: Print the battle matrix.
+    :param ratings_path: Fit Bradley-Terry ratings, save them here and add them to the
+        stats CSV and plot. Ratings already saved here are used as the starting point.
+    :param resamples: Bootstrap resamples for the rating confidence intervals.
+    :return: The BattleMatrix the reports were made from.
+    """
+    battle_matrix = load_matrix(file_paths, cached, incremental, shard_count, save_aggregate_path)
+    trainer_stats = battle_matrix.trainer_stats()
+    ratings = None
+    if ratings_path is not None:
+        ratings = rate(battle_matrix, resamples, previous=load_ratings(ratings_path))
+        save_ratings(ratings, ratings_path)
+    if stats:
+        print_trainer_stats(trainer_stats)
+    if matrix:
+        print_battle_matrix(battle_matrix)
+    if plot_path is not None:
+        plot_battle_matrix(battle_matrix, plot_path, cell_size, tile_size, ratings)
+    if stats_csv_path is not None:
+        save_to_csv(trainer_stats, stats_csv_path, ratings)
+    if matrix_csv_path is not None:
+        save_matrix_to_csv(battle_matrix, matrix_csv_path)
+    if json_path is not None:
+        save_to_json(battle_matrix, json_path)
+    if npz_path is not None:
+        battle_matrix.save(npz_path)
+    return battle_matrix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse battle outputs once and write any combination of reports.")
+    parser.add_argument("files", nargs="*", default=None, help="output files to parse, defaults to output.txt")
+    parser.add_argument("--worker-outputs", action="store_true", help="parse the per-worker files in WorkerOutputs/")
+    parser.add_argument("--cached", default=None, help="load a saved aggregate (.json), matrix or snapshot (.npz) instead of parsing")
+    parser.add_argument("--incremental", action="store_true", help="only parse battles added since the last incremental run")
+    parser.add_argument("--shards", type=int, default=None, help="number of processes to parse with, defaults to all CPUs")
+    parser.add_argument("--save-aggregate", default=None, help="save the parsed aggregate to this file")
+    parser.add_argument("--no-stats", action="store_true", help="don't print each trainer's overall record")
+    parser.add_argument("--matrix", action="store_true", help="print the battle matrix")
+    parser.add_argument("--plot", nargs="?", const="battle_matrix_plot.png", default=None)
+    parser.add_argument("--stats-csv", nargs="?", const="trainer_stats.csv", default=None)
+    parser.add_argument("--matrix-csv", nargs="?", const="battle_matrix.csv", default=None)
+    parser.add_argument("--json", nargs="?", const="battle_results.json", default=None)
+    parser.add_argument("--npz", nargs="?", const="battle_matrix.npz", default=None)
+    parser.add_argument("--ratings", nargs="?", const="ratings.csv", default=None,
+                        help="fit Bradley-Terry ratings, also used to order the plot and added to the stats csv")
+    parser.add_argument("--resamples", type=int, default=1000, help="bootstrap resamples for the rating confidence intervals")
+    parser.add_argument("--cell-size", type=int, default=48, help="plot cell size in pixels")
+    parser.add_argument("--tile-size", type=int, default=None, help="split the plot into tiles of this many trainers")
+    args = parser.parse_args()
+
+    file_paths = args.files or ["output.txt"]
+    if args.worker_outputs:
+        file_paths = worker_output_files("WorkerOutputs")
+    analyse_output(file_paths, args.cached, args.incremental, args.shards, args.save_aggregate,
+                   not args.no_stats, args.matrix, args.plot, args.stats_csv, args.matrix_csv,
+                   args.json, args.npz, args.cell_size, args.tile_size, args.ratings, args.resamples)
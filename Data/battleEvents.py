@@ -0,0 +1,290 @@
+import argparse
+import csv
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from buildFiles import load_builds
+from outputParser import BOT_1_WIN, BOT_2_WIN, battle_header, battle_result, decode_header, for_each_battle, shard_boundaries
+
+# =============================================================================
+# Per pokemon stats from the battle logs. A tokenizer turns the |-prefixed
+# showdown protocol lines of each battle into typed events, which are credited
+# to builds by their (species, local_id) key, using the teams each trainer
+# brought. The stats are collected into flat event buffers and added into one
+# array per flush, so a whole tournament streams through in bounded memory.
+# =============================================================================
+
+# Event kinds, every event is a tuple of (kind, side, name, value, detail)
+SWITCH = 0   # value: species, detail: hp fraction
+MOVE = 1     # value: move name
+DAMAGE = 2   # value: hp fraction left, detail: True if indirect ([from] poison, recoil, weather etc)
+HEAL = 3     # value: hp fraction left
+FAINT = 4
+TURN = 5     # value: turn number
+WIN = 6      # value: winner name
+TIE = 7
+
+STATS = ["battles", "wins", "leads", "lead_wins", "switch_ins", "turns_on_field", "moves_used", "damage_dealt", "kos", "fainted"]
+STAT_INDEX = {stat: i for i, stat in enumerate(STATS)}
+UNKNOWN_BUILD = -1  # local_id for pokemon that aren't on their trainer's team in the teams file
+FLUSH_SIZE = 1 << 16
+
+def pokemon_ref(ident):
+    # "p1a: Onix" -> ("p1", "Onix")
+    side, _, name = ident.partition(": ")
+    return side[:2], name
+
+def hp_fraction(status):
+    # "45/100", "145/230 par" or "0 fnt" -> fraction of max hp left
+    hp = status.split(" ", 1)[0]
+    current, _, maximum = hp.partition("/")
+    try:
+        return int(current) / int(maximum) if maximum else 0.0
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def tokenize(lines):
+    # Typed events from showdown protocol lines, anything that isn't a protocol line is skipped
+    for line in lines:
+        if not line.startswith("|"):
+            continue
+        parts = line.rstrip("\r").split("|")
+        if len(parts) < 3:
+            if len(parts) == 2 and parts[1] == "tie":
+                yield (TIE, None, None, None, None)
+            continue
+        kind = parts[1]
+        if kind == "switch" or kind == "drag":
+            if len(parts) >= 4:
+                side, name = pokemon_ref(parts[2])
+                yield (SWITCH, side, name, parts[3].split(",", 1)[0], hp_fraction(parts[4]) if len(parts) > 4 else 1.0)
+        elif kind == "move":
+            if len(parts) >= 4:
+                side, name = pokemon_ref(parts[2])
+                yield (MOVE, side, name, parts[3], None)
+        elif kind == "-damage" or kind == "-heal":
+            if len(parts) >= 4:
+                side, name = pokemon_ref(parts[2])
+                if kind == "-heal":
+                    yield (HEAL, side, name, hp_fraction(parts[3]), None)
+                else:
+                    yield (DAMAGE, side, name, hp_fraction(parts[3]), len(parts) > 4 and parts[4].startswith("[from]"))
+        elif kind == "faint":
+            side, name = pokemon_ref(parts[2])
+            yield (FAINT, side, name, None, None)
+        elif kind == "turn":
+            yield (TURN, None, None, int(parts[2]) if parts[2].isdigit() else 0, None)
+        elif kind == "win":
+            yield (WIN, None, None, parts[2], None)
+
+class BuildStats:
+    """
+    Stats per build, see STATS. Events are buffered and added into the stats array in bulk.
+    """
+    def __init__(self, build_keys=()):
+        self.builds = {}
+        for key in build_keys:
+            self.build_id(key)
+        self.stats = np.zeros((len(self.builds), len(STATS)))
+        self.ids = array("q")
+        self.columns = array("q")
+        self.values = array("d")
+
+    def build_id(self, key):
+        return self.builds.setdefault(key, len(self.builds))
+
+    def add(self, build_id, stat, value=1.0):
+        self.ids.append(build_id)
+        self.columns.append(stat)
+        self.values.append(value)
+        if len(self.ids) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if len(self.builds) > len(self.stats):
+            self.stats = np.vstack([self.stats, np.zeros((len(self.builds) - len(self.stats), len(STATS)))])
+        if self.ids:
+            np.add.at(self.stats, (np.frombuffer(self.ids, dtype=np.int64), np.frombuffer(self.columns, dtype=np.int64)),
+                      np.frombuffer(self.values, dtype=np.float64))
+            self.ids, self.columns, self.values = array("q"), array("q"), array("d")
+        return self
+
+    def merge(self, keys, stats):
+        # Add the stats of another BuildStats, e.g. from another shard
+        self.flush()
+        rows = np.array([self.build_id(key) for key in keys], dtype=np.int64)
+        self.flush()
+        if len(rows):
+            np.add.at(self.stats, rows, stats)
+        return self
+
+    def by_build(self):
+        self.flush()
+        return {key: dict(zip(STATS, self.stats[i].tolist())) for key, i in self.builds.items()}
+
+    def by_species(self):
+        self.flush()
+        species = {}
+        for (name, _), i in self.builds.items():
+            species.setdefault(name, np.zeros(len(STATS)))
+            species[name] += self.stats[i]
+        return {name: dict(zip(STATS, totals.tolist())) for name, totals in species.items()}
+
+def team_builds(teams_by_leader, trainer):
+    # Species -> build key for a trainer's team, the first build wins if a species is there twice
+    builds = {}
+    for species, local_id in teams_by_leader.get(trainer, []):
+        builds.setdefault(species, (species, int(local_id)))
+    return builds
+
+def add_battle(build_stats, teams_by_leader, bot_1, bot_2, outcome, lines):
+    """
+    Credit the events of one battle to the builds that took part.
+
+    Damage is in percent of the target's max hp and is credited to the last pokemon
+    on the other side to use a move. A KO goes to the last pokemon to damage the
+    fainted one directly, or else to whatever was on the field opposite it.
+    """
+    stat = STAT_INDEX
+    add = build_stats.add
+    teams = {"p1": team_builds(teams_by_leader, bot_1), "p2": team_builds(teams_by_leader, bot_2)}
+    other = {"p1": "p2", "p2": "p1"}
+    members = {side: {build_stats.build_id(key) for key in teams[side].values()} for side in teams}
+    pokemon = {}  # (side, name) -> build id
+    active = {}
+    leads = {}
+    hp = {}
+    last_move = {}
+    last_hit_by = {}
+
+    for kind, side, name, value, detail in tokenize(lines):
+        if kind == TURN:
+            for build_id in active.values():
+                add(build_id, stat["turns_on_field"])
+            continue
+        if side not in teams:
+            continue
+        ref = (side, name)
+        if kind == SWITCH:
+            build_id = build_stats.build_id(teams[side].get(value, (value, UNKNOWN_BUILD)))
+            pokemon[ref] = active[side] = build_id
+            members[side].add(build_id)
+            hp[ref] = detail
+            add(build_id, stat["switch_ins"])
+            if side not in leads:
+                leads[side] = build_id
+                add(build_id, stat["leads"])
+            continue
+        build_id = pokemon.get(ref, active.get(side))
+        if build_id is None:
+            continue
+        if kind == MOVE:
+            add(build_id, stat["moves_used"])
+            last_move[side] = build_id
+        elif kind == DAMAGE:
+            lost = hp.get(ref, 1.0) - value
+            hp[ref] = value
+            attacker = last_move.get(other[side])
+            if not detail and lost > 0 and attacker is not None:
+                add(attacker, stat["damage_dealt"], lost * 100)
+                last_hit_by[ref] = attacker
+        elif kind == HEAL:
+            hp[ref] = value
+        elif kind == FAINT:
+            add(build_id, stat["fainted"])
+            killer = last_hit_by.get(ref, active.get(other[side]))
+            if killer is not None:
+                add(killer, stat["kos"])
+
+    winner = "p1" if outcome == BOT_1_WIN else "p2" if outcome == BOT_2_WIN else None
+    for side, build_ids in members.items():
+        for build_id in build_ids:
+            add(build_id, stat["battles"])
+            if side == winner:
+                add(build_id, stat["wins"])
+    if winner in leads:
+        add(leads[winner], stat["lead_wins"])
+
+def scan_events(file_path, teams_by_leader, build_keys=(), start=0, end=None, closed_end=False):
+    # BuildStats of every battle the parsers count in a file or part of one
+    build_stats = BuildStats(build_keys)
+
+    def handle_battle(data, battle_start, battle_end):
+        header = battle_header(data, battle_start, battle_end)
+        if header is None:
+            return
+        outcome = battle_result(data, battle_start, battle_end)
+        if outcome is None:
+            return
+        bot_1, bot_2 = decode_header(header)
+        lines = data[battle_start:battle_end].decode("utf-8", errors="replace").split("\n")
+        add_battle(build_stats, teams_by_leader, bot_1, bot_2, outcome, lines)
+
+    for_each_battle(file_path, handle_battle, start, end, closed_end)
+    return build_stats.flush()
+
+def scan_events_shard(shard):
+    file_path, start, end, closed_end, teams_by_leader, build_keys = shard
+    build_stats = scan_events(file_path, teams_by_leader, build_keys, start, end, closed_end)
+    return list(build_stats.builds.keys()), build_stats.stats
+
+def build_stats_parallel(file_paths, teams_by_leader, build_keys=(), shard_count=None):
+    """
+    Per build stats of one or more output files, parsing shards across processes.
+
+    :param build_keys: (species, local_id) keys to list first and include even if unused, e.g. load_builds(...).keys().
+    :param shard_count: Number of shards per file, defaults to the number of CPUs.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    build_keys = list(build_keys)
+    shard_count = shard_count or os.cpu_count() or 1
+    shards = [(file_path,) + boundary + (teams_by_leader, build_keys)
+              for file_path in file_paths for boundary in shard_boundaries(file_path, shard_count)]
+    build_stats = BuildStats(build_keys)
+    if len(shards) == 1:
+        return build_stats.merge(*scan_events_shard(shards[0]))
+    with ProcessPoolExecutor(max_workers=min(len(shards), shard_count)) as executor:
+        for keys, stats in executor.map(scan_events_shard, shards):
+            build_stats.merge(keys, stats)
+    return build_stats
+
+def save_stats_to_csv(stats_by_key, filename, key_columns):
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(key_columns + STATS + ["win_rate", "lead_win_rate", "kos_per_battle", "damage_per_battle"])
+        for key, stats in stats_by_key.items():
+            battles, leads = stats["battles"], stats["leads"]
+            writer.writerow(list(key) + [round(stats[stat], 2) if stat == "damage_dealt" else int(stats[stat]) for stat in STATS] + [
+                round(stats["wins"] / battles, 4) if battles else "",
+                round(stats["lead_wins"] / leads, 4) if leads else "",
+                round(stats["kos"] / battles, 4) if battles else "",
+                round(stats["damage_dealt"] / battles, 2) if battles else "",
+            ])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per build and per species stats from battle logs.")
+    parser.add_argument("files", nargs="*", default=None, help="output files to parse, defaults to output.txt")
+    parser.add_argument("--teams", default="Inputs/GymLeaderTeams.json")
+    parser.add_argument("--builds", default="Inputs/GymLeaderPokemon.txt")
+    parser.add_argument("--shards", type=int, default=None)
+    parser.add_argument("--build-csv", default="build_stats.csv")
+    parser.add_argument("--species-csv", default="species_stats.csv")
+    args = parser.parse_args()
+
+    with open(args.teams, "r", encoding="utf-8") as infile:
+        teams_by_leader = json.load(infile)
+    build_keys = load_builds(args.builds).keys() if os.path.exists(args.builds) else ()
+    build_stats = build_stats_parallel(args.files or ["output.txt"], teams_by_leader, build_keys, args.shards)
+
+    save_stats_to_csv(build_stats.by_build(), args.build_csv, ["Species", "Build"])
+    species_stats = build_stats.by_species()
+    save_stats_to_csv({(species,): stats for species, stats in species_stats.items()}, args.species_csv, ["Species"])
+    for species, stats in sorted(species_stats.items(), key=lambda item: item[1]["kos"], reverse=True):
+        if stats["battles"]:
+            print(f"{species}: {stats['kos']:.0f} KOs, {stats['damage_dealt'] / stats['battles']:.1f}% damage per battle, "
+                  f"{stats['wins'] / stats['battles']:.1%} win rate")
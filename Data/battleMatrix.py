@@ -0,0 +1,121 @@
+import numpy as np
+
+from outputParser import BOT_2_WIN
+
+# =============================================================================
+# Array backed battle results. counts[i, j] holds [wins, losses, ties] of
+# trainer i against trainer j, and index maps trainer names to rows.
+# =============================================================================
+
+WINS = 0
+LOSSES = 1
+TIES = 2
+
+class BattleMatrix:
+    def __init__(self, trainers, counts=None):
+        self.trainers = list(trainers)
+        self.index = {trainer: i for i, trainer in enumerate(self.trainers)}
+        if len(self.index) != len(self.trainers):
+            raise ValueError("Duplicate trainer names in battle matrix.")
+        size = len(self.trainers)
+        if counts is None:
+            counts = np.zeros((size, size, 3), dtype=np.int64)
+        elif counts.shape != (size, size, 3):
+            raise ValueError(f"Counts have shape {counts.shape}, expected {(size, size, 3)}")
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.trainers)
+
+    @classmethod
+    def from_aggregate(cls, aggregate):
+        """
+        Build a matrix from an outputParser aggregate.
+
+        Trainers are ordered the same way the old battle_matrix dict ordered its keys.
+        """
+        index = {}
+        for (bot_1, bot_2), record in aggregate.items():
+            first, second = (bot_2, bot_1) if record[3] == BOT_2_WIN else (bot_1, bot_2)
+            index.setdefault(first, len(index))
+            index.setdefault(second, len(index))
+        matrix = cls(list(index.keys()))
+        if not aggregate:
+            return matrix
+
+        rows = np.array([index[bot_1] for bot_1, _ in aggregate.keys()])
+        columns = np.array([index[bot_2] for _, bot_2 in aggregate.keys()])
+        records = np.array([record[:3] for record in aggregate.values()], dtype=np.int64)
+        bot_1_wins, bot_2_wins, ties = records[:, 0], records[:, 1], records[:, 2]
+        # np.add.at so repeated (row, column) pairs, e.g. "A vs B" and "B vs A", accumulate
+        np.add.at(matrix.counts, (rows, columns, WINS), bot_1_wins)
+        np.add.at(matrix.counts, (columns, rows, LOSSES), bot_1_wins)
+        np.add.at(matrix.counts, (columns, rows, WINS), bot_2_wins)
+        np.add.at(matrix.counts, (rows, columns, LOSSES), bot_2_wins)
+        np.add.at(matrix.counts, (rows, columns, TIES), ties)
+        np.add.at(matrix.counts, (columns, rows, TIES), ties)
+        return matrix
+
+    def diagonal(self):
+        size = len(self.trainers)
+        return self.counts[np.arange(size), np.arange(size)]
+
+    def totals(self):
+        # [wins, losses, ties] per trainer, battles against themselves included (like trainer_stats)
+        return self.counts.sum(axis=1)
+
+    def overall(self):
+        # [wins, losses, ties] per trainer, battles against themselves excluded (like the Overall column)
+        return self.totals() - self.diagonal()
+
+    def overall_wins(self):
+        return self.overall()[:, WINS]
+
+    def sorted_order(self):
+        # Trainer indices by overall wins, highest first, keeping the current order for equal wins
+        return np.argsort(-self.overall_wins(), kind="stable")
+
+    def take(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        return BattleMatrix([self.trainers[i] for i in indices], self.counts[np.ix_(indices, indices)])
+
+    def sorted(self):
+        return self.take(self.sorted_order())
+
+    def select(self, trainers):
+        # Sub-matrix of only the given trainers, e.g. only the Kanto leaders
+        return self.take([self.index[trainer] for trainer in trainers])
+
+    def win_rates(self):
+        # Fraction of battles won for every pairing, NaN where two trainers never battled
+        played = self.counts.sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(played > 0, self.counts[:, :, WINS] / played, np.nan)
+
+    def overall_win_rates(self):
+        overall = self.overall()
+        played = overall.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(played > 0, overall[:, WINS] / played, np.nan)
+
+    def trainer_stats(self):
+        # Same shape as parse_battles' sorted_trainer_stats
+        totals = self.totals()
+        stats = []
+        for i in np.argsort(-totals[:, WINS], kind="stable"):
+            wins, losses, ties = (int(value) for value in totals[i])
+            stats.append((self.trainers[i], {'wins': wins, 'losses': losses, 'ties': ties,
+                                             'win_loss_ratio': wins / losses if losses != 0 else float('inf')}))
+        return stats
+
+    def record(self, trainer1, trainer2):
+        wins, losses, ties = self.counts[self.index[trainer1], self.index[trainer2]]
+        return {'wins': int(wins), 'losses': int(losses), 'ties': int(ties)}
+
+    def save(self, file_path):
+        np.savez_compressed(file_path, trainers=np.array(self.trainers, dtype=str), counts=self.counts)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            return cls(data["trainers"].tolist(), data["counts"].astype(np.int64))
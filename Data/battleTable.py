@@ -0,0 +1,209 @@
+import argparse
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from outputParser import CHUNK_SIZE, battle_header, battle_result, decode_header, for_each_battle, shard_boundaries
+
+# =============================================================================
+# Columnar table with one row per battle, extracted from the logs in a single
+# pass. Every column is an integer NumPy array, so filtering and grouping
+# millions of battles never needs to read the logs again. Side 1 is Bot 1 (the
+# first trainer in the "A vs B" header), side 2 is Bot 2.
+# =============================================================================
+
+COLUMNS = [
+    "bot_1", "bot_2",                # trainer ids, index into BattleTable.trainers
+    "winner",                        # outputParser.BOT_1_WIN, BOT_2_WIN or TIE
+    "turns",
+    "kos_1", "kos_2",                # pokemon each side knocked out
+    "switch_ins_1", "switch_ins_2",  # leads and replacements included
+    "remaining_1", "remaining_2",    # pokemon left standing at the end, -1 if the team size is unknown
+    "weather_changes",
+    "duration",                      # seconds between the first and last |t:| timestamp
+]
+
+def read_int(data, position, end, default=0):
+    # Integer from position to the end of its line
+    line_end = data.find(b"\n", position, end)
+    try:
+        return int(data[position:end if line_end < 0 else line_end])
+    except ValueError:
+        return default
+
+def remaining(data, start, end, marker, faints):
+    # Pokemon of a side left standing, -1 if its team size is missing or can't be read
+    team_size = data.find(marker, start, end)
+    size = read_int(data, team_size + len(marker), end, -1) if team_size >= 0 else -1
+    return size - faints if size >= 0 else -1
+
+def battle_row(data, start, end, outcome):
+    # Every column but the trainer ids for the battle in data[start:end]
+    turn = data.rfind(b"|turn|", start, end)
+    turns = read_int(data, turn + 6, end) if turn >= 0 else 0
+    faints_1 = data.count(b"|faint|p1", start, end)
+    faints_2 = data.count(b"|faint|p2", start, end)
+    switch_ins_1 = data.count(b"|switch|p1", start, end) + data.count(b"|drag|p1", start, end)
+    switch_ins_2 = data.count(b"|switch|p2", start, end) + data.count(b"|drag|p2", start, end)
+
+    remaining_1 = remaining(data, start, end, b"|teamsize|p1|", faints_1)
+    remaining_2 = remaining(data, start, end, b"|teamsize|p2|", faints_2)
+
+    # weather that carries on is repeated every turn with [upkeep], only count the changes
+    weather_changes = data.count(b"|-weather|", start, end) - data.count(b"|[upkeep]", start, end)
+
+    first_time = data.find(b"|t:|", start, end)
+    last_time = data.rfind(b"|t:|", start, end)
+    duration = read_int(data, last_time + 4, end) - read_int(data, first_time + 4, end) if first_time >= 0 else 0
+    return (outcome, turns, faints_2, faints_1, switch_ins_1, switch_ins_2,
+            remaining_1, remaining_2, weather_changes, duration)
+
+def extract_rows(file_path, start=0, end=None, closed_end=False, chunk_size=CHUNK_SIZE):
+    """
+    Extract a row for every battle the parsers count, i.e. with a header and an outcome.
+
+    :return: Tuple of the trainer names in order of first appearance and a flat
+        int64 array of the rows, len(COLUMNS) values per battle.
+    """
+    trainers = {}
+    matchups = {}  # raw header -> (bot 1 id, bot 2 id)
+    rows = array("q")
+
+    def handle_battle(data, battle_start, battle_end):
+        header = battle_header(data, battle_start, battle_end)
+        if header is None:
+            return
+        outcome = battle_result(data, battle_start, battle_end)
+        if outcome is None:
+            return
+        ids = matchups.get(header)
+        if ids is None:
+            bot_1, bot_2 = decode_header(header)
+            ids = matchups[header] = (trainers.setdefault(bot_1, len(trainers)), trainers.setdefault(bot_2, len(trainers)))
+        rows.extend(ids)
+        rows.extend(battle_row(data, battle_start, battle_end, outcome))
+
+    for_each_battle(file_path, handle_battle, start, end, closed_end, chunk_size)
+    return list(trainers.keys()), np.frombuffer(rows, dtype=np.int64) if rows else np.zeros(0, dtype=np.int64)
+
+def extract_shard(shard):
+    file_path, start, end, closed_end = shard
+    return extract_rows(file_path, start, end, closed_end)
+
+class BattleTable:
+    def __init__(self, trainers, columns):
+        self.trainers = list(trainers)
+        self.index = {trainer: i for i, trainer in enumerate(self.trainers)}
+        self.columns = {name: np.asarray(columns[name], dtype=np.int64) for name in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns["winner"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def from_parts(cls, parts):
+        # Combine (trainers, rows) parts from extract_rows, renumbering each part's trainer ids
+        trainers = {}
+        tables = []
+        for part_trainers, rows in parts:
+            remap = np.array([trainers.setdefault(trainer, len(trainers)) for trainer in part_trainers], dtype=np.int64)
+            rows = rows.reshape(-1, len(COLUMNS)).copy()
+            if len(remap):
+                rows[:, :2] = remap[rows[:, :2]]
+            tables.append(rows)
+        rows = np.concatenate(tables) if tables else np.zeros((0, len(COLUMNS)), dtype=np.int64)
+        return cls(list(trainers.keys()), {name: rows[:, i] for i, name in enumerate(COLUMNS)})
+
+    def filter(self, mask):
+        # Table of only the rows where mask is True
+        return BattleTable(self.trainers, {name: column[mask] for name, column in self.columns.items()})
+
+    def involving(self, trainer):
+        # Mask of the battles a trainer fought on either side
+        trainer_id = self.index[trainer]
+        return (self["bot_1"] == trainer_id) | (self["bot_2"] == trainer_id)
+
+    def matchup(self, trainer1, trainer2):
+        # Mask of the battles between two trainers, in either order
+        id_1, id_2 = self.index[trainer1], self.index[trainer2]
+        return ((self["bot_1"] == id_1) & (self["bot_2"] == id_2)) | ((self["bot_1"] == id_2) & (self["bot_2"] == id_1))
+
+    def group_by(self, keys, values=None, how="count"):
+        """
+        Aggregate values for every distinct key.
+
+        :param keys: Column name or array to group by, e.g. "bot_1" or "winner".
+        :param values: Column name or array to aggregate, not needed for "count".
+        :param how: One of "count", "sum", "mean", "min" or "max".
+        :return: Tuple of the sorted distinct keys and the aggregate for each.
+        """
+        keys = self[keys] if isinstance(keys, str) else np.asarray(keys)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        if how == "count":
+            return unique, np.bincount(inverse, minlength=len(unique))
+        values = self[values] if isinstance(values, str) else np.asarray(values)
+        if how == "sum":
+            return unique, np.bincount(inverse, weights=values, minlength=len(unique)).astype(values.dtype)
+        if how == "mean":
+            return unique, np.bincount(inverse, weights=values, minlength=len(unique)) / np.bincount(inverse, minlength=len(unique))
+        if how in ("min", "max"):
+            result = np.full(len(unique), np.iinfo(np.int64).max if how == "min" else np.iinfo(np.int64).min, dtype=np.int64)
+            (np.minimum if how == "min" else np.maximum).at(result, inverse, values)
+            return unique, result
+        raise ValueError(f"Unknown aggregation: {how}")
+
+    def per_trainer(self, column_1, column_2, how="mean"):
+        """
+        Aggregate a per-side statistic over every battle of each trainer, whichever side they were on.
+
+        e.g. per_trainer("kos_1", "kos_2") is the average KOs each trainer scores per battle.
+
+        :return: Dict mapping trainer name to the aggregate.
+        """
+        keys = np.concatenate([self["bot_1"], self["bot_2"]])
+        values = np.concatenate([self[column_1], self[column_2]])
+        unique, result = self.group_by(keys, values, how)
+        return {self.trainers[trainer_id]: value.item() for trainer_id, value in zip(unique, result)}
+
+    def save(self, file_path):
+        np.savez_compressed(file_path, trainers=np.array(self.trainers, dtype=str), **self.columns)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            return cls(data["trainers"].tolist(), {name: data[name] for name in COLUMNS})
+
+def build_table(file_paths, shard_count=None):
+    """
+    Extract the battle table of one or more output files, parsing shards across processes.
+
+    :param shard_count: Number of shards per file, defaults to the number of CPUs.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    shard_count = shard_count or os.cpu_count() or 1
+    shards = [(file_path,) + boundary for file_path in file_paths for boundary in shard_boundaries(file_path, shard_count)]
+    if len(shards) == 1:
+        return BattleTable.from_parts([extract_shard(shards[0])])
+    with ProcessPoolExecutor(max_workers=min(len(shards), shard_count)) as executor:
+        return BattleTable.from_parts(list(executor.map(extract_shard, shards)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a per-battle table from battle outputs.")
+    parser.add_argument("files", nargs="*", default=None, help="output files to parse, defaults to output.txt")
+    parser.add_argument("--out", default="battle_table.npz")
+    parser.add_argument("--shards", type=int, default=None)
+    args = parser.parse_args()
+
+    table = build_table(args.files or ["output.txt"], args.shards)
+    table.save(args.out)
+    print(f"{len(table)} battles between {len(table.trainers)} trainers saved to {args.out}")
+    if len(table):
+        print(f"Average turns: {table['turns'].mean():.1f}, average duration: {table['duration'].mean():.1f}s")
+        kos = table.per_trainer("kos_1", "kos_2")
+        for trainer, average in sorted(kos.items(), key=lambda item: item[1], reverse=True):
+            print(f"{trainer}: {average:.2f} KOs per battle")
@@ -0,0 +1,183 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from syntheticOutput import generate_output
+
+try:
+    import resource
+except ImportError:  # not available on windows, fall back to tracemalloc
+    resource = None
+
+# =============================================================================
+# Measures throughput (MB/s) and peak memory of every parser and tool on
+# synthetic output files, so scaling regressions show up before a real run.
+# Each target runs in a fresh process so peak memory isn't polluted by the
+# previous target.
+# =============================================================================
+
+# The original re.split based parser, kept as the reference the other parsers are checked against
+def legacy_parse_battles(file_path):
+    trainer_stats = defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0})
+    battle_matrix = defaultdict(lambda: defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0}))
+
+    with open(file_path, 'r') as file:
+        content = file.read()
+
+    battles = re.split(r'\[\[\[\[\[|\]\]\]\]\]', content)[1:-1]
+    name_pattern = re.compile(r'^(.*?) vs (.*?)\n', re.MULTILINE)
+
+    for battle in battles:
+        match = name_pattern.search(battle)
+        if not match:
+            continue
+
+        bot_1, bot_2 = match.groups()
+
+        if "|win|Bot 1" in battle:
+            trainer_stats[bot_1]['wins'] += 1
+            trainer_stats[bot_2]['losses'] += 1
+            battle_matrix[bot_1][bot_2]['wins'] += 1
+            battle_matrix[bot_2][bot_1]['losses'] += 1
+        elif "|win|Bot 2" in battle:
+            trainer_stats[bot_1]['losses'] += 1
+            trainer_stats[bot_2]['wins'] += 1
+            battle_matrix[bot_2][bot_1]['wins'] += 1
+            battle_matrix[bot_1][bot_2]['losses'] += 1
+        elif "|tie" in battle and "|tier" not in battle:
+            trainer_stats[bot_1]['ties'] += 1
+            trainer_stats[bot_2]['ties'] += 1
+            battle_matrix[bot_1][bot_2]['ties'] += 1
+            battle_matrix[bot_2][bot_1]['ties'] += 1
+
+    for trainer in trainer_stats:
+        wins = trainer_stats[trainer]['wins']
+        losses = trainer_stats[trainer]['losses']
+        trainer_stats[trainer]['win_loss_ratio'] = wins / losses if losses != 0 else float('inf')
+
+    sorted_trainer_stats = sorted(trainer_stats.items(), key=lambda item: item[1]['wins'], reverse=True)
+    return sorted_trainer_stats, battle_matrix
+
+# Each runner is set up (imports etc.) outside of the timed section and returns the function to time
+def run_parse(module_name, function_name):
+    def setup():
+        parse = getattr(importlib.import_module(module_name), function_name)
+        def run(file_path, work_dir):
+            sorted_trainer_stats, battle_matrix = parse(file_path)
+            # keep the order too, it decides the order of the CSV and console reports
+            stats = [(trainer, record['wins'], record['losses'], record['ties']) for trainer, record in sorted_trainer_stats]
+            matrix = [(trainer1, [(trainer2, record['wins'], record['losses'], record['ties']) for trainer2, record in row.items()])
+                      for trainer1, row in battle_matrix.items()]
+            return stats, matrix
+        return run
+    return setup
+
+def run_split_replays():
+    from replaySplitter import split_output_to_replays
+    def run(file_path, work_dir):
+        split_output_to_replays(file_path, work_dir, "bench")
+    return run
+
+def run_build_table():
+    from battleTable import build_table
+    def run(file_path, work_dir):
+        build_table(file_path)
+    return run
+
+def run_scan_errors():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ErrorChecking"))
+    from scanErrors import scan_errors
+    def run(file_path, work_dir):
+        scan_errors(file_path, os.path.join(work_dir, "clean.txt"), os.path.join(work_dir, "rerun.json"), os.path.join(work_dir, "index.jsonl"))
+    return run
+
+# name -> (kind, runner setup). Parsers of kind "parse" must all agree with each other.
+TARGETS = {
+    "legacy_parse_battles": ("parse", run_parse("benchmarkParsers", "legacy_parse_battles")),
+    "outputParser.parse_battles": ("parse", run_parse("outputParser", "parse_battles")),
+    "outputParser.parse_battles_parallel": ("parse", run_parse("outputParser", "parse_battles_parallel")),
+    "replaySplitter.split_output_to_replays": ("split", run_split_replays),
+    "battleTable.build_table": ("table", run_build_table),
+    "scanErrors.scan_errors": ("errors", run_scan_errors),
+}
+
+def peak_memory_mb():
+    if resource is None:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def benchmark_worker(target_name, file_path, work_dir, queue):
+    _, setup = TARGETS[target_name]
+    runner = setup()
+    if resource is None:
+        import tracemalloc
+        tracemalloc.start()
+    baseline = peak_memory_mb()
+    start = time.perf_counter()
+    result = runner(file_path, work_dir)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, peak_memory_mb(), baseline, result))
+
+def benchmark_target(target_name, file_path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        process = context.Process(target=benchmark_worker, args=(target_name, file_path, work_dir, queue))
+        process.start()
+        elapsed, peak, baseline, result = queue.get()
+        process.join()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return elapsed, peak, baseline, result
+
+def run_benchmarks(file_path, target_names=None):
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    target_names = target_names or list(TARGETS.keys())
+    print(f"{file_path}: {size_mb:.1f} MB")
+    print(f"{'target':<48}{'seconds':>10}{'MB/s':>10}{'peak MB':>10}{'base MB':>10}")
+    rows = []
+    reference = None
+    for target_name in target_names:
+        elapsed, peak, baseline, result = benchmark_target(target_name, file_path)
+        throughput = size_mb / elapsed if elapsed > 0 else float('inf')
+        print(f"{target_name:<48}{elapsed:>10.2f}{throughput:>10.1f}{peak:>10.1f}{baseline:>10.1f}")
+        rows.append((target_name, elapsed, throughput, peak))
+        if TARGETS[target_name][0] == "parse":
+            if reference is None:
+                reference = (target_name, result)
+            elif result != reference[1]:
+                print(f"  ! results differ from {reference[0]}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the output parsers and replay splitter.")
+    parser.add_argument("--file", default=None, help="benchmark an existing output file instead of generating one")
+    parser.add_argument("--battles", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--trainers", type=int, default=155)
+    parser.add_argument("--targets", nargs="+", default=None, choices=list(TARGETS.keys()))
+    parser.add_argument("--keep", action="store_true", help="keep generated corpora")
+    args = parser.parse_args()
+
+    if args.file is not None:
+        run_benchmarks(args.file, args.targets)
+    else:
+        for battle_count in args.battles:
+            corpus = f"bench_output_{battle_count}.txt"
+            generate_output(corpus, trainer_count=args.trainers, battle_count=battle_count, seed=battle_count)
+            try:
+                run_benchmarks(corpus, args.targets)
+            finally:
+                if not args.keep:
+                    os.remove(corpus)
+            print()
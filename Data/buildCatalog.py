@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+from bisect import bisect_right
+
+from buildFiles import parse_build_key, read_build_blocks
+
+# =============================================================================
+# Catalog of the builds in a builds file, each with an id made from a hash of
+# its content. Ids stay the same when other builds are added, removed or
+# edited, unlike the line numbers the Gen 1 pipeline used to refer to builds
+# by. Builds can be looked up by id, by (species, moveset), by the
+# (species, local_id) key of a "|Species#id" header, or by an old line number
+# reference. The catalog is saved next to the builds file as an index that is
+# used as long as the builds file hasn't changed.
+# =============================================================================
+
+INDEX_VERSION = 1
+ID_LENGTH = 16
+
+def build_id(lines):
+    # Content hash of a build's export lines, blank lines and trailing whitespace don't count
+    content = "".join(line.rstrip() + "\n" for line in lines if line.strip())
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+def moveset_key(species, moves):
+    return (species.lower(), frozenset(move.lower() for move in moves))
+
+def build_moves(lines):
+    return [line[2:].strip() for line in lines if line.startswith("- ")]
+
+def default_index_path(builds_path):
+    return builds_path + ".index.json"
+
+class BuildCatalog:
+    def __init__(self):
+        self.builds = {}      # id -> (species, export lines)
+        self.by_moveset = None  # (species, frozenset of moves), lowercase -> id, made on the first find()
+        self.by_key = {}      # (species, local_id) -> id, for "|Species#id" headers
+        self.starts = []      # header line numbers of the builds file, in order
+        self.start_ids = []   # id of the build at each header line
+
+    def __len__(self):
+        return len(self.builds)
+
+    def __contains__(self, build_id):
+        return build_id in self.builds
+
+    def add(self, species, lines, header_line=None, local_id=None):
+        """
+        Add a build unless the catalog already has one with the same content.
+
+        :param species: Species from the build's header.
+        :param lines: The build in Showdown export format, starting with the species line.
+        :param header_line: Line number of the build's header in the builds file, if it was read from one.
+        :param local_id: local_id from a "|Species#id" header.
+        :return: The build's id.
+        """
+        new_id = build_id(lines)
+        if new_id not in self.builds:
+            self.builds[new_id] = (species, list(lines))
+            if self.by_moveset is not None:
+                self.by_moveset.setdefault(moveset_key(species, build_moves(lines)), new_id)
+        if local_id is not None:
+            self.by_key.setdefault((species, local_id), new_id)
+        if header_line is not None:
+            self.starts.append(header_line)
+            self.start_ids.append(new_id)
+        return new_id
+
+    def find(self, species, moves):
+        # Id of the build of a species with exactly these moves, or None
+        if self.by_moveset is None:
+            self.by_moveset = {}
+            for key, (build_species, lines) in self.builds.items():
+                self.by_moveset.setdefault(moveset_key(build_species, build_moves(lines)), key)
+        return self.by_moveset.get(moveset_key(species, moves))
+
+    def id_at_line(self, line_number):
+        # Id of the build holding a line of the builds file, or None before the first build
+        position = bisect_right(self.starts, line_number) - 1
+        return self.start_ids[position] if position >= 0 else None
+
+    def resolve(self, ref):
+        """
+        Id of the build a [species, ref] team entry refers to.
+
+        ref can be a build id, the local_id of a "|Species#id" header, or otherwise the
+        old line number reference, which points at the build holding the line after it
+        (i.e. the build whose header is on that line). In a builds file with
+        "|Species#id" headers a line number reference must point at a build of its
+        species, so a typo or the wrong builds file raises instead of battling with
+        another pokemon.
+        """
+        species, value = ref
+        if isinstance(value, str) and value in self.builds:
+            return value
+        if isinstance(value, str) and not value.isdigit():
+            raise KeyError(f"Build not found: {species} {value}")
+        key = (species, int(value))
+        if key in self.by_key:
+            return self.by_key[key]
+        found = self.id_at_line(int(value) + 1)
+        if found is not None and (not self.by_key or self.builds[found][0].lower() == species.lower()):
+            return found
+        if found is not None:
+            raise KeyError(f"Build not found: {species} {value}, and line {value} is in a build of {self.builds[found][0]}, is it the right builds file?")
+        raise KeyError(f"Build not found: {species} {value}")
+
+    def species(self, ref):
+        return self.builds[self.resolve(ref)][0]
+
+    def write_team(self, refs, file_path, setLevel=None):
+        # Write the builds of a team to a file in Showdown export format, with every level set to setLevel if it isn't None
+        self.write_builds([self.resolve(ref) for ref in refs], file_path, setLevel)
+
+    def write_builds(self, build_ids, file_path, setLevel=None):
+        with open(file_path, "w") as f:
+            for build_id in build_ids:
+                for line in self.builds[build_id][1]:
+                    if setLevel is not None and line.startswith("Level: "):
+                        f.write(f"Level: {setLevel}\n")
+                    else:
+                        f.write(line)
+                f.write("\n")  # Add a newline to separate builds
+
+def file_fingerprint(file_path):
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def read_catalog(builds_path):
+    """
+    Catalog of a builds file. "|Species#id" headers are followed by the full export, while
+    the headers of the Gen 1 files are the species line of the export themselves.
+    """
+    catalog = BuildCatalog()
+    for line_number, header, lines in read_build_blocks(builds_path):
+        if header is None:
+            raise ValueError("Build data found before any build header.")
+        if "#" in header:
+            species, local_id = parse_build_key(header)
+            if (species, local_id) in catalog.by_key:
+                raise ValueError(f"Duplicate build key: {(species, local_id)}")
+            catalog.add(species, lines, line_number, local_id)
+        else:
+            catalog.add(header, [header + "\n"] + lines, line_number)
+    return catalog
+
+def save_index(catalog, builds_path, index_path=None):
+    index = {
+        "version": INDEX_VERSION,
+        "fingerprint": file_fingerprint(builds_path),
+        "builds": {key: [species, "".join(lines)] for key, (species, lines) in catalog.builds.items()},
+        "keys": [[species, local_id, key] for (species, local_id), key in catalog.by_key.items()],
+        "starts": catalog.starts,
+        "start_ids": catalog.start_ids,
+    }
+    with open(index_path or default_index_path(builds_path), "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+def load_index(builds_path, index_path=None):
+    # Catalog from a saved index, or None if there is none or the builds file changed since
+    index_path = index_path or default_index_path(builds_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except ValueError:
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("fingerprint") != file_fingerprint(builds_path):
+        return None
+    catalog = BuildCatalog()
+    for key, (species, text) in index["builds"].items():
+        catalog.builds[key] = (species, text.splitlines(keepends=True))
+    catalog.by_key = {(species, local_id): key for species, local_id, key in index["keys"]}
+    catalog.starts = index["starts"]
+    catalog.start_ids = index["start_ids"]
+    return catalog
+
+def load_catalog(builds_path, index_path=None):
+    # Catalog of a builds file, from its index if that is up to date, otherwise read and indexed again
+    catalog = load_index(builds_path, index_path)
+    if catalog is None:
+        catalog = read_catalog(builds_path)
+        save_index(catalog, builds_path, index_path)
+    return catalog
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a builds file by content hash ids.")
+    parser.add_argument("builds", nargs="?", default="Inputs/PokemonBuilds.txt")
+    parser.add_argument("--index", default=None, help="defaults to the builds file name + .index.json")
+    args = parser.parse_args()
+
+    catalog = read_catalog(args.builds)
+    save_index(catalog, args.builds, args.index)
+    print(f"{len(catalog)} unique builds from {len(catalog.starts)} in {args.builds}, index written to {args.index or default_index_path(args.builds)}")
@@ -0,0 +1,48 @@
+# =============================================================================
+# Reading builds in Pokemon Showdown export format. Each build in a builds
+# file starts with a "|Species#local_id" header line, and teams refer to
+# builds by their (species, local_id) key. See buildCatalog.py for looking
+# builds up and writing them out for a battle.
+# =============================================================================
+
+def read_build_blocks(file_path):
+    """
+    Split a builds file into its builds without checking them.
+
+    :return: List of (line number, header, lines) for every build, header being the
+        header line without the "|". Any non-blank lines before the first header come
+        first, with a header of None.
+    """
+    blocks = []
+    current = None
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            if raw_line.startswith("|"):
+                current = (line_number, raw_line[1:].strip(), [])
+                blocks.append(current)
+            elif current is None:
+                if raw_line.strip() == "":
+                    continue
+                current = (line_number, None, [raw_line])
+                blocks.append(current)
+            else:
+                current[2].append(raw_line)
+    return blocks
+
+def parse_build_key(header):
+    # "Onix#1" -> ("Onix", 1)
+    if "#" not in header:
+        raise ValueError(f"Missing build id in line: |{header}")
+    pokemon, local_id = header.rsplit("#", 1)
+    return (pokemon.strip(), int(local_id))
+
+def load_builds(file_path):
+    builds = {}
+    for _, header, lines in read_build_blocks(file_path):
+        if header is None:
+            raise ValueError("Build data found before any build header.")
+        key = parse_build_key(header)
+        if key in builds:
+            raise ValueError(f"Duplicate build key: {key}")
+        builds[key] = lines
+    return builds
@@ -0,0 +1,123 @@
+import json
+import os
+import queue
+import threading
+
+# =============================================================================
+# Append-only checkpoint of a Pokemon-mode run, so a crashed run can carry on
+# with --resume instead of starting again. Workers hand records to a
+# background thread that writes them as JSON lines, so no worker waits on
+# the disk:
+#   {"type": "score", "leader", "species", "score", "build"}  a new best build
+#   {"type": "cancel", "leader", "species", "key"}             a species swept a leader
+#   {"type": "done", "gauntlets": [...]}                       finished gauntlets
+# The first line is a snapshot of the whole state. Every `compact_every`
+# records the log is rewritten as a single snapshot, so replaying it on
+# resume stays quick. A line cut off by a crash is ignored.
+# =============================================================================
+
+LOG_VERSION = 1
+
+def empty_state(source):
+    return {"type": "snapshot", "version": LOG_VERSION, "source": source,
+            "results": {}, "builds": {}, "noErase": {}, "cancelled": [], "done": []}
+
+def apply_record(state, record):
+    # Update a snapshot with one record of the log
+    if record["type"] == "score":
+        state["results"].setdefault(record["leader"], {})[record["species"]] = record["score"]
+        state["builds"].setdefault(record["leader"], {})[record["species"]] = record["build"]
+    elif record["type"] == "cancel":
+        swept = state["noErase"].setdefault(record["leader"], [])
+        if record["species"] not in swept:
+            swept.append(record["species"])
+        state["cancelled"].append(record["key"])
+    elif record["type"] == "done":
+        state["done"].extend(record["gauntlets"])
+
+def load_checkpoint(log_path, source):
+    """
+    Replay a checkpoint log.
+
+    :param source: What the run was made from, e.g. compileTournament.plan_source. A log from a different source isn't used.
+    :return: The state as a snapshot dict, see empty_state, or None if there is no usable log.
+    """
+    if not os.path.exists(log_path):
+        return None
+    state = None
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # the last line was cut off
+            if state is None:
+                if record.get("type") != "snapshot" or record.get("version") != LOG_VERSION or record.get("source") != source:
+                    return None
+                state = record
+            else:
+                apply_record(state, record)
+    return state
+
+def write_snapshot(log_path, state):
+    # write to a temporary file first so an interrupted compaction never leaves a broken log behind
+    temp_path = log_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(state) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, log_path)
+
+class CheckpointLog:
+    """
+    Background writer of a checkpoint log.
+
+    :param log_path: File of the log.
+    :param state: Snapshot to start from, from load_checkpoint when resuming or empty_state for a new run.
+        The writer thread keeps updating it, so it mustn't be shared with the running code.
+    :param compact_every: Records after which the log is rewritten as one snapshot.
+    """
+    def __init__(self, log_path, state, compact_every=10000):
+        self.log_path = log_path
+        self.state = state  # only touched by the writer thread once it has started
+        self.compact_every = compact_every
+        self.records = queue.Queue()
+        write_snapshot(log_path, state)
+        self.thread = threading.Thread(target=self.write_records, daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        self.records.put(record)
+
+    def close(self):
+        # Write out everything appended so far and compact the log
+        self.records.put(None)
+        self.thread.join()
+
+    def write_records(self):
+        written = 0
+        f = open(self.log_path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self.records.get()
+                # write everything that is waiting in one go
+                batch = [record]
+                while record is not None and not self.records.empty():
+                    record = self.records.get()
+                    batch.append(record)
+                for record in batch:
+                    if record is not None:
+                        f.write(json.dumps(record) + "\n")
+                        apply_record(self.state, record)
+                        written += 1
+                f.flush()
+                if batch[-1] is None or written >= self.compact_every:
+                    f.close()
+                    write_snapshot(self.log_path, self.state)
+                    if batch[-1] is None:
+                        return
+                    written = 0
+                    f = open(self.log_path, "a", encoding="utf-8")
+        finally:
+            if not f.closed:
+                f.close()
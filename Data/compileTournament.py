@@ -0,0 +1,119 @@
+import json
+import os
+
+import numpy as np
+
+from buildCatalog import file_fingerprint
+
+# =============================================================================
+# Compiles the Pokemon-mode tournament from BuildBattles_pokemon-vs-leaders_Gen1.py
+# into integer arrays, so runPokemonSimulations.py never has to search
+# PokemonVsLeaderTeams.json for a team's name while it runs.
+#
+# Every team in PokemonVsLeaderTeams.json gets an id, and a team's members are
+# resolved to build ids once. Each gauntlet of tournament_battles.json (the
+# legs a pokemon plays against one leader, ending with the leader's full team)
+# becomes its leader id, pokemon species id and a range of legs, each leg
+# being a (trainer team id, pokemon team id) pair. Teams with the same members
+# share the id of the first of them, like the name lookup this replaces.
+# =============================================================================
+
+PLAN_VERSION = 1
+
+def plan_source(teams_path, battles_path, level_caps, builds_paths):
+    # Fingerprint of everything a plan is compiled from
+    return json.dumps([PLAN_VERSION, [file_fingerprint(path) for path in [teams_path, battles_path] + list(builds_paths)], level_caps])
+
+def team_key(team):
+    # Hashable form of a list of [species, ref] build refs
+    return tuple(map(tuple, team))
+
+def offsets_of(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+def compile_tournament(teams_by_name, gauntlets, level_caps, trainer_catalog, pokemon_catalog):
+    """
+    Compile a tournament into a plan of NumPy arrays.
+
+    :param teams_by_name: PokemonVsLeaderTeams.json, team name to a list of [species, ref] build refs.
+    :param gauntlets: tournament_battles.json, lists of [trainer team, pokemon] legs.
+    :param level_caps: Leader name to the level the pokemon are set to against that leader.
+    :param trainer_catalog: BuildCatalog the trainer teams' refs resolve in.
+    :param pokemon_catalog: BuildCatalog the pokemon's refs resolve in.
+    :return: Dict of arrays, see load_plan.
+    """
+    team_names = list(teams_by_name.keys())
+    team_ids = {}  # team_key -> id of the first team with those members
+    member_builds = []
+    member_lengths = []
+    for team_id, (name, team) in enumerate(teams_by_name.items()):
+        team_ids.setdefault(team_key(team), team_id)
+        catalog = trainer_catalog if name.split("_", 1)[0] in level_caps else pokemon_catalog
+        member_builds.extend(catalog.resolve(ref) for ref in team)
+        member_lengths.append(len(team))
+
+    leader_names = list(level_caps.keys())
+    leader_ids = {name: i for i, name in enumerate(leader_names)}
+    species_ids = {}
+    gauntlet_leader = np.zeros(len(gauntlets), dtype=np.int32)
+    gauntlet_species = np.zeros(len(gauntlets), dtype=np.int32)
+    leg_lengths = np.zeros(len(gauntlets), dtype=np.int64)
+    leg_trainer = []
+    leg_pokemon = []
+    for i, gauntlet in enumerate(gauntlets):
+        # the last leg is against the leader's full team
+        leader = team_names[team_ids[team_key(gauntlet[-1][0])]]
+        if leader not in leader_ids:
+            raise KeyError(f"No level cap for leader {leader}")
+        gauntlet_leader[i] = leader_ids[leader]
+        gauntlet_species[i] = species_ids.setdefault(gauntlet[0][1][0], len(species_ids))
+        leg_lengths[i] = len(gauntlet)
+        for trainer_team, pokemon in gauntlet:
+            leg_trainer.append(team_ids[team_key(trainer_team)])
+            leg_pokemon.append(team_ids[(tuple(pokemon),)])
+
+    return {
+        "team_names": np.array(team_names, dtype=str),
+        "member_offsets": offsets_of(member_lengths),
+        "member_builds": np.array(member_builds, dtype=str),
+        "leader_names": np.array(leader_names, dtype=str),
+        "leader_level_caps": np.array([level_caps[name] for name in leader_names], dtype=np.int32),
+        "species_names": np.array(list(species_ids.keys()), dtype=str),
+        "gauntlet_leader": gauntlet_leader,
+        "gauntlet_species": gauntlet_species,
+        "leg_offsets": offsets_of(leg_lengths),
+        "leg_trainer": np.array(leg_trainer, dtype=np.int32),
+        "leg_pokemon": np.array(leg_pokemon, dtype=np.int32),
+    }
+
+def save_plan(plan, plan_path, source):
+    np.savez_compressed(plan_path, source=np.array(source), **plan)
+
+def load_plan(plan_path, source=None):
+    """
+    Load a plan saved by save_plan.
+
+    :param source: plan_source of the inputs, the plan is only returned if it was compiled from the same ones.
+    :return: Dict of the plan's arrays, with every string array turned into a list, or None.
+    """
+    if not os.path.exists(plan_path):
+        return None
+    with np.load(plan_path) as data:
+        if source is not None and str(data["source"]) != source:
+            return None
+        return {name: data[name].tolist() if data[name].dtype.kind == "U" else data[name] for name in data.files if name != "source"}
+
+def load_or_compile(plan_path, teams_path, battles_path, level_caps, trainer_catalog, pokemon_catalog, builds_paths):
+    # The saved plan if its inputs haven't changed, otherwise the tournament is compiled and saved again
+    source = plan_source(teams_path, battles_path, level_caps, builds_paths)
+    plan = load_plan(plan_path, source)
+    if plan is None:
+        with open(teams_path, "r") as infile:
+            teams_by_name = json.load(infile)
+        with open(battles_path, "r") as infile:
+            gauntlets = json.load(infile)
+        save_plan(compile_tournament(teams_by_name, gauntlets, level_caps, trainer_catalog, pokemon_catalog), plan_path, source)
+        plan = load_plan(plan_path)
+    return plan
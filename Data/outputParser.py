@@ -0,0 +1,396 @@
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# =============================================================================
+# Constant-memory parser for output.txt. The file is read in large chunks and
+# each battle is handled as soon as its end marker has been read, so memory use
+# depends on the chunk size and the number of distinct matchups, never on the
+# size of the file. All searching is done with bytes.find/rfind bounded to the
+# current battle, which is far faster than splitting the text in Python.
+# =============================================================================
+
+CHUNK_SIZE = 8 * 1024 * 1024
+MIN_SHARD_SIZE = 8 * 1024 * 1024  # smaller shards cost more in process startup than they save
+AGGREGATE_VERSION = 1
+BATTLE_START = b"[[[[["
+BATTLE_END = b"]]]]]"
+MARKER_LENGTH = 5
+# a "|tie" line on its own, battle_outcome only checks for "|tie" where there is no "|tier|" line
+TIE_LINE = re.compile(rb"^\|tie\r?$", re.MULTILINE)
+
+# Outcome codes, also used as indices into the per-matchup counts
+BOT_1_WIN = 0
+BOT_2_WIN = 1
+TIE = 2
+
+def battle_outcome(data, start, end):
+    # Outcome of the battle in data[start:end], matching the checks the old parser did on the battle text
+    last_win = data.rfind(b"|win|Bot ", start, end)
+    if last_win >= 0 and last_win + 10 <= end:
+        winner = data[last_win + 9:last_win + 10]
+        if winner == b"1":
+            return BOT_1_WIN
+    if data.find(b"|win|Bot 1", start, end) >= 0:
+        return BOT_1_WIN
+    if last_win >= 0 and ((last_win + 10 <= end and winner == b"2") or data.find(b"|win|Bot 2", start, end) >= 0):
+        return BOT_2_WIN
+    # "|tie" also matches every "|tier|" line, so only battles without one count as ties
+    if data.find(b"|tier", start, end) < 0 and data.find(b"|tie", start, end) >= 0:
+        return TIE
+    return None
+
+def battle_result(data, start, end):
+    # Outcome for per battle stats: a "|tie" line is a tie even with a "|tier|" line, which real logs always have.
+    # battle_outcome keeps skipping those so the win/loss reports stay as they were
+    outcome = battle_outcome(data, start, end)
+    if outcome is None and TIE_LINE.search(data, start, end):
+        return TIE
+    return outcome
+
+def battle_header(data, start, end):
+    # First line of data[start:end] containing " vs ", or None if it has no complete header line
+    vs = data.find(b" vs ", start, end)
+    if vs < 0:
+        return None
+    line_end = data.find(b"\n", vs, end)
+    if line_end < 0:
+        return None
+    line_start = data.rfind(b"\n", start, vs)
+    return data[start if line_start < 0 else line_start + 1:line_end]
+
+def scan_battles(file_path, start=0, end=None, closed_end=False, chunk_size=CHUNK_SIZE):
+    return scan_battles_from(file_path, start, end, closed_end, chunk_size)[0]
+
+def scan_battles_from(file_path, start=0, end=None, closed_end=False, chunk_size=CHUNK_SIZE):
+    """
+    Count the outcome of every battle in an output file.
+
+    :return: Tuple of a dict mapping each raw header line to [bot 1 wins, bot 2 wins,
+        ties, outcome of the first battle], in the order the headers were first seen,
+        and the offset to resume from to count the battles appended after end.
+    """
+    counts = {}
+    offset = for_each_battle(file_path, partial(count_battle, counts), start, end, closed_end, chunk_size)
+    return counts, offset
+
+def for_each_battle(file_path, handle_battle, start=0, end=None, closed_end=False, chunk_size=CHUNK_SIZE):
+    """
+    Call handle_battle(data, battle_start, battle_end) for every battle in an output file.
+
+    A battle is the text between two consecutive [[[[[ or ]]]]] markers, the same
+    as the old re.split based parser, so anything before the first marker or after
+    the last one is ignored. Its "A vs B" header is the first line containing " vs ".
+    Bot 1 wins take precedence over Bot 2 wins, then ties, and as before a |tie is
+    ignored if the battle also has a |tier line.
+
+    :param start: Byte offset to start reading from.
+    :param end: Byte offset to stop reading at, or None for the end of the file.
+    :param closed_end: Treat end as a battle marker, used for shards that stop
+        right before the marker that opens the next shard.
+    :return: The offset to resume from to handle the battles appended after end.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = float('inf') if end is None else end - start
+        carry = b""
+        carry_offset = start  # file offset of carry[0]
+        started = False
+        while remaining > 0:
+            chunk = f.read(chunk_size if remaining >= chunk_size else remaining)
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            data = carry + chunk
+            # When started, data begins with the marker that opened the current battle
+            previous = 0 if started else -1
+            search_from = MARKER_LENGTH if started else 0
+            next_start = data.find(BATTLE_START, search_from)
+            next_end = data.find(BATTLE_END, search_from)
+            while True:
+                if next_start < 0:
+                    marker = next_end
+                elif next_end < 0 or next_start < next_end:
+                    marker = next_start
+                else:
+                    marker = next_end
+                if marker < 0:
+                    break
+                if previous >= 0:
+                    handle_battle(data, previous + MARKER_LENGTH, marker)
+                previous = marker
+                if marker == next_start:
+                    next_start = data.find(BATTLE_START, marker + MARKER_LENGTH)
+                else:
+                    next_end = data.find(BATTLE_END, marker + MARKER_LENGTH)
+
+            if previous >= 0:
+                # carry the unfinished battle, starting at its opening marker, into the next chunk
+                started = True
+                carry = data[previous:]
+                carry_offset += previous
+            else:
+                # no marker yet, only keep enough to complete a marker split across chunks
+                carry = data[-(MARKER_LENGTH - 1):]
+                carry_offset += len(data) - len(carry)
+
+    if closed_end and started:
+        handle_battle(carry, MARKER_LENGTH, len(carry))
+        carry_offset += len(carry)
+    # the unfinished battle is handled again from its opening marker on the next scan
+    return carry_offset
+
+def count_battle(counts, data, start, end):
+    header = battle_header(data, start, end)
+    if header is None:
+        return
+    outcome = battle_outcome(data, start, end)
+    if outcome is None:
+        return
+    record = counts.get(header)
+    if record is None:
+        record = counts[header] = [0, 0, 0, outcome]
+    record[outcome] += 1
+
+def decode_header(header):
+    bot_1, bot_2 = header.rstrip(b"\r").decode("utf-8", errors="replace").split(" vs ", 1)
+    return bot_1, bot_2
+
+# =============================================================================
+# Aggregates: {(bot 1, bot 2): [bot 1 wins, bot 2 wins, ties, first outcome]},
+# in the order matchups were first seen. Aggregates of consecutive parts of an
+# output merge exactly into the aggregate of the whole output.
+# =============================================================================
+
+def to_aggregate(counts):
+    aggregate = {}
+    for header, record in counts.items():
+        merge_record(aggregate, decode_header(header), record)
+    return aggregate
+
+def merge_record(aggregate, matchup, record):
+    existing = aggregate.get(matchup)
+    if existing is None:
+        aggregate[matchup] = list(record)
+    else:
+        existing[0] += record[0]
+        existing[1] += record[1]
+        existing[2] += record[2]
+
+def merge_aggregates(*aggregates):
+    # Aggregates must be given in file order for the result to keep first-seen order
+    merged = {}
+    for aggregate in aggregates:
+        for matchup, record in aggregate.items():
+            merge_record(merged, matchup, record)
+    return merged
+
+def aggregate_to_matchups(aggregate):
+    return [[bot_1, bot_2] + record for (bot_1, bot_2), record in aggregate.items()]
+
+def matchups_to_aggregate(matchups):
+    return {(bot_1, bot_2): [bot_1_wins, bot_2_wins, ties, first] for bot_1, bot_2, bot_1_wins, bot_2_wins, ties, first in matchups}
+
+def save_aggregate(aggregate, file_path):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({"version": AGGREGATE_VERSION, "matchups": aggregate_to_matchups(aggregate)}, f)
+
+def load_aggregate(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != AGGREGATE_VERSION:
+        raise ValueError(f"Unsupported aggregate version in {file_path}: {data.get('version')}")
+    return matchups_to_aggregate(data["matchups"])
+
+def scan_aggregate(file_path, start=0, end=None, closed_end=False, chunk_size=CHUNK_SIZE):
+    return to_aggregate(scan_battles(file_path, start, end, closed_end, chunk_size))
+
+def build_results(aggregate):
+    # Turn an aggregate into the trainer_stats and battle_matrix parse_battles has always returned
+    trainer_stats = defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0})
+    battle_matrix = defaultdict(lambda: defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0}))
+
+    for (bot_1, bot_2), (bot_1_wins, bot_2_wins, ties, first_outcome) in aggregate.items():
+        # Touch the entries in the same order a battle by battle parse would, so dict order is unchanged
+        stats_1, stats_2 = trainer_stats[bot_1], trainer_stats[bot_2]
+        if first_outcome == BOT_2_WIN:
+            record_2 = battle_matrix[bot_2][bot_1]
+            record_1 = battle_matrix[bot_1][bot_2]
+        else:
+            record_1 = battle_matrix[bot_1][bot_2]
+            record_2 = battle_matrix[bot_2][bot_1]
+
+        stats_1['wins'] += bot_1_wins
+        stats_2['losses'] += bot_1_wins
+        record_1['wins'] += bot_1_wins
+        record_2['losses'] += bot_1_wins
+
+        stats_1['losses'] += bot_2_wins
+        stats_2['wins'] += bot_2_wins
+        record_2['wins'] += bot_2_wins
+        record_1['losses'] += bot_2_wins
+
+        stats_1['ties'] += ties
+        stats_2['ties'] += ties
+        record_1['ties'] += ties
+        record_2['ties'] += ties
+
+    for trainer in trainer_stats:
+        wins = trainer_stats[trainer]['wins']
+        losses = trainer_stats[trainer]['losses']
+        trainer_stats[trainer]['win_loss_ratio'] = wins / losses if losses != 0 else float('inf')
+
+    sorted_trainer_stats = sorted(trainer_stats.items(), key=lambda item: item[1]['wins'], reverse=True)
+    return sorted_trainer_stats, battle_matrix
+
+def parse_battles(file_path, chunk_size=CHUNK_SIZE):
+    return build_results(scan_aggregate(file_path, chunk_size=chunk_size))
+
+# =============================================================================
+# Sharded parsing. Files are cut into shards at battle markers that start a
+# line, each shard is scanned in its own process, and the partial aggregates
+# are merged in file order.
+# =============================================================================
+
+def next_marker_line(f, offset, chunk_size=1024 * 1024):
+    # Offset of the first battle marker at the start of a line at or after offset, or None
+    f.seek(max(offset - 1, 0))
+    position = max(offset - 1, 0)
+    carry = b""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return None
+        data = carry + chunk
+        found = [i for i in (data.find(b"\n" + BATTLE_START), data.find(b"\n" + BATTLE_END)) if i >= 0]
+        if found:
+            return position - len(carry) + min(found) + 1
+        carry = data[-MARKER_LENGTH:]
+        position += len(chunk)
+
+def shard_boundaries(file_path, shard_count):
+    """
+    Split a file into at most shard_count byte ranges that each start at a battle marker.
+
+    :return: List of (start, end, closed_end) tuples to pass to scan_battles.
+    """
+    size = os.path.getsize(file_path)
+    shard_count = max(1, min(shard_count, size // MIN_SHARD_SIZE))
+    starts = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, shard_count):
+            offset = next_marker_line(f, size * i // shard_count)
+            if offset is not None and offset > starts[-1]:
+                starts.append(offset)
+    ends = starts[1:] + [size]
+    # every shard but the last ends right before a marker, so its final battle is complete
+    return [(start, end, end != size) for start, end in zip(starts, ends)]
+
+def scan_shard(shard):
+    file_path, start, end, closed_end = shard
+    return scan_aggregate(file_path, start, end, closed_end)
+
+def worker_output_files(directory="WorkerOutputs"):
+    # Worker outputs in the order runSimulations.py concatenates them into output.txt
+    names = [name[:-4] for name in os.listdir(directory) if name.endswith(".txt") and name[:-4].isdigit()]
+    names.sort(key=lambda name: (int(name) == 0, int(name)))
+    return [os.path.join(directory, name + ".txt") for name in names]
+
+def parse_aggregate_parallel(file_paths, shard_count=None):
+    """
+    Parse one or more output files across processes into a single aggregate.
+
+    Each file is parsed as its own output, e.g. the per-worker files in WorkerOutputs.
+
+    :param shard_count: Number of shards per file, defaults to the number of CPUs.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    shard_count = shard_count or os.cpu_count() or 1
+    shards = [(file_path,) + boundary for file_path in file_paths for boundary in shard_boundaries(file_path, shard_count)]
+    if len(shards) == 1:
+        return scan_shard(shards[0])
+    with ProcessPoolExecutor(max_workers=min(len(shards), shard_count)) as executor:
+        return merge_aggregates(*executor.map(scan_shard, shards))
+
+def parse_battles_parallel(file_paths, shard_count=None):
+    return build_results(parse_aggregate_parallel(file_paths, shard_count))
+
+# =============================================================================
+# Incremental parsing. The aggregate of everything parsed so far is saved to a
+# state file along with the offset of the last battle marker, so the next parse
+# of a growing output only reads the battles appended since. The state is
+# thrown away if the file was truncated or rewritten in the meantime.
+# =============================================================================
+
+STATE_VERSION = 1
+FINGERPRINT_SIZE = 64 * 1024
+
+def default_state_path(file_path):
+    return file_path + ".parse_state.json"
+
+def file_fingerprint(f, size):
+    # Hashes of the first and last FINGERPRINT_SIZE bytes of the first size bytes of a file
+    f.seek(0)
+    head = hashlib.sha1(f.read(min(size, FINGERPRINT_SIZE))).hexdigest()
+    f.seek(max(size - FINGERPRINT_SIZE, 0))
+    tail = hashlib.sha1(f.read(min(size, FINGERPRINT_SIZE))).hexdigest()
+    return head, tail
+
+def load_parse_state(file_path, state_path):
+    # Saved state for file_path, or None if there is none or the file no longer starts with what was parsed
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != STATE_VERSION or state.get("aggregate_version") != AGGREGATE_VERSION:
+        return None
+    size = os.path.getsize(file_path)
+    if size < state["size"]:
+        return None  # truncated, e.g. output.txt is cleared at the start of every run
+    with open(file_path, "rb") as f:
+        if list(file_fingerprint(f, state["size"])) != [state["head"], state["tail"]]:
+            return None  # rewritten
+    return state
+
+def save_parse_state(state_path, size, head, tail, offset, aggregate):
+    state = {"version": STATE_VERSION, "aggregate_version": AGGREGATE_VERSION, "size": size,
+             "head": head, "tail": tail, "offset": offset, "matchups": aggregate_to_matchups(aggregate)}
+    # write to a temporary file first so an interrupted save never leaves a broken state behind
+    temp_path = state_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+def scan_aggregate_incremental(file_path, state_path=None, chunk_size=CHUNK_SIZE):
+    """
+    Aggregate of a growing output file, only parsing what was appended since the last call.
+
+    Battles still being written when the file is parsed are picked up on the next call.
+    A change to the file that keeps its size, first and last 64KB is not detected, so
+    remove the state file after editing an output by hand.
+
+    :param state_path: Where to keep the parse state, defaults to file_path + ".parse_state.json".
+    """
+    state_path = state_path or default_state_path(file_path)
+    state = load_parse_state(file_path, state_path)
+    # only parse up to the current size, so the fingerprint matches what was parsed even if the file grows meanwhile
+    size = os.path.getsize(file_path)
+    if state is None:
+        aggregate, start = {}, 0
+    else:
+        aggregate, start = matchups_to_aggregate(state["matchups"]), state["offset"]
+        if size == state["size"]:
+            return aggregate
+
+    counts, offset = scan_battles_from(file_path, start, size, chunk_size=chunk_size)
+    aggregate = merge_aggregates(aggregate, to_aggregate(counts))
+    with open(file_path, "rb") as f:
+        head, tail = file_fingerprint(f, size)
+    save_parse_state(state_path, size, head, tail, offset, aggregate)
+    return aggregate
@@ -0,0 +1,59 @@
+import math
+
+# =============================================================================
+# Racing candidates to find the best one with as few battles as possible.
+# Every candidate starts with a small budget of plays. After each rung the
+# candidates that are clearly worse than the leader by Hoeffding confidence
+# bounds are dropped, then only the top 1/eta by mean are kept, and the
+# survivors' budget grows by `growth`. Candidates with the same mean keep
+# their order, so give them best guess first. With growth < eta the plays per
+# rung shrink geometrically, so a race costs a few plays per candidate in
+# total instead of a full evaluation of every candidate. The winner's mean is
+# from a few plays only, score it properly before reporting it.
+# =============================================================================
+
+def confidence_radius(count, delta=0.05):
+    # Hoeffding bound on how far the mean of count results in [0, 1] can be from the true mean, with probability 1 - delta
+    return math.sqrt(math.log(2 / delta) / (2 * count)) if count else math.inf
+
+def race(candidates, play, initial_budget=1, growth=2, eta=4, max_budget=None, delta=0.05):
+    """
+    Successive halving over candidates, also eliminating candidates by confidence bounds.
+
+    Candidates that survive a rung have all been played the same number of times,
+    so they are compared on equal terms.
+
+    :param candidates: List of candidates, e.g. gauntlet ids, most promising first, as ties keep this order.
+    :param play: function(candidate, step) -> result in [0, 1], step counting the
+        candidate's plays from 0, e.g. to cycle through the legs of a gauntlet.
+    :param initial_budget: Plays each candidate gets in the first rung.
+    :param growth: Factor the plays of the survivors grow by each rung.
+    :param eta: Only the best 1/eta of the candidates survive a rung.
+    :param max_budget: Most plays a candidate gets, the race ends once the survivors have had them.
+    :return: Tuple of the winner (None if there are no candidates) and a dict of
+        candidate -> {'plays', 'mean'} for every candidate.
+    """
+    totals = {candidate: 0.0 for candidate in candidates}
+    plays = {candidate: 0 for candidate in candidates}
+    alive = list(candidates)
+    budget = initial_budget if max_budget is None else min(initial_budget, max_budget)
+
+    def mean(candidate):
+        return totals[candidate] / plays[candidate] if plays[candidate] else 0.0
+
+    while alive:
+        for candidate in alive:
+            while plays[candidate] < budget:
+                totals[candidate] += play(candidate, plays[candidate])
+                plays[candidate] += 1
+        if len(alive) == 1 or (max_budget is not None and budget >= max_budget):
+            break
+        radius = confidence_radius(budget, delta)
+        best_lower = max(mean(candidate) for candidate in alive) - radius
+        alive = [candidate for candidate in alive if mean(candidate) + radius >= best_lower]
+        alive.sort(key=mean, reverse=True)
+        alive = alive[:max(1, math.ceil(len(alive) / eta))]
+        budget = math.ceil(budget * growth) if max_budget is None else min(math.ceil(budget * growth), max_budget)
+
+    winner = max(alive, key=mean) if alive else None
+    return winner, {candidate: {'plays': plays[candidate], 'mean': mean(candidate)} for candidate in candidates}
@@ -0,0 +1,131 @@
+import csv
+import math
+import os
+
+import numpy as np
+
+from battleMatrix import WINS, LOSSES, TIES
+
+# =============================================================================
+# Bradley-Terry ratings fitted straight from a BattleMatrix. Unlike overall
+# wins they account for who each trainer played, so they stay fair with
+# partial, Swiss or adaptive schedules. Strengths are fitted with Newton's
+# method on whole arrays, and bootstrap resamples are fitted together as a
+# batch. Ratings are reported on the Elo scale, where a 400 point gap means
+# the stronger trainer is expected to win 10 battles for every 1 they lose.
+# =============================================================================
+
+ELO_BASE = 1500
+ELO_SCALE = 400 / math.log(10)
+
+def win_counts(counts):
+    # Wins of i over j with each tie counted as half a win for both trainers, battles against themselves dropped
+    wins = counts[..., WINS] + 0.5 * counts[..., TIES]
+    size = wins.shape[-1]
+    wins[..., np.arange(size), np.arange(size)] = 0
+    return wins
+
+def fit_bradley_terry(wins, initial=None, prior=1.0, tolerance=1e-9, max_iterations=100):
+    """
+    Fit Bradley-Terry log strengths by maximum likelihood with Newton's method.
+
+    Each trainer also gets prior wins and prior losses against a virtual trainer
+    of log strength 0. This keeps the fit finite for trainers that won or lost
+    every battle and pulls trainers with few battles towards the average.
+
+    :param wins: Array of shape (..., n, n), wins[..., i, j] being how often i beat j.
+        Leading dimensions are fitted independently, e.g. a batch of bootstrap resamples.
+    :param initial: Log strengths to start from, e.g. the previous fit when results were added.
+    :return: Log strengths of shape (..., n), with a mean of 0 over each fit.
+    """
+    games = wins + np.swapaxes(wins, -1, -2)
+    total_wins = wins.sum(axis=-1) + prior
+    size = wins.shape[-1]
+    log_strengths = np.zeros(wins.shape[:-1]) if initial is None else np.array(np.broadcast_to(initial, wins.shape[:-1]), dtype=np.float64)
+    diagonal = np.arange(size)
+    for _ in range(max_iterations):
+        # probability of i beating j, and of beating the virtual trainer
+        beats = 1 / (1 + np.exp(log_strengths[..., None, :] - log_strengths[..., :, None]))
+        beats_prior = 1 / (1 + np.exp(-log_strengths))
+        gradient = total_wins - (games * beats).sum(axis=-1) - 2 * prior * beats_prior
+        # the likelihood is concave, so the negated hessian is positive definite
+        hessian = -games * beats * (1 - beats)
+        hessian[..., diagonal, diagonal] = 0
+        hessian[..., diagonal, diagonal] = -hessian.sum(axis=-1) + 2 * prior * beats_prior * (1 - beats_prior)
+        step = np.linalg.solve(hessian, gradient[..., None])[..., 0]
+        # keep the first steps from far off starting points in a sensible range
+        log_strengths = log_strengths + np.clip(step, -2, 2)
+        if np.abs(step).max() < tolerance:
+            break
+    return log_strengths - log_strengths.mean(axis=-1, keepdims=True)
+
+def to_elo(log_strengths):
+    return ELO_BASE + ELO_SCALE * log_strengths
+
+def bootstrap_log_strengths(counts, log_strengths, resamples=1000, batch_size=100, prior=1.0, seed=0):
+    """
+    Refit on resampled results, resampling the wins, losses and ties of every pairing
+    from its own observed rates. Resamples are fitted batch_size at a time, each batch
+    starting from the fitted log strengths.
+
+    :return: Array of shape (resamples, n) of log strengths.
+    """
+    rng = np.random.default_rng(seed)
+    size = counts.shape[0]
+    first, second = np.triu_indices(size, k=1)
+    pair_counts = counts[first, second].astype(np.int64)
+    battles = pair_counts.sum(axis=1)
+    played = battles > 0
+    first, second, pair_counts, battles = first[played], second[played], pair_counts[played], battles[played]
+    rates = pair_counts / battles[:, None]
+
+    results = []
+    for batch_start in range(0, resamples, batch_size):
+        batch = min(batch_size, resamples - batch_start)
+        sampled = rng.multinomial(battles, rates, size=(batch, len(battles)))
+        wins = np.zeros((batch, size, size))
+        wins[:, first, second] = sampled[..., WINS] + 0.5 * sampled[..., TIES]
+        wins[:, second, first] = sampled[..., LOSSES] + 0.5 * sampled[..., TIES]
+        results.append(fit_bradley_terry(wins, log_strengths, prior))
+    return np.concatenate(results) if results else np.zeros((0, size))
+
+def rate(matrix, resamples=1000, confidence=0.95, previous=None, prior=1.0, seed=0):
+    """
+    Bradley-Terry ratings of every trainer in a BattleMatrix, with bootstrap confidence intervals.
+
+    :param resamples: Number of bootstrap resamples, 0 to skip the confidence intervals.
+    :param previous: Ratings from an earlier call or load_ratings, used as the starting
+        point so refitting after new results arrive takes fewer iterations.
+    :return: Dict mapping trainer name to {'elo', 'elo_low', 'elo_high', 'log_strength'}.
+    """
+    initial = None
+    if previous:
+        initial = np.array([previous[trainer]['log_strength'] if trainer in previous else 0.0 for trainer in matrix.trainers])
+    log_strengths = fit_bradley_terry(win_counts(matrix.counts.astype(np.float64)), initial, prior)
+    elo = to_elo(log_strengths)
+    low = high = np.full(len(elo), np.nan)
+    if resamples:
+        samples = to_elo(bootstrap_log_strengths(matrix.counts, log_strengths, resamples, prior=prior, seed=seed))
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.percentile(samples, [tail, 100 - tail], axis=0)
+    return {trainer: {'elo': elo[i].item(), 'elo_low': low[i].item(), 'elo_high': high[i].item(), 'log_strength': log_strengths[i].item()}
+            for i, trainer in enumerate(matrix.trainers)}
+
+def rating_order(matrix, ratings):
+    # Trainer indices by rating, highest first
+    return np.argsort([-ratings[trainer]['elo'] for trainer in matrix.trainers], kind="stable")
+
+def save_ratings(ratings, filename):
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Trainer", "Elo", "Elo Low", "Elo High", "Log Strength"])
+        for trainer, rating in sorted(ratings.items(), key=lambda item: item[1]['elo'], reverse=True):
+            writer.writerow([trainer, round(rating['elo'], 1), round(rating['elo_low'], 1), round(rating['elo_high'], 1), rating['log_strength']])
+
+def load_ratings(filename):
+    # Ratings saved by save_ratings, or None if there are none yet
+    if not os.path.exists(filename):
+        return None
+    with open(filename, mode='r', newline='') as file:
+        return {row["Trainer"]: {'elo': float(row["Elo"]), 'elo_low': float(row["Elo Low"]), 'elo_high': float(row["Elo High"]),
+                                 'log_strength': float(row["Log Strength"])} for row in csv.DictReader(file)}
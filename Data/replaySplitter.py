@@ -0,0 +1,73 @@
+import json
+import os
+import re
+import time
+
+def sanitize_filename(value):
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip())
+    safe = safe.strip("._-")
+    return safe if safe else "Unknown"
+
+def extract_trainers(battle_text):
+    for line in battle_text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("|"):
+            continue
+        if " vs " in line:
+            left, right = line.split(" vs ", 1)
+            return left.strip(), right.strip()
+    return "Unknown", "Unknown"
+
+def extract_replay_log(battle_text):
+    return "\n".join(line for line in battle_text.splitlines() if line.startswith("|"))
+
+def write_replay_html(log_text, file_path):
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html>\n")
+        f.write('<script type="text/plain" class="battle-log-data">')
+        f.write(log_text)
+        f.write("</script>\n")
+        f.write('<script src="https://play.pokemonshowdown.com/js/replay-embed.js"></script>\n')
+
+def split_output_to_replays(output_path, output_root, run_tag=None):
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(f"Output file not found: {output_path}")
+    if run_tag is None:
+        run_tag = time.strftime("%Y%m%d_%H%M%S")
+    output_dir = os.path.join(output_root, run_tag)
+    matchup_dir = os.path.join(output_dir, "by_matchup")
+    trainer_dir = os.path.join(output_dir, "by_trainer")
+    os.makedirs(matchup_dir, exist_ok=True)
+    os.makedirs(trainer_dir, exist_ok=True)
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    raw_battles = re.split(r"\[\[\[\[\[|\]\]\]\]\]", content)
+    battles = [b for b in raw_battles if b.strip()]
+
+    trainer_index = {}
+    for idx, battle in enumerate(battles, start=1):
+        trainer_1, trainer_2 = extract_trainers(battle)
+        safe_1 = sanitize_filename(trainer_1)
+        safe_2 = sanitize_filename(trainer_2)
+        file_name = f"{safe_1}_vs_{safe_2}__{idx:06d}.html"
+        file_path = os.path.join(matchup_dir, file_name)
+        log_text = extract_replay_log(battle)
+        if not log_text:
+            continue
+        write_replay_html(log_text, file_path)
+        rel_path = os.path.join("by_matchup", file_name)
+        trainer_index.setdefault(trainer_1, []).append(rel_path)
+        trainer_index.setdefault(trainer_2, []).append(rel_path)
+
+    with open(os.path.join(output_dir, "trainer_index.json"), "w", encoding="utf-8") as f:
+        json.dump(trainer_index, f, indent=2)
+
+    for trainer, rel_paths in trainer_index.items():
+        safe_trainer = sanitize_filename(trainer)
+        trainer_index_path = os.path.join(trainer_dir, f"{safe_trainer}.txt")
+        with open(trainer_index_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(rel_paths))
+            f.write("\n")
+    return output_dir
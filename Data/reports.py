@@ -0,0 +1,255 @@
+import csv
+import json
+import os
+import numpy as np
+from matplotlib import font_manager
+from matplotlib.colors import LinearSegmentedColormap, to_rgb
+from PIL import Image, ImageDraw, ImageFont
+
+from battleMatrix import WINS, LOSSES, TIES
+from ratings import rating_order
+
+# =============================================================================
+# Console, CSV and PNG reports, all driven from a BattleMatrix
+# =============================================================================
+
+def record_strings(counts):
+    # "3W-1L-0T" for every [wins, losses, ties] in an array of records
+    return np.char.add(np.char.add(np.char.add(np.char.add(np.char.add(
+        counts[..., WINS].astype(str), "W-"), counts[..., LOSSES].astype(str)), "L-"), counts[..., TIES].astype(str)), "T")
+
+def print_battle_matrix(matrix):
+    # Sort trainers by overall wins in descending order
+    matrix = matrix.sorted()
+    cells = record_strings(matrix.counts)
+    np.fill_diagonal(cells, "---")  # Placeholder for battles against themselves
+    overall = record_strings(matrix.overall())
+
+    # Print the header row
+    print(f"{'':>12}" + "".join(f"{trainer:>12}" for trainer in matrix.trainers) + f"{' Overall':>18}")
+
+    # Print each row of the matrix, with the overall wins, losses, and ties
+    for trainer, row, overall_str in zip(matrix.trainers, cells, overall):
+        print(f"{trainer:>12}" + "".join(f"{result_str:>12}" for result_str in row) + f"{overall_str:>18}")
+
+def save_to_csv(data, filename, ratings=None):
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        # Write the header, with the Elo rating and its confidence interval if given
+        writer.writerow(["Trainer", "Wins", "Losses", "Ties", "Win/Loss Ratio"] + (["Elo", "Elo Low", "Elo High"] if ratings else []))
+
+        # Write the data
+        for trainer, record in data:
+            row = [trainer, record['wins'], record['losses'], record['ties'], record['win_loss_ratio']]
+            if ratings:
+                rating = ratings[trainer]
+                row += [round(rating['elo'], 1), round(rating['elo_low'], 1), round(rating['elo_high'], 1)]
+            writer.writerow(row)
+
+def save_matrix_to_csv(matrix, filename):
+    cells = record_strings(matrix.counts)
+    np.fill_diagonal(cells, "---")  # Placeholder for battles against themselves
+
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.writer(file)
+
+        # Write the header row
+        writer.writerow(["Trainer"] + matrix.trainers)
+
+        # Write each row of the matrix
+        for trainer, row in zip(matrix.trainers, cells):
+            writer.writerow([trainer] + row.tolist())
+
+def save_to_json(matrix, filename):
+    # Trainer stats and every head to head record, keyed by trainer name
+    battle_matrix = {}
+    for i, trainer1 in enumerate(matrix.trainers):
+        battle_matrix[trainer1] = {trainer2: {'wins': int(wins), 'losses': int(losses), 'ties': int(ties)}
+                                   for trainer2, (wins, losses, ties) in zip(matrix.trainers, matrix.counts[i]) if wins or losses or ties}
+    trainer_stats = []
+    for trainer, record in matrix.trainer_stats():
+        # JSON has no infinity, an unbeaten trainer's ratio is written as null
+        ratio = record['win_loss_ratio'] if record['losses'] != 0 else None
+        trainer_stats.append({'trainer': trainer, **record, 'win_loss_ratio': ratio})
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump({"trainer_stats": trainer_stats, "battle_matrix": battle_matrix}, file, indent=2)
+
+# =============================================================================
+# Battle matrix plot. The whole matrix is drawn straight into an image array
+# with PIL text on top, instead of one matplotlib patch and text artist per
+# cell. Rows run from the best trainer at the top, columns from the worst on
+# the left, followed by a purple overall column.
+# =============================================================================
+
+BACKGROUND = (255, 255, 255)
+GRID_COLOR = (0, 0, 0)
+
+def load_font(size, bold=False):
+    # Use matplotlib's bundled DejaVu Sans so the plot looks the same everywhere
+    try:
+        path = font_manager.findfont(font_manager.FontProperties(family="DejaVu Sans", weight="bold" if bold else "normal"))
+        return ImageFont.truetype(path, size)
+    except (OSError, ValueError):
+        return ImageFont.load_default()
+
+def cell_colors(matrix):
+    """
+    RGB colour and text of every cell of a sorted matrix, including the overall column
+    and the blank purple column, laid out as they are drawn.
+    """
+    size = len(matrix)
+    wins = matrix.counts[:, ::-1, WINS]  # Reverse order for x-axis
+    own = (np.arange(size), size - 1 - np.arange(size))  # battles against themselves
+    off_diagonal = np.ones((size, size), dtype=bool)
+    off_diagonal[own] = False
+    max_wins = int(wins[off_diagonal].max()) if off_diagonal.any() else 0  # maximum number of wins for color scaling
+
+    # Create a custom colormap for the main matrix (dark red to green)
+    main_cmap = LinearSegmentedColormap.from_list("main_cmap", ["darkred", "green"], N=max_wins+1)
+    colors = np.empty((size, size + 2, 3), dtype=np.uint8)
+    colors[:, :size] = np.round(main_cmap(wins / max(max_wins, 1))[..., :3] * 255)
+    colors[own] = BACKGROUND
+    colors[:, size:] = np.round(np.array(to_rgb("purple")) * 255)
+
+    text = wins.astype(str)
+    text[own] = ""
+    return colors, text, matrix.overall_wins().astype(str)
+
+def draw_cells(colors, cell_size, grid_width, merge_last_columns=False):
+    # Scale every cell up to cell_size pixels and draw the grid around them
+    image = np.repeat(np.repeat(colors, cell_size, axis=0), cell_size, axis=1)
+    for offset in range(grid_width):
+        image[offset::cell_size, :] = GRID_COLOR
+        image[:, offset::cell_size] = GRID_COLOR
+        image[-1 - offset, :] = GRID_COLOR
+        image[:, -1 - offset] = GRID_COLOR
+    if merge_last_columns:
+        # the overall column and the blank purple column form a single block
+        boundary = image.shape[1] - cell_size
+        image[:, boundary:boundary + grid_width] = image[:, boundary + grid_width:boundary + grid_width + 1]
+    return Image.fromarray(image)
+
+def fit_font(text, size, max_width, bold=False):
+    # Largest font up to size that fits text within max_width pixels
+    font = load_font(size, bold)
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    while size > 8 and measure.textlength(text, font=font) > max_width:
+        size = int(size * 0.9)
+        font = load_font(size, bold)
+    return font
+
+def draw_column_labels(labels, cell_size, height, font):
+    # Labels read bottom to top, ending right under their column
+    strip = Image.new("RGB", (height, len(labels) * cell_size), BACKGROUND)
+    draw = ImageDraw.Draw(strip)
+    for i, label in enumerate(labels):
+        draw.text((height - cell_size // 4, i * cell_size + cell_size // 2), label, fill="black", font=font, anchor="rm")
+    return strip.rotate(90, expand=True)
+
+def render_matrix(matrix, rows, columns, cell_size, with_overall, title=None, subtitle=None, row_labels=None):
+    """
+    Render part of a sorted matrix as a PIL image.
+
+    :param rows: Range of rows (best trainer first) to draw.
+    :param columns: Range of main matrix columns (worst trainer first) to draw.
+    :param with_overall: Also draw the overall column and the blank purple column.
+    :param row_labels: Label for every row of the matrix, defaults to the trainer names.
+    """
+    size = len(matrix)
+    colors, text, overall = cell_colors(matrix)
+    column_list = list(columns) + ([size, size + 1] if with_overall else [])
+    colors = colors[np.ix_(list(rows), column_list)]
+
+    label_font = load_font(max(8, cell_size * 2 // 5))
+    cell_font = load_font(max(6, cell_size * 2 // 5))
+    bold_font = load_font(max(6, cell_size * 2 // 5), bold=True)
+
+    column_trainers = matrix.trainers[::-1]
+    row_labels = row_labels or matrix.trainers
+    column_labels = [column_trainers[j] for j in columns] + (["Overall", ""] if with_overall else [])
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    label_length = max([measure.textlength(label, font=label_font) for label in matrix.trainers + row_labels + ["Overall"]]) + cell_size // 2
+    label_length = int(label_length)
+    title_height = cell_size * 4 if title else cell_size // 2
+
+    cells = draw_cells(colors, cell_size, max(1, cell_size // 24), with_overall)
+    width = label_length + cells.width + cell_size // 2
+    height = title_height + cells.height + label_length
+    canvas = Image.new("RGB", (width, height), BACKGROUND)
+    canvas.paste(cells, (label_length, title_height))
+    draw = ImageDraw.Draw(canvas)
+
+    # Place the text for battle results
+    for y, i in enumerate(rows):
+        center_y = title_height + y * cell_size + cell_size // 2
+        for x, j in enumerate(columns):
+            if text[i, j]:
+                draw.text((label_length + x * cell_size + cell_size // 2, center_y), text[i, j], fill="white", font=cell_font, anchor="mm")
+        if with_overall:
+            # Overall wins are centered across the overall and blank purple columns
+            draw.text((label_length + len(columns) * cell_size + cell_size, center_y), overall[i], fill="white", font=bold_font, anchor="mm")
+        draw.text((label_length - cell_size // 4, center_y), row_labels[i], fill="black", font=label_font, anchor="rm")
+
+    labels = draw_column_labels(column_labels, cell_size, label_length, label_font)
+    if with_overall:
+        # Move the 'Overall' label under the middle of its two columns
+        overall_label = labels.crop((labels.width - 2 * cell_size, 0, labels.width - cell_size, labels.height))
+        labels.paste(Image.new("RGB", (2 * cell_size, labels.height), BACKGROUND), (labels.width - 2 * cell_size, 0))
+        labels.paste(overall_label, (labels.width - 2 * cell_size + cell_size // 2, 0))
+    canvas.paste(labels, (label_length, title_height + cells.height))
+
+    # Set titles
+    if title:
+        title_font = fit_font(title, max(12, cell_size * 2), width - cell_size, bold=True)
+        draw.text((width // 2, title_height // 3), title, fill="black", font=title_font, anchor="mm")
+    if subtitle:
+        subtitle_font = fit_font(subtitle, max(10, cell_size), width - cell_size)
+        draw.text((width - cell_size // 2, title_height - cell_size // 2), subtitle, fill="black", font=subtitle_font, anchor="rb")
+    return canvas
+
+def battles_per_matchup(matrix):
+    # Most common number of battles between two different trainers
+    played = matrix.counts.sum(axis=2)
+    played = played[~np.eye(len(matrix), dtype=bool) & (played > 0)]
+    return int(np.bincount(played).argmax()) if played.size else 0
+
+def plot_battle_matrix(matrix, file_path="battle_matrix_plot.png", cell_size=48, tile_size=None, ratings=None):
+    """
+    Draw the battle matrix to a png.
+
+    :param cell_size: Width and height of each cell in pixels.
+    :param ratings: Ratings from ratings.rate, if given trainers are ordered by rating
+        instead of overall wins and each row is labelled with its Elo.
+    :param tile_size: If the matrix has more trainers than this, write it as tiles of
+        tile_size by tile_size cells (file_path with _r<row>_c<column> appended) plus an
+        overview at file_path with one small colour block per cell.
+    :return: List of the files written.
+    """
+    # Sort trainers by overall wins (or rating) in descending order
+    matrix = matrix.take(rating_order(matrix, ratings)) if ratings else matrix.sorted()
+    size = len(matrix)
+    row_labels = [f"{trainer} ({ratings[trainer]['elo']:.0f})" for trainer in matrix.trainers] if ratings else None
+    title = "Ultimate Pokemon Trainer Rankings"
+    subtitle = f"{battles_per_matchup(matrix)} battles per matchup"
+
+    if tile_size is None or size <= tile_size:
+        render_matrix(matrix, range(size), range(size), cell_size, True, title, subtitle, row_labels).save(file_path)
+        return [file_path]
+
+    stem, extension = os.path.splitext(file_path)
+    written = []
+    starts = list(range(0, size, tile_size))
+    for row, row_start in enumerate(starts):
+        for column, column_start in enumerate(starts):
+            rows = range(row_start, min(row_start + tile_size, size))
+            columns = range(column_start, min(column_start + tile_size, size))
+            tile_path = f"{stem}_r{row:02d}_c{column:02d}{extension}"
+            render_matrix(matrix, rows, columns, cell_size, column_start + tile_size >= size, row_labels=row_labels).save(tile_path)
+            written.append(tile_path)
+
+    # Overview of the whole matrix to find the tiles worth zooming into
+    colors, _, _ = cell_colors(matrix)
+    overview_cell = max(2, 4096 // (size + 2))
+    draw_cells(colors, overview_cell, 0, True).save(file_path)
+    written.append(file_path)
+    return written
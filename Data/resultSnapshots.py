@@ -0,0 +1,209 @@
+import argparse
+import json
+import socket
+import time
+import uuid
+
+import numpy as np
+
+from battleMatrix import BattleMatrix
+from outputParser import merge_record, parse_aggregate_parallel, worker_output_files
+from resultsDb import DB_PATH, connect, load_aggregate as load_run_aggregate, resolve_run
+
+# =============================================================================
+# Snapshots of aggregated results, so a tournament split across machines is
+# combined by merging small files instead of concatenating and re-parsing the
+# raw output. A snapshot holds:
+#   aggregate  outputParser aggregate, the wins/losses/ties of every "A vs B",
+#              from which BattleMatrix.from_aggregate makes the W/L/T matrix
+#   results    Pokemon mode's best score per leader and species (scores.json)
+#   builds     the build that got that score (builds.json)
+#   runs       where each merged part came from: id, host, time, mode, sources
+#
+# Merging is exact and associative: merging the snapshots of consecutive
+# parts of an output gives the snapshot of the whole output, in any grouping.
+# Like concatenating outputs, the order matters only for which trainer is
+# listed first. A score is replaced only by a higher one, so on a tie the
+# build of the earlier snapshot is kept, as the runner keeps the first build
+# to reach a score. Merging a part twice would count it twice, so a run id
+# seen twice is refused.
+#
+# Snapshots are saved as compressed .npz, pairings as arrays of trainer
+# indices and the rest as a JSON string, and load without pickle.
+# =============================================================================
+
+SNAPSHOT_VERSION = 1
+
+def new_snapshot(aggregate=None, results=None, builds=None, runs=None):
+    return {"aggregate": aggregate or {}, "results": results or {}, "builds": builds or {}, "runs": runs or []}
+
+def run_metadata(mode, sources, battles=None, note=None):
+    # Where a snapshot's results came from, one entry per part in a merged snapshot
+    return {"id": uuid.uuid4().hex, "host": socket.gethostname(), "created": time.time(), "mode": mode,
+            "sources": list(sources), "battles": battles, "note": note}
+
+def battle_count(aggregate):
+    return int(sum(record[0] + record[1] + record[2] for record in aggregate.values()))
+
+def merge_scores(results, builds, other_results, other_builds):
+    # Keep the higher score of every leader and species, and the earlier build on a tie
+    for leader, species_scores in other_results.items():
+        for species, score in species_scores.items():
+            current = results.get(leader, {}).get(species)
+            if current is None or score > current:
+                results.setdefault(leader, {})[species] = score
+                builds.setdefault(leader, {})[species] = other_builds.get(leader, {}).get(species)
+
+def merge_snapshots(*snapshots):
+    """
+    Combine snapshots into one, in the order given.
+
+    :return: The merged snapshot, the inputs are left as they are.
+    """
+    merged = new_snapshot()
+    seen = set()
+    for snapshot in snapshots:
+        for run in snapshot["runs"]:
+            if run["id"] in seen:
+                raise ValueError(f"Run {run['id']} ({', '.join(run['sources'])} on {run['host']}) is in more than one snapshot")
+            seen.add(run["id"])
+        merged["runs"].extend(dict(run) for run in snapshot["runs"])
+        for matchup, record in snapshot["aggregate"].items():
+            merge_record(merged["aggregate"], matchup, record)
+        merge_scores(merged["results"], merged["builds"], snapshot["results"], snapshot["builds"])
+    return merged
+
+def average_scores(results):
+    # Total and average score of every species over the leaders, as in average_scores.json
+    totals = {}
+    for species_scores in results.values():
+        for species, score in species_scores.items():
+            total = totals.setdefault(species, [0, 0])
+            total[0] += score
+            total[1] += 1
+    return {species: {'score': score, 'average_score': score / count} for species, (score, count) in totals.items()}
+
+def snapshot_matrix(snapshot):
+    return BattleMatrix.from_aggregate(snapshot["aggregate"])
+
+def save_snapshot(snapshot, file_path):
+    aggregate = snapshot["aggregate"]
+    index = {}
+    for bot_1, bot_2 in aggregate.keys():
+        index.setdefault(bot_1, len(index))
+        index.setdefault(bot_2, len(index))
+    pairings = np.array([(index[bot_1], index[bot_2]) for bot_1, bot_2 in aggregate.keys()], dtype=np.int32).reshape(-1, 2)
+    records = np.array(list(aggregate.values()), dtype=np.int64).reshape(-1, 4)
+    meta = {"version": SNAPSHOT_VERSION, "results": snapshot["results"], "builds": snapshot["builds"], "runs": snapshot["runs"]}
+    with open(file_path, "wb") as f:
+        np.savez_compressed(f, trainers=np.array(list(index.keys()), dtype=str), pairings=pairings,
+                            records=records, meta=np.array(json.dumps(meta)))
+
+def is_snapshot(file_path):
+    with np.load(file_path) as data:
+        return "meta" in data.files and "pairings" in data.files
+
+def load_snapshot(file_path):
+    with np.load(file_path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {file_path}: {meta.get('version')}")
+        trainers = data["trainers"].tolist()
+        aggregate = {(trainers[bot_1], trainers[bot_2]): record
+                     for (bot_1, bot_2), record in zip(data["pairings"].tolist(), data["records"].tolist())}
+    return new_snapshot(aggregate, meta["results"], meta["builds"], meta["runs"])
+
+def load_json(file_path):
+    if file_path is None:
+        return {}
+    with open(file_path, "r") as infile:
+        return json.load(infile)
+
+def snapshot_outputs(file_paths=(), scores_path=None, builds_path=None, mode=None, note=None, shard_count=None):
+    """
+    Snapshot a run from its output files and, for Pokemon mode, its scores.json and builds.json.
+
+    :param file_paths: Output files to parse, in the order they would be concatenated.
+    :param mode: "trainers" or "pokemon", by default "pokemon" if scores are given.
+    """
+    aggregate = parse_aggregate_parallel(list(file_paths), shard_count) if file_paths else {}
+    results = load_json(scores_path)
+    builds = load_json(builds_path)
+    sources = list(file_paths) + [file_path for file_path in (scores_path, builds_path) if file_path]
+    run = run_metadata(mode or ("pokemon" if results else "trainers"), sources, battle_count(aggregate), note)
+    return new_snapshot(aggregate, results, builds, [run])
+
+def snapshot_db_run(db_path=DB_PATH, run="latest"):
+    # Snapshot of a run of the results database (see resultsDb.py)
+    connection = connect(db_path)
+    run_id = resolve_run(connection, run)
+    mode, started, note = connection.execute("SELECT mode, started, note FROM runs WHERE id = ?", (run_id,)).fetchone()
+    aggregate = load_run_aggregate(connection, run_id)
+    results = {}
+    builds = {}
+    for leader, species, score, build in connection.execute("SELECT leader, species, score, build FROM species_scores WHERE run_id = ? ORDER BY rowid", (run_id,)):
+        results.setdefault(leader, {})[species] = score
+        builds.setdefault(leader, {})[species] = build
+    connection.close()
+    run = run_metadata(mode, [f"{db_path}#{run_id}"], battle_count(aggregate), note)
+    run["created"] = started
+    return new_snapshot(aggregate, results, builds, [run])
+
+def print_info(snapshot):
+    for run in snapshot["runs"]:
+        battles = "" if run["battles"] is None else f", {run['battles']} battles"
+        note = f", {run['note']}" if run["note"] else ""
+        print(f"{run['id'][:8]}: {run['mode']} on {run['host']}, {time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created']))}"
+              f"{battles}, from {', '.join(run['sources'])}{note}")
+    trainers = {trainer for matchup in snapshot["aggregate"] for trainer in matchup}
+    print(f"{battle_count(snapshot['aggregate'])} battles between {len(trainers)} trainers in {len(snapshot['aggregate'])} pairings, "
+          f"{sum(len(species_scores) for species_scores in snapshot['results'].values())} leader/species scores")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make, merge and read snapshots of aggregated results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("create", help="snapshot a run's output files and Pokemon mode scores")
+    command.add_argument("snapshot")
+    command.add_argument("files", nargs="*", help="output files to parse, none for a Pokemon mode snapshot of scores only")
+    command.add_argument("--worker-outputs", action="store_true", help="parse the per-worker files in WorkerOutputs/")
+    command.add_argument("--scores", default=None, help="scores.json of a Pokemon mode run")
+    command.add_argument("--builds", default=None, help="builds.json of a Pokemon mode run")
+    command.add_argument("--db", default=None, help="snapshot a run of this results database instead")
+    command.add_argument("--run", default="latest", help="run of --db to snapshot")
+    command.add_argument("--shards", type=int, default=None, help="number of processes to parse with, defaults to all CPUs")
+    command.add_argument("--note", default=None)
+    command = commands.add_parser("merge", help="merge snapshots, in the order their outputs would be concatenated")
+    command.add_argument("snapshot", help="file to write the merged snapshot to")
+    command.add_argument("parts", nargs="+")
+    command = commands.add_parser("info", help="list a snapshot's runs and totals")
+    command.add_argument("snapshot")
+    command = commands.add_parser("report", help="write the Pokemon mode files of a snapshot, use analyseOutput.py --cached for the rest")
+    command.add_argument("snapshot")
+    command.add_argument("--scores", nargs="?", const="scores.json", default=None)
+    command.add_argument("--builds", nargs="?", const="builds.json", default=None)
+    command.add_argument("--average-scores", nargs="?", const="average_scores.json", default=None)
+    args = parser.parse_args()
+
+    if args.command == "create":
+        if args.db is not None:
+            snapshot = snapshot_db_run(args.db, args.run)
+        else:
+            file_paths = worker_output_files("WorkerOutputs") if args.worker_outputs else args.files
+            snapshot = snapshot_outputs(file_paths, args.scores, args.builds, note=args.note, shard_count=args.shards)
+        save_snapshot(snapshot, args.snapshot)
+        print_info(snapshot)
+    elif args.command == "merge":
+        start = time.time()
+        snapshot = merge_snapshots(*[load_snapshot(file_path) for file_path in args.parts])
+        save_snapshot(snapshot, args.snapshot)
+        print_info(snapshot)
+        print(f"Merged {len(args.parts)} snapshots in {time.time() - start:.2f} Seconds")
+    elif args.command == "info":
+        print_info(load_snapshot(args.snapshot))
+    elif args.command == "report":
+        snapshot = load_snapshot(args.snapshot)
+        for file_path, data in ((args.scores, snapshot["results"]), (args.builds, snapshot["builds"]),
+                                (args.average_scores, average_scores(snapshot["results"]))):
+            if file_path:
+                with open(file_path, "w") as file:
+                    json.dump(data, file, indent=4)
@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from battleMatrix import BattleMatrix
+from battleTable import battle_row
+from outputParser import BATTLE_END, BATTLE_START, MARKER_LENGTH, battle_header, battle_outcome, decode_header, for_each_battle
+from reports import save_matrix_to_csv, save_to_csv, save_to_json
+
+# =============================================================================
+# SQLite database of the results of every run, so runs are no longer
+# overwritten and comparing runs or looking up standings is a query instead
+# of parsing the logs again. Both runners hand every battle to a
+# ResultsWriter, which writes them from a background thread in batched
+# transactions (WAL mode, so reports can be read while a run writes).
+#
+#   runs            one row per run, trainers or pokemon mode
+#   battles         one row per battle, outcome as in outputParser (NULL if it failed)
+#   pairings        wins, losses and ties of every "A vs B" of a run, kept up to date
+#                   with battles so standings never have to go through every battle
+#   species_scores  Pokemon mode's best build and score per leader and species
+#
+# The reports the text parsers made are views over these tables
+# (trainer_stats, battle_matrix, average_scores), and `python resultsDb.py
+# report` writes the old CSV/JSON files from them.
+# =============================================================================
+
+DB_PATH = "results.db"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    bot_1 TEXT NOT NULL,
+    bot_2 TEXT NOT NULL,
+    outcome INTEGER,
+    turns INTEGER,
+    leader TEXT,
+    species TEXT,
+    build TEXT
+);
+CREATE TABLE IF NOT EXISTS pairings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    bot_1 TEXT NOT NULL,
+    bot_2 TEXT NOT NULL,
+    bot_1_wins INTEGER NOT NULL,
+    bot_2_wins INTEGER NOT NULL,
+    ties INTEGER NOT NULL,
+    first_outcome INTEGER NOT NULL,
+    PRIMARY KEY (run_id, bot_1, bot_2)
+);
+CREATE TABLE IF NOT EXISTS species_scores (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    leader TEXT NOT NULL,
+    species TEXT NOT NULL,
+    score REAL NOT NULL,
+    build TEXT NOT NULL,
+    PRIMARY KEY (run_id, leader, species)
+);
+CREATE INDEX IF NOT EXISTS battles_run ON battles(run_id);
+CREATE INDEX IF NOT EXISTS battles_pairing ON battles(run_id, bot_1, bot_2);
+CREATE INDEX IF NOT EXISTS battles_bot_1 ON battles(bot_1, run_id);
+CREATE INDEX IF NOT EXISTS battles_bot_2 ON battles(bot_2, run_id);
+CREATE INDEX IF NOT EXISTS battles_build ON battles(build, run_id);
+CREATE INDEX IF NOT EXISTS pairings_bot_2 ON pairings(bot_2, run_id);
+CREATE INDEX IF NOT EXISTS species_scores_build ON species_scores(build);
+
+-- every pairing from both sides, wins, losses and ties counted the way BattleMatrix does. These views read
+-- every run's pairings, standings() and compare_runs() use RUN_TRAINER_STATS to read only one run's
+CREATE VIEW IF NOT EXISTS pairing_sides AS
+    SELECT run_id, rowid AS first_seen, bot_1 AS trainer, bot_2 AS opponent, bot_1_wins AS wins, bot_2_wins AS losses, ties FROM pairings
+    UNION ALL
+    SELECT run_id, rowid, bot_2, bot_1, bot_2_wins, bot_1_wins, ties FROM pairings;
+CREATE VIEW IF NOT EXISTS battle_matrix AS
+    SELECT run_id, trainer, opponent, SUM(wins) AS wins, SUM(losses) AS losses, SUM(ties) AS ties, MIN(first_seen) AS first_seen
+    FROM pairing_sides GROUP BY run_id, trainer, opponent;
+-- like trainer_stats.csv, battles against themselves included
+CREATE VIEW IF NOT EXISTS trainer_stats AS
+    SELECT run_id, trainer, SUM(wins) AS wins, SUM(losses) AS losses, SUM(ties) AS ties,
+           CASE WHEN SUM(losses) = 0 THEN NULL ELSE CAST(SUM(wins) AS REAL) / SUM(losses) END AS win_loss_ratio
+    FROM pairing_sides GROUP BY run_id, trainer;
+-- like average_scores.json
+CREATE VIEW IF NOT EXISTS average_scores AS
+    SELECT run_id, species, SUM(score) AS score, AVG(score) AS average_score
+    FROM species_scores GROUP BY run_id, species;
+"""
+
+# trainer_stats of one run, with the run filtered in both halves of pairing_sides so only that run's
+# pairings are read (through the primary key) instead of every run's
+RUN_TRAINER_STATS = """
+    SELECT trainer, SUM(wins) AS wins, SUM(losses) AS losses, SUM(ties) AS ties,
+           CASE WHEN SUM(losses) = 0 THEN NULL ELSE CAST(SUM(wins) AS REAL) / SUM(losses) END AS win_loss_ratio
+    FROM (SELECT bot_1 AS trainer, bot_1_wins AS wins, bot_2_wins AS losses, ties FROM pairings WHERE run_id = {run}
+          UNION ALL
+          SELECT bot_2, bot_2_wins, bot_1_wins, ties FROM pairings WHERE run_id = {run})
+    GROUP BY trainer"""
+
+ADD_PAIRING = """
+INSERT INTO pairings (run_id, bot_1, bot_2, bot_1_wins, bot_2_wins, ties, first_outcome) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (run_id, bot_1, bot_2) DO UPDATE SET
+    bot_1_wins = bot_1_wins + excluded.bot_1_wins, bot_2_wins = bot_2_wins + excluded.bot_2_wins, ties = ties + excluded.ties
+"""
+
+def insert_battles(connection, rows):
+    # Insert (run_id, bot_1, bot_2, outcome, turns, leader, species, build) rows and add them to their pairings
+    connection.executemany("INSERT INTO battles (run_id, bot_1, bot_2, outcome, turns, leader, species, build) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    pairings = {}
+    for run_id, bot_1, bot_2, outcome, *_ in rows:
+        if outcome is not None:
+            # same layout as an outputParser aggregate, first_outcome is only kept when the pairing is new
+            pairings.setdefault((run_id, bot_1, bot_2), [0, 0, 0, outcome])[outcome] += 1
+    connection.executemany(ADD_PAIRING, [key + tuple(counts) for key, counts in pairings.items()])
+
+def connect(db_path=DB_PATH):
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return connection
+
+def battle_record(result):
+    """
+    (bot 1, bot 2, outcome, turns) of a battle's output, read the same way the text parsers read output.txt.
+
+    :return: The record, with bot names of None if the output has no "A vs B" header.
+    """
+    data = result.encode("utf-8", errors="replace")
+    start = data.find(BATTLE_START)
+    start = 0 if start < 0 else start + MARKER_LENGTH
+    end = data.find(BATTLE_END, start)
+    end = len(data) if end < 0 else end
+    header = battle_header(data, start, end)
+    outcome = battle_outcome(data, start, end)
+    bot_1, bot_2 = decode_header(header) if header is not None else (None, None)
+    return bot_1, bot_2, outcome, battle_row(data, start, end, outcome)[1]
+
+class ResultsWriter:
+    """
+    Writes the battles of one run from a background thread, batching them into transactions.
+
+    :param mode: "trainers" or "pokemon".
+    :param batch_size: Most battles in one transaction, waiting battles are always written together.
+    """
+    def __init__(self, db_path=DB_PATH, mode="trainers", note=None, batch_size=1000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.records = queue.Queue()
+        connection = connect(db_path)
+        with connection:
+            self.run_id = connection.execute("INSERT INTO runs (mode, started, note) VALUES (?, ?, ?)", (mode, time.time(), note)).lastrowid
+        connection.close()
+        self.thread = threading.Thread(target=self.write_records, daemon=True)
+        self.thread.start()
+
+    def add_battle(self, result, bot_1=None, bot_2=None, leader=None, species=None, build=None):
+        # Queue a battle's output, bot names are read from its "A vs B" header and only the given ones used if it has none
+        self.records.put(("battle", result, bot_1, bot_2, leader, species, build))
+
+    def add_failed(self, bot_1, bot_2):
+        self.records.put(("failed", bot_1, bot_2))
+
+    def set_score(self, leader, species, score, build):
+        # Best build of a species against a leader so far, like scores.json and builds.json
+        self.records.put(("score", leader, species, score, build))
+
+    def close(self):
+        self.records.put(None)
+        self.thread.join()
+
+    def write_records(self):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                batch = [self.records.get()]
+                while batch[-1] is not None and len(batch) < self.batch_size and not self.records.empty():
+                    batch.append(self.records.get())
+                battles = []
+                scores = []
+                for record in batch:
+                    if record is None:
+                        continue
+                    if record[0] == "battle":
+                        _, result, bot_1, bot_2, leader, species, build = record
+                        header_1, header_2, outcome, turns = battle_record(result)
+                        if (header_1 or bot_1) is None:
+                            continue
+                        battles.append((self.run_id, header_1 or bot_1, header_2 or bot_2, outcome, turns, leader, species, build))
+                    elif record[0] == "failed":
+                        battles.append((self.run_id, record[1], record[2], None, None, None, None, None))
+                    else:
+                        scores.append((self.run_id,) + record[1:])
+                with connection:
+                    insert_battles(connection, battles)
+                    connection.executemany("INSERT OR REPLACE INTO species_scores (run_id, leader, species, score, build) VALUES (?, ?, ?, ?, ?)", scores)
+                if batch[-1] is None:
+                    with connection:
+                        connection.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self.run_id))
+                    return
+        finally:
+            connection.close()
+
+def import_output(db_path, file_path, mode="trainers", note=None):
+    # Add the battles of an existing output file as a new run, returns its id
+    connection = connect(db_path)
+    with connection:
+        run_id = connection.execute("INSERT INTO runs (mode, started, finished, note) VALUES (?, ?, ?, ?)",
+                                    (mode, os.path.getmtime(file_path), os.path.getmtime(file_path), note or file_path)).lastrowid
+    rows = []
+
+    def add_battle(data, start, end):
+        header = battle_header(data, start, end)
+        outcome = battle_outcome(data, start, end)
+        if header is not None and outcome is not None:
+            rows.append((run_id,) + decode_header(header) + (outcome, battle_row(data, start, end, outcome)[1], None, None, None))
+        if len(rows) >= 10000:
+            flush()
+
+    def flush():
+        with connection:
+            insert_battles(connection, rows)
+        rows.clear()
+
+    for_each_battle(file_path, add_battle)
+    flush()
+    connection.close()
+    return run_id
+
+def resolve_run(connection, run):
+    # Run id from an id or "latest"
+    if run in (None, "latest"):
+        row = connection.execute("SELECT MAX(id) FROM runs").fetchone()
+        if row[0] is None:
+            raise ValueError("The database has no runs")
+        return row[0]
+    return int(run)
+
+def load_aggregate(connection, run_id):
+    # outputParser aggregate of a run, in the order its pairings were first seen
+    return {(bot_1, bot_2): [bot_1_wins, bot_2_wins, ties, first_outcome] for bot_1, bot_2, bot_1_wins, bot_2_wins, ties, first_outcome in connection.execute(
+        "SELECT bot_1, bot_2, bot_1_wins, bot_2_wins, ties, first_outcome FROM pairings WHERE run_id = ? ORDER BY rowid", (run_id,))}
+
+def load_matrix(connection, run_id):
+    # BattleMatrix of a run, the same one analyseOutput.py makes from the run's output
+    return BattleMatrix.from_aggregate(load_aggregate(connection, run_id))
+
+def standings(connection, run_id, limit=None):
+    # (trainer, wins, losses, ties, win/loss ratio) of a run, most wins first
+    return connection.execute(RUN_TRAINER_STATS.format(run=":run") + " ORDER BY wins DESC, trainer LIMIT :limit",
+                              {"run": run_id, "limit": -1 if limit is None else limit}).fetchall()
+
+def compare_runs(connection, run_a, run_b):
+    # (trainer, win rate in run a, win rate in run b) of every trainer in both runs, biggest change first
+    return connection.execute(f"""
+        WITH a AS ({RUN_TRAINER_STATS.format(run=":run_a")}), b AS ({RUN_TRAINER_STATS.format(run=":run_b")})
+        SELECT a.trainer, CAST(a.wins AS REAL) / (a.wins + a.losses + a.ties), CAST(b.wins AS REAL) / (b.wins + b.losses + b.ties)
+        FROM a JOIN b ON a.trainer = b.trainer
+        ORDER BY ABS(CAST(b.wins AS REAL) / (b.wins + b.losses + b.ties) - CAST(a.wins AS REAL) / (a.wins + a.losses + a.ties)) DESC""",
+        {"run_a": run_a, "run_b": run_b}).fetchall()
+
+def write_reports(connection, run_id, stats_csv_path=None, matrix_csv_path=None, json_path=None,
+                  scores_path=None, builds_path=None, average_scores_path=None):
+    # Write the report files of a run in their old formats. Reports with a path of None are skipped
+    if stats_csv_path or matrix_csv_path or json_path:
+        matrix = load_matrix(connection, run_id)
+        if stats_csv_path:
+            save_to_csv(matrix.trainer_stats(), stats_csv_path)
+        if matrix_csv_path:
+            save_matrix_to_csv(matrix, matrix_csv_path)
+        if json_path:
+            save_to_json(matrix, json_path)
+    results = {}
+    builds = {}
+    for leader, species, score, build in connection.execute("SELECT leader, species, score, build FROM species_scores WHERE run_id = ? ORDER BY rowid", (run_id,)):
+        results.setdefault(leader, {})[species] = score
+        builds.setdefault(leader, {})[species] = build
+    average_scores = {species: {'score': score, 'average_score': average_score}
+                      for species, score, average_score in connection.execute("SELECT species, score, average_score FROM average_scores WHERE run_id = ?", (run_id,))}
+    for file_path, data in ((scores_path, results), (builds_path, builds), (average_scores_path, average_scores)):
+        if file_path:
+            with open(file_path, "w") as file:
+                json.dump(data, file, indent=4)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the results database both runners write to.")
+    parser.add_argument("--db", default=DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="list the runs")
+    command = commands.add_parser("import", help="add an existing output file as a run")
+    command.add_argument("file", nargs="?", default="output.txt")
+    command.add_argument("--note", default=None)
+    command = commands.add_parser("standings", help="trainers of a run by wins")
+    command.add_argument("--run", default="latest")
+    command.add_argument("--limit", type=int, default=None)
+    command = commands.add_parser("compare", help="change in every trainer's win rate between two runs")
+    command.add_argument("run_a")
+    command.add_argument("run_b", nargs="?", default="latest")
+    command = commands.add_parser("report", help="write the old report files of a run")
+    command.add_argument("--run", default="latest")
+    command.add_argument("--stats-csv", nargs="?", const="trainer_stats.csv", default=None)
+    command.add_argument("--matrix-csv", nargs="?", const="battle_matrix.csv", default=None)
+    command.add_argument("--json", nargs="?", const="battle_results.json", default=None)
+    command.add_argument("--scores", nargs="?", const="scores.json", default=None)
+    command.add_argument("--builds", nargs="?", const="builds.json", default=None)
+    command.add_argument("--average-scores", nargs="?", const="average_scores.json", default=None)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print("Imported", args.file, "as run", import_output(args.db, args.file, note=args.note))
+        raise SystemExit
+    connection = connect(args.db)
+    if args.command == "runs":
+        for run_id, mode, started, finished, note, battles in connection.execute(
+                "SELECT runs.id, mode, started, finished, note, COUNT(battles.id) FROM runs LEFT JOIN battles ON battles.run_id = runs.id GROUP BY runs.id"):
+            status = time.strftime("%Y-%m-%d %H:%M", time.localtime(finished)) if finished else "unfinished"
+            print(f"{run_id}: {mode}, started {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}, {status}, {battles} battles{', ' + note if note else ''}")
+    elif args.command == "standings":
+        for trainer, wins, losses, ties, ratio in standings(connection, resolve_run(connection, args.run), args.limit):
+            print(f"{trainer}: {wins} Wins, {losses} Losses, {ties} Ties, Win/Loss Ratio: {float('inf') if ratio is None else ratio:.2f}")
+    elif args.command == "compare":
+        for trainer, rate_a, rate_b in compare_runs(connection, resolve_run(connection, args.run_a), resolve_run(connection, args.run_b)):
+            print(f"{trainer}: {rate_a:.3f} -> {rate_b:.3f} ({rate_b - rate_a:+.3f})")
+    elif args.command == "report":
+        write_reports(connection, resolve_run(connection, args.run), args.stats_csv, args.matrix_csv, args.json,
+                      args.scores, args.builds, args.average_scores)
+    connection.close()
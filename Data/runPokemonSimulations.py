@@ -1,11 +1,21 @@
+import argparse
+import copy
 import json
 import os
+import queue
 import subprocess
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import time
 from timeit import default_timer as timer
-from tqdm import tqdm
+from buildCatalog import load_catalog
+from checkpointLog import CheckpointLog, empty_state, load_checkpoint
+from compileTournament import load_or_compile, plan_source
+from racing import race
+from resultsDb import ResultsWriter
+from surrogateScorer import prune_mask, prune_report, score_gauntlets
+from workOrder import expected_scores, load_previous, prior_order, savings_report
 
 leader_level_caps = {
     "Brock": 14,
@@ -27,131 +37,259 @@ leader_level_caps = {
     "Blue-(Venusaur)": 65,
 }
 
-def write_builds_to_file(lines, build_indices, file_path, setLevel):
-    with open(file_path, "w") as f:
-        f.truncate(0)  # Clear the file
-        for build_index in build_indices:
-            # Initialize build_start to the line with "Level: "
-            build_start = build_index[1]
-            # Move backwards to find the line with the '|' character
-            while build_start > 0 and not lines[build_start].startswith('|'):
-                build_start -= 1
-            # Now build_start should be on the line with the '|' character
-            # Include the line with '|', removing the '|' character itself.
-            f.write(lines[build_start].replace("|", "").strip() + "\n")
-            # Write each subsequent line of the build until another '|' is encountered
-            for line in lines[build_start + 1:]:
-                if line.startswith('|'):
-                    break  # If it's the start of the next build, stop writing
-                if setLevel is not None and line.startswith("Level: "):
-                    line = f"Level: {setLevel}\n" # Check if setLevel is not None and if the line starts with "Level: "
-                f.write(line)
-            f.write("\n")  # Add a newline to separate builds
-
 # =============================================================================
-# Runs a single simulation for some matchup passed in
+# Runs a single simulation for some matchup passed in. The 1v1 legs of a pass
+# run at the same time on the leg workers, and the full-team leg, which only
+# counts if every 1v1 leg was won, can be started alongside them when workers
+# are free (SPECULATE). Once a leg is lost and the gauntlet can no longer beat
+# the best score of its species against the leader, the rest is cancelled.
 # =============================================================================
-def runSimulation(matchups, threadNo, trainer_lines, pokemon_lines, teamNumbers, leader_teamNumbers, setLevel):
-    # print("Running simulation on", threadNo)
+def runSimulation(gauntlet, trainer_catalog, pokemon_catalog, plan):
+    # print("Running simulation on", gauntlet)
     global teams
     global results
     global builds
     global noErase
-    global ErasingMatchups
-    leader = get_keys_from_value(teamNumbers, matchups[-1][0])[0]
-    setLevel = leader_level_caps[leader]
+    leader_id = plan["gauntlet_leader"][gauntlet]
+    leader = plan["leader_names"][leader_id]
+    key = gauntlet_key(plan, gauntlet)
+    setLevel = int(plan["leader_level_caps"][leader_id])
+    legs = gauntlet_legs(plan, gauntlet)
+    pokemon_team = plan["leg_pokemon"][legs[0]]
+    team2No = plan["team_names"][pokemon_team]
+    pokemon_species = pokemon_catalog.builds[team_builds(plan, pokemon_team)[0]][0]
+    leader_str = str(leader)
     score = 0
     output_result = ""
 
     for i in range(3):
-        points = 0
-        scores = []
-        for matchup in matchups:
-
-            if matchup == matchups[-1]:
-                if points < len(matchups)-1:
-                    break # can't sweep if it didn't beat everything individually
-
-            # get number of each team from the teamNumbers dict
-            team1No = get_keys_from_value(teamNumbers, matchup[0])[0]
-            team2No = get_keys_from_value(teamNumbers, [matchup[1]])[0]
-
-            game = str(len(matchup[0])) + "v" + str(len(matchup[1]))
-
-            # Process the first group of builds
-            write_builds_to_file(trainer_lines, matchup[0], f"./WorkerFiles/{threadNo}1.txt", None) # trainer is always first in the matchup
-            # Process the second group of builds
-            write_builds_to_file(pokemon_lines, [matchup[1]], f"./WorkerFiles/{threadNo}2.txt", setLevel) # pokemon is always second in the matchup
-            while True:
-                mycommand = "cd ../pokemon-showdown && node ./dist/sim/examples/Simulation-test-1 " + threadNo + " " + str(team1No) + " " + str(team2No)
-                result = subprocess.getoutput(mycommand)
-                # if the battle fails we retry, sometimes showdown fails for some unexpected reason
-                if not (result.startswith("node:internal") or result.startswith("TypeError") or result.startswith("runtime")) or result.endswith("Node.js v21.6.1"):
-                    try:
-                        if not (result[:40].split("\n")[2].startswith("TypeError")):
-                            break
-                    except:
-                        break
-
-            if result.endswith("|win|Bot 2"):
-                points += 1
-
-            output_result += result + "\n]]]]]\n"
-
-        scores.append(points / len(matchups))
-        score = sum(scores) / len(scores)
+        outcome = play_pass(plan, legs, key, setLevel, leader_str, pokemon_species, trainer_catalog, pokemon_catalog)
+        if outcome is None:
+            # cancelled, this build can't score higher than what its species already has
+            checkpoint_log.append({"type": "done", "gauntlets": [int(gauntlet)]})
+            return(teams)
+        points, pass_output = outcome
+        output_result += pass_output
+        score = points / len(legs)
         if score < 1:
             break
 
-    with open(f"./WorkerFiles/{threadNo}2.txt") as f2:
-        pokemon_species = f2.readlines()[0].strip().replace("|", "")
+    record_score(leader_str, pokemon_species, score, team2No, output_result)
 
-    leader_str = str(leader)
+    if score == 1:
+        with lock2:
+            sweepers.append(gauntlet)
+            if pokemon_species not in noErase[leader_str]:
+                print("removing", leader, pokemon_species)
+                # queued gauntlets for this leader and species are skipped when they are popped, running ones stop at their next leg
+                cancelled.add(key)
+                noErase[leader_str].append(pokemon_species)
+                checkpoint_log.append({"type": "cancel", "leader": leader_str, "species": pokemon_species, "key": list(key)})
+    checkpoint_log.append({"type": "done", "gauntlets": [int(gauntlet)]})
+
+    # print("finished running simulation on", gauntlet)
+    return(teams)
+
+def play_pass(plan, legs, key, setLevel, leader_str, pokemon_species, trainer_catalog, pokemon_catalog):
+    """
+    Play every leg of a gauntlet once, the 1v1 legs concurrently.
+
+    :return: Tuple of the number of legs won and the outputs of the legs played in order, or None if the
+        pass was cancelled because the species swept the leader or this build can't beat its best score.
+    """
+    singles = {submit_leg(plan, leg, key, setLevel, trainer_catalog, pokemon_catalog): leg for leg in legs[:-1]}
+    speculative = None
+    if SPECULATE and legs_in_flight < noOfThreads:
+        speculative = submit_leg(plan, legs[-1], key, setLevel, trainer_catalog, pokemon_catalog)
+
+    outputs = {}
+    lost = 0
+    pending = set(singles)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            outputs[singles[future]] = future.result()
+        lost = sum(1 for result in outputs.values() if result is not None and not result.endswith("|win|Bot 2"))
+        # the full-team leg doesn't run once a 1v1 leg is lost, so this is the best score left
+        if None in outputs.values() or (lost and (len(legs) - 1 - lost) / len(legs) <= best_score(leader_str, pokemon_species)):
+            for future in pending | {speculative}:
+                if future is not None:
+                    future.cancel()
+            return None
+
+    if lost:
+        if speculative is not None:
+            speculative.cancel()
+    else:
+        # can't sweep if it didn't beat everything individually
+        outputs[legs[-1]] = (speculative or submit_leg(plan, legs[-1], key, setLevel, trainer_catalog, pokemon_catalog)).result()
+        if outputs[legs[-1]] is None:
+            return None
+
+    points = sum(1 for result in outputs.values() if result.endswith("|win|Bot 2"))
+    return points, "".join(outputs[leg] + "\n]]]]]\n" for leg in legs if leg in outputs)
+
+def submit_leg(plan, leg, key, setLevel, trainer_catalog, pokemon_catalog):
+    global legs_in_flight
+    with lock4:
+        legs_in_flight += 1
+    future = leg_executor.submit(run_leg, plan, leg, key, setLevel, trainer_catalog, pokemon_catalog)
+    future.add_done_callback(leg_done)
+    return future
+
+def leg_done(future):
+    global legs_in_flight
+    with lock4:
+        legs_in_flight -= 1
+
+def run_leg(plan, leg, key, setLevel, trainer_catalog, pokemon_catalog):
+    # Showdown's output for a leg on a free worker, or None if the species already swept the leader
+    global battles_run
+    if key in cancelled:
+        return None
+    threadNo = worker_names.get()
+    try:
+        result, _ = play_leg(plan, leg, key, threadNo, setLevel, trainer_catalog, pokemon_catalog)
+    finally:
+        worker_names.put(threadNo)
+    with lock4:
+        battles_run += 1
+    return result
+
+def best_score(leader_str, pokemon_species):
     with lock3:
-        if str(leader) not in results:
+        return results.get(leader_str, {}).get(pokemon_species, -1)
+
+def play_leg(plan, leg, key, threadNo, setLevel, trainer_catalog, pokemon_catalog):
+    # Simulate one leg of a gauntlet, returns showdown's output and the name of the pokemon's team
+    # get the name of each team from the plan
+    team1No = plan["team_names"][plan["leg_trainer"][leg]]
+    team2No = plan["team_names"][plan["leg_pokemon"][leg]]
+
+    # Process the first group of builds
+    trainer_catalog.write_builds(team_builds(plan, plan["leg_trainer"][leg]), f"./WorkerFiles/{threadNo}1.txt", None) # trainer is always first in the matchup
+    # Process the second group of builds
+    pokemon_catalog.write_builds(team_builds(plan, plan["leg_pokemon"][leg]), f"./WorkerFiles/{threadNo}2.txt", setLevel) # pokemon is always second in the matchup
+    while True:
+        mycommand = "cd ../pokemon-showdown && node ./dist/sim/examples/Simulation-test-1 " + threadNo + " " + str(team1No) + " " + str(team2No)
+        result = subprocess.getoutput(mycommand)
+        # if the battle fails we retry, sometimes showdown fails for some unexpected reason
+        if not (result.startswith("node:internal") or result.startswith("TypeError") or result.startswith("runtime")) or result.endswith("Node.js v21.6.1"):
+            try:
+                if not (result[:40].split("\n")[2].startswith("TypeError")):
+                    break
+            except:
+                break
+    results_db.add_battle(result, team1No, team2No, key[0], key[1], team2No)
+    return result, team2No
+
+def record_score(leader_str, pokemon_species, score, team2No, output_result):
+    # Keep a build's score if it is the best of its species against the leader so far
+    with lock3:
+        if leader_str not in results:
             results[leader_str] = {pokemon_species: -1}
             builds[leader_str] = {pokemon_species: -1}
         elif pokemon_species not in results[leader_str]:
             results[leader_str][pokemon_species] = -1
             builds[leader_str][pokemon_species] = -1
         # If both exist and score is higher, update them
-        if score > results[leader_str][pokemon_species]:
+        improved = score > results[leader_str][pokemon_species]
+        if improved:
             results[leader_str][pokemon_species] = round(score, 3)
             builds[leader_str][pokemon_species] = team2No
-            # Write file
-            output_directory = f"./Pokemon_Simulation_Outputs/{leader_str}"
-            os.makedirs(output_directory, exist_ok=True)
-            with open(f"{output_directory}/{pokemon_species}.txt", "w") as o:
-                o.write(output_result)
+            checkpoint_log.append({"type": "score", "leader": leader_str, "species": pokemon_species, "score": round(score, 3), "build": team2No})
+            results_db.set_score(leader_str, pokemon_species, round(score, 3), team2No)
+            version = output_versions.get((leader_str, pokemon_species), 0) + 1
+            output_versions[(leader_str, pokemon_species)] = version
+            output_lock = output_locks.setdefault((leader_str, pokemon_species), threading.Lock())
+    if improved:
+        # Write file, outside lock3 so other species aren't held up. A better build found meanwhile writes its own
+        with output_lock:
+            if output_versions[(leader_str, pokemon_species)] == version:
+                output_directory = f"./Pokemon_Simulation_Outputs/{leader_str}"
+                os.makedirs(output_directory, exist_ok=True)
+                with open(f"{output_directory}/{pokemon_species}.txt", "w") as o:
+                    o.write(output_result)
 
-    if score == 1:
-        with lock2:
-            if pokemon_species not in noErase[leader_str]:
-                ErasingMatchups = True
-                print("removing", leader, pokemon_species)
-                teams = [matchup for matchup in tqdm(teams)
-                        if not (leader == get_keys_from_value(leader_teamNumbers, matchup[-1][0])[0] 
-                                and pokemon_species.lower() == ([matchup[0][1]][0][0]) )]
-                noErase[leader_str].append(pokemon_species)
-                ErasingMatchups = False
-
-    # print("finished running simulation on", threadNo)
-    return(teams)
-    
-def get_keys_from_value(d, val):
-    return [k for k, v in d.items() if v == val]
+# =============================================================================
+# Races the builds of a species against a leader (see racing.py). Each play of
+# a build is the next 1v1 leg of its gauntlet, so every build still in the
+# race has fought the same legs. The full-team leg only counts once every 1v1
+# leg is won, so it isn't raced. The winner then runs its gauntlet like any
+# other (runSimulation), so its score is what a full run would give it.
+# Before racing, the best guess (gauntlets come in prior order) runs its
+# gauntlet, and if it sweeps the leader there is nothing left to race.
+# =============================================================================
+def raceSpecies(gauntlets, trainer_catalog, pokemon_catalog, plan):
+    global battles_run
+    runSimulation(gauntlets[0], trainer_catalog, pokemon_catalog, plan)
+    if gauntlet_key(plan, gauntlets[0]) in cancelled or len(gauntlets) == 1:
+        checkpoint_log.append({"type": "done", "gauntlets": [int(gauntlet) for gauntlet in gauntlets]})
+        return
+    gauntlets = gauntlets[1:]
+    threadNo = worker_names.get()
+    try:
+        leader_id = plan["gauntlet_leader"][gauntlets[0]]
+        setLevel = int(plan["leader_level_caps"][leader_id])
+        key = gauntlet_key(plan, gauntlets[0])
+
+        def play(gauntlet, step):
+            singles = gauntlet_legs(plan, gauntlet)[:-1] or gauntlet_legs(plan, gauntlet)
+            result, _ = play_leg(plan, singles[step % len(singles)], key, threadNo, setLevel, trainer_catalog, pokemon_catalog)
+            return 1 if result.endswith("|win|Bot 2") else 0
+
+        singles = gauntlet_legs(plan, gauntlets[0])[:-1] or gauntlet_legs(plan, gauntlets[0])
+        winner, stats = race(gauntlets, play, RACE_INITIAL_BATTLES, RACE_GROWTH, RACE_ETA,
+                             RACE_MAX_PASSES * len(singles), RACE_DELTA)
+    finally:
+        worker_names.put(threadNo)
+    with lock4:
+        battles_run += sum(stat["plays"] for stat in stats.values())
+
+    # the winner's battles are counted by run_leg
+    runSimulation(winner, trainer_catalog, pokemon_catalog, plan)
+    checkpoint_log.append({"type": "done", "gauntlets": [int(gauntlet) for gauntlet in gauntlets]})
+
+def gauntlet_legs(plan, gauntlet):
+    return range(plan["leg_offsets"][gauntlet], plan["leg_offsets"][gauntlet + 1])
+
+def gauntlet_key(plan, gauntlet):
+    # (leader, species) of a gauntlet, what a perfect score cancels
+    return (plan["leader_names"][plan["gauntlet_leader"][gauntlet]], plan["species_names"][plan["gauntlet_species"][gauntlet]])
+
+def team_builds(plan, team):
+    # Build ids of a team's members
+    return plan["member_builds"][plan["member_offsets"][team]:plan["member_offsets"][team + 1]]
 
 leaders_filename = "Inputs/" + "GymLeaderPokemon.txt"
 pokemon_filename = "Inputs/" + "PokemonBuilds.txt"    
 
 noOfThreads = 1 # Change this to fit your CPU
-
-#read in teams
-with open('Inputs/tournament_battles.json', 'r') as infile:
-    teams = json.load(infile)
-
-with open('Inputs/PokemonVsLeaderTeams.json', 'r') as infile:
-    teamNumbers = json.load(infile)
+SPECULATE = True # start a gauntlet's full-team leg alongside its 1v1 legs when leg workers are free
+
+# Racing mode: instead of running every build's gauntlet, the builds of each species race against a leader
+# and only the contenders keep battling (see racing.py). The winner then runs its gauntlet to get its score.
+RACING = False
+RACE_INITIAL_BATTLES = 1 # battles every build gets before the first cut
+RACE_GROWTH = 2 # battles per build grow by this each cut
+RACE_ETA = 4 # 1/RACE_ETA of the builds survive each cut
+RACE_MAX_PASSES = 2 # most times a build goes through its 1v1 legs in a race
+RACE_DELTA = 0.05 # builds are also cut when they are worse than the best with this confidence
+
+# Leave out builds a type/power estimate says are hopeless before any battle (see surrogateScorer.py). A build
+# is kept if it scores at least this times the best build of its species against the leader. None runs
+# everything, run surrogateScorer.py to see what a threshold prunes.
+SURROGATE_THRESHOLD = None
+
+# Run each species' likely best build against a leader first (see workOrder.py), so a sweep cancels the rest of
+# its species sooner. Builds are ranked by the last run's results if there are any, then by the surrogate.
+ORDER_BY_PRIOR = True
+PRIOR_SCORES = "scores.json"
+PRIOR_BUILDS = "builds.json"
+
+CHECKPOINT_PATH = "./Pokemon_Simulation_Outputs/checkpoint.jsonl"
+CHECKPOINT_COMPACT_EVERY = 10000 # records after which the checkpoint is rewritten as one snapshot
+RESULTS_DB = "results.db" # every battle and best build of every run, see resultsDb.py
 
 leader_teams = {
     "Brock": [["Geodude", 1], ["Onix", 7]],
@@ -172,7 +310,37 @@ leader_teams = {
     "Blue-(Blastoise)": [["Pidgeot", 3386], ["Alakazam", 3394], ["Rhydon", 3402], ["Arcanine", 3448], ["Exeggutor", 3441], ["Blastoise", 3464]],
     "Blue-(Venusaur)": [["Pidgeot", 3386], ["Alakazam", 3394], ["Rhydon", 3402], ["Gyarados", 3433], ["Arcanine", 3456], ["Venusaur", 3472]],
 }
-leader_teamNumbers = {k: v for k, v in teamNumbers.items() if any(k.startswith(name) for name in leader_teams.keys())}
+
+# leader teams refer to builds by line number, pokemon teams by build id
+trainer_catalog = load_catalog(leaders_filename)
+pokemon_catalog = load_catalog(pokemon_filename)
+
+#read in teams, compiled to team ids once so finding a team's name while running is a lookup
+plan = load_or_compile("Inputs/tournament_plan.npz", "Inputs/PokemonVsLeaderTeams.json", "Inputs/tournament_battles.json",
+                       leader_level_caps, trainer_catalog, pokemon_catalog, [leaders_filename, pokemon_filename])
+teams = deque(range(len(plan["gauntlet_leader"]))) # gauntlet ids
+if SURROGATE_THRESHOLD is not None or ORDER_BY_PRIOR:
+    surrogate_scores = score_gauntlets(plan, trainer_catalog, pokemon_catalog)
+if SURROGATE_THRESHOLD is not None:
+    keep = prune_mask(plan, surrogate_scores, SURROGATE_THRESHOLD)
+    prune_report(plan, surrogate_scores, keep)
+    teams = deque(team for team in teams if keep[team])
+if ORDER_BY_PRIOR:
+    expected, group_prior = expected_scores(plan, surrogate_scores, load_previous(PRIOR_SCORES), load_previous(PRIOR_BUILDS))
+    teams = deque(prior_order(plan, teams, expected, group_prior))
+
+# carry on from the checkpoint of a run that crashed, see checkpointLog.py
+parser = argparse.ArgumentParser(description="Find the best build of every species against every leader.")
+parser.add_argument("--resume", action="store_true", help="skip the gauntlets the last run finished and keep its scores")
+args = parser.parse_args()
+checkpoint_source = json.dumps([plan_source("Inputs/PokemonVsLeaderTeams.json", "Inputs/tournament_battles.json", leader_level_caps, [leaders_filename, pokemon_filename]), RACING])
+checkpoint = load_checkpoint(CHECKPOINT_PATH, checkpoint_source) if args.resume else None
+if args.resume and checkpoint is None:
+    print("No checkpoint of this tournament to resume from, starting over")
+if checkpoint is not None:
+    done = set(checkpoint["done"])
+    teams = deque(team for team in teams if team not in done)
+    print("Resuming,", len(done), "gauntlets already done")
 
 print(len(teams))
 setLevel = None # If not None, all pokemon will be set to this level
@@ -180,7 +348,7 @@ n = 2000 # number of battles to stop running after
 # teams = teams[:n] # comment this out to simulate all battles
 
 n = len(teams)
-noOfTeams = len(teamNumbers)
+noOfTeams = len(plan["team_names"])
 
 with open ("./output.txt", "a") as o: 
     o.truncate(0)
@@ -200,60 +368,69 @@ start = time.time()
 results = {}
 builds = {}
 noErase = {trainer: [] for trainer in leader_teams.keys()}
+cancelled = set() # (leader, species) already swept, their gauntlets are skipped
+if checkpoint is not None:
+    results = checkpoint["results"]
+    builds = checkpoint["builds"]
+    noErase.update(checkpoint["noErase"])
+    cancelled = {tuple(key) for key in checkpoint["cancelled"]}
+os.makedirs("./Pokemon_Simulation_Outputs", exist_ok=True)
+# the log gets its own copy, its writer thread updates it while the workers update results and builds
+checkpoint_log = CheckpointLog(CHECKPOINT_PATH, copy.deepcopy(checkpoint) if checkpoint is not None else empty_state(checkpoint_source), CHECKPOINT_COMPACT_EVERY)
+results_db = ResultsWriter(RESULTS_DB, "pokemon", "resumed" if checkpoint is not None else None)
+# the scores carried over from the crashed run belong to this run too
+for leader_str, species_scores in results.items():
+    for pokemon_species, score in species_scores.items():
+        results_db.set_score(leader_str, pokemon_species, score, builds[leader_str][pokemon_species])
+output_versions = {} # (leader, species) -> number of the latest best build, so older ones don't overwrite its output file
+output_locks = {}
+skipped = 0
+battles_run = 0
+queued = list(teams)
+started = [] # gauntlets that were run, not skipped
+sweepers = [] # gauntlets that scored 1
 lock = threading.Lock()
 lock2 = threading.Lock()
 lock3 = threading.Lock()
+lock4 = threading.Lock()
 condition = threading.Condition(lock)
-ErasingMatchups = False
 
-thread_names = [str(i+1) for i in range(noOfThreads)]
+thread_names = [str(i+1) for i in range(noOfThreads)] # the leg workers, each has its own files in WorkerFiles
+worker_names = queue.Queue()
+for thread_name in thread_names:
+    worker_names.put(thread_name)
+gauntlet_slots = noOfThreads # gauntlets running at once, their legs share the leg workers
+legs_in_flight = 0
+leg_executor = ThreadPoolExecutor(max_workers=noOfThreads)
 total_simulations = len(teams)
 
 simulation_counter = 0
 simulations_since_last_update = 0
 simulations_since_last_results_update = 0
-simulations_since_last_save = 0
-
-with open(leaders_filename) as f1:
-    trainer_lines = f1.readlines()
-with open(pokemon_filename) as f2:
-    pokemon_lines = f2.readlines()
-
-# ! Read backups from crash
-# with open(f"./Pokemon_Simulation_Outputs/scores.json", "r") as infile:
-#     results = json.load(infile)
-# with open(f"./Pokemon_Simulation_Outputs/builds.json", "r") as infile:
-#     builds = json.load(infile)
-# with open(f"./Pokemon_Simulation_Outputs/teams.json", "r") as infile:
-#     teams = json.load(infile)
-# with open(f"./Pokemon_Simulation_Outputs/noErase.json", "r") as infile:
-#     noErase = json.load(infile)
-# !-------------------
-
-# Function to submit simulations and manage thread names
+
+# Function to submit simulations and manage gauntlet slots
 def submit_simulation(executor, team):
     global simulation_counter
     global simulations_since_last_update
-    with condition:  # Use condition variable to wait for an available thread name
-        while not thread_names:
-            condition.wait()  # Wait for a thread name to become available
-        thread_name = thread_names.pop(0)  # Allocate a thread name
+    global gauntlet_slots
+    with condition:  # Use condition variable to wait for an available gauntlet slot
+        while not gauntlet_slots:
+            condition.wait()  # Wait for a gauntlet to finish
+        gauntlet_slots -= 1
     
-    # Define a callback function to release the thread name back to the pool and notify waiting threads
-    def release_thread_name(future):
+    # Define a callback function to release the gauntlet slot and notify waiting threads
+    def release_slot(future):
+        global gauntlet_slots
         global simulation_counter
         global simulations_since_last_update
         global simulations_since_last_results_update
-        global simulations_since_last_save
         with condition:
-            # print("releasing thread", thread_name)
-            thread_names.append(thread_name)
-            condition.notify()  # Notify one waiting thread that a thread name has become available
+            gauntlet_slots += 1
+            condition.notify()  # Notify one waiting thread that a gauntlet slot has become available
             simulation_counter += 1
             simulations_since_last_update += 1
             simulations_since_last_results_update += 1
-            simulations_since_last_save += 1
-            if simulations_since_last_update >= 50 and len(teams) != 0 and simulation_counter > 0 and not ErasingMatchups:
+            if simulations_since_last_update >= 50 and len(teams) != 0 and simulation_counter > 0:
                 simulations_since_last_update = 0
                 current_runtime = time.time() - start
                 simulations_run = total_simulations - len(teams)
@@ -273,40 +450,47 @@ def submit_simulation(executor, team):
                     formatted_time = f"{seconds} second(s)"
 
                 print(len(teams), "Simulations Left | Estimated Remaining Time:", formatted_time, "| Time Elapsed:", round(current_runtime))
-            if simulations_since_last_results_update >= 1000 and len(teams) != 0 and simulation_counter != 0 and not ErasingMatchups:
+            if simulations_since_last_results_update >= 1000 and len(teams) != 0 and simulation_counter != 0:
                 simulations_since_last_results_update = 0
                 print(results)
-            if simulations_since_last_save >= 5000:
-                with lock2:
-                    with lock3:
-                        if simulations_since_last_save >= 5000 and len(teams) != 0 and simulation_counter != 0 and not ErasingMatchups:
-                            simulations_since_last_save = 0
-                            start_write_time = round(time.time())
-                            print("Writing Backup Files... | Start time:", start_write_time)
-                            with open(f"./Pokemon_Simulation_Outputs/scores.json", "w") as file:
-                                json.dump(results, file, indent=4)
-                            with open(f"./Pokemon_Simulation_Outputs/builds.json", "w") as file:
-                                json.dump(builds, file, indent=4)
-                            with open(f"./Pokemon_Simulation_Outputs/teams.json", "w") as file:
-                                json.dump(teams, file, indent=4)
-                            with open(f"./Pokemon_Simulation_Outputs/noErase.json", "w") as file:
-                                json.dump(noErase, file, indent=4)
-                            end_write_time = round(time.time())
-                            print("Done writing backup files | End time:", end_write_time, "| Took ", end_write_time - start_write_time, "seconds")
 
     # Submit the task
-    future = executor.submit(runSimulation, team, thread_name, trainer_lines, pokemon_lines, teamNumbers, leader_teamNumbers, setLevel)
+    future = executor.submit(runSimulation, team, trainer_catalog, pokemon_catalog, plan)
     # Attach the callback to the future
-    future.add_done_callback(release_thread_name)
+    future.add_done_callback(release_slot)
 
 print(len(teams))
-with ThreadPoolExecutor(max_workers=noOfThreads) as executor:
-    while teams:
-        with lock2:
-            if teams:
-                team = teams.pop(0)
+if RACING:
+    races = {}
+    for team in teams:
+        races.setdefault(gauntlet_key(plan, team), []).append(team)
+    exhaustive_battles = sum(len(gauntlet_legs(plan, team)) for team in teams)
+    with ThreadPoolExecutor(max_workers=noOfThreads) as executor:
+        futures = [executor.submit(raceSpecies, gauntlets, trainer_catalog, pokemon_catalog, plan) for gauntlets in races.values()]
+        for finished, future in enumerate(futures, start=1):
+            future.result()
+            if finished % 10 == 0:
+                print(len(races) - finished, "Races Left | Battles Run:", battles_run, "| Time Elapsed:", round(time.time() - start))
+    teams.clear()
+    print(len(races), "races run in", battles_run, "battles, running every gauntlet once takes", exhaustive_battles)
+else:
+    with ThreadPoolExecutor(max_workers=noOfThreads) as executor:
+        while teams:
+            with lock2:
+                team = teams.popleft() if teams else None
                 # print("assigning teams", len(teams))
-        submit_simulation(executor, team)
+            if team is None:
+                break
+            if gauntlet_key(plan, team) in cancelled:
+                skipped += 1
+                continue
+            started.append(team)
+            submit_simulation(executor, team)
+    print(skipped, "gauntlets skipped after their species swept the leader")
+    savings_report(plan, queued, started, sweepers, battles_run)
+leg_executor.shutdown()
+checkpoint_log.close()
+results_db.close()
 
 print(len(teams))  # Keeping track of remaining teams
 print(results)  # For debugging or tracking progress
@@ -346,4 +530,4 @@ with open(f"average_scores.json", "w") as file:
     json.dump(average_scores, file, indent=4)
             
 print("ran in " + str(end-start) + " Seconds Overall")
-print(str((end - start)/n) + " Seconds Per Sim On Average")
\ No newline at end of file
+print(str((end - start)/max(n, 1)) + " Seconds Per Sim On Average")
\ No newline at end of file
@@ -3,11 +3,15 @@ import os
 import re
 import subprocess
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait
 import time
 import random
 from timeit import default_timer as timer
 from tqdm import tqdm, trange
+from replaySplitter import split_output_to_replays
+from buildCatalog import load_catalog
+from resultsDb import ResultsWriter
+from validateInputs import report_problems, validate_inputs
 
 # ANSI color codes for styling
 COLORS = {
@@ -23,169 +27,46 @@ SPLIT_REPLAYS = True
 REPLAY_SPLIT_ROOT = "ReplaySplits"
 REPLAY_RUN_TAG = "latest"  # Set to a fixed string (ex: "latest") to overwrite a single folder
 
-def load_builds(file_path):
-    builds = {}
-    current_key = None
-    current_lines = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        for raw_line in f.readlines():
-            if raw_line.startswith("|"):
-                if current_key is not None:
-                    if current_key in builds:
-                        raise ValueError(f"Duplicate build key: {current_key}")
-                    builds[current_key] = current_lines
-                key_line = raw_line[1:].strip()
-                if "#" not in key_line:
-                    raise ValueError(f"Missing build id in line: {raw_line.strip()}")
-                pokemon, local_id = key_line.rsplit("#", 1)
-                current_key = (pokemon.strip(), int(local_id))
-                current_lines = []
-            else:
-                if current_key is None:
-                    if raw_line.strip() == "":
-                        continue
-                    raise ValueError("Build data found before any build header.")
-                current_lines.append(raw_line)
-    if current_key is not None:
-        if current_key in builds:
-            raise ValueError(f"Duplicate build key: {current_key}")
-        builds[current_key] = current_lines
-    return builds
-
-def write_builds_to_file(builds_by_key, build_refs, file_path, setLevel):
-    with open(file_path, "w") as f:
-        f.truncate(0)  # Clear the file
-        for pokemon, local_id in build_refs:
-            build_key = (pokemon, int(local_id))
-            build_lines = builds_by_key.get(build_key)
-            if build_lines is None:
-                raise KeyError(f"Build not found: {build_key}")
-            for line in build_lines:
-                if setLevel is not None and line.startswith("Level: "):
-                    f.write(f"Level: {setLevel}\n")
-                else:
-                    f.write(line)
-            f.write("\n")  # Add a newline to separate builds
-
-def sanitize_filename(value):
-    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip())
-    safe = safe.strip("._-")
-    return safe if safe else "Unknown"
-
-def extract_trainers(battle_text):
-    for line in battle_text.splitlines():
-        line = line.strip()
-        if not line or line.startswith("|"):
-            continue
-        if " vs " in line:
-            left, right = line.split(" vs ", 1)
-            return left.strip(), right.strip()
-    return "Unknown", "Unknown"
-
-def extract_replay_log(battle_text):
-    return "\n".join(line for line in battle_text.splitlines() if line.startswith("|"))
-
-def write_replay_html(log_text, file_path):
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write("<!DOCTYPE html>\n")
-        f.write('<script type="text/plain" class="battle-log-data">')
-        f.write(log_text)
-        f.write("</script>\n")
-        f.write('<script src="https://play.pokemonshowdown.com/js/replay-embed.js"></script>\n')
-
-def split_output_to_replays(output_path, output_root, run_tag=None):
-    if not os.path.exists(output_path):
-        raise FileNotFoundError(f"Output file not found: {output_path}")
-    if run_tag is None:
-        run_tag = time.strftime("%Y%m%d_%H%M%S")
-    output_dir = os.path.join(output_root, run_tag)
-    matchup_dir = os.path.join(output_dir, "by_matchup")
-    trainer_dir = os.path.join(output_dir, "by_trainer")
-    os.makedirs(matchup_dir, exist_ok=True)
-    os.makedirs(trainer_dir, exist_ok=True)
-
-    with open(output_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    raw_battles = re.split(r"\[\[\[\[\[|\]\]\]\]\]", content)
-    battles = [b for b in raw_battles if b.strip()]
-
-    trainer_index = {}
-    for idx, battle in enumerate(battles, start=1):
-        trainer_1, trainer_2 = extract_trainers(battle)
-        safe_1 = sanitize_filename(trainer_1)
-        safe_2 = sanitize_filename(trainer_2)
-        file_name = f"{safe_1}_vs_{safe_2}__{idx:06d}.html"
-        file_path = os.path.join(matchup_dir, file_name)
-        log_text = extract_replay_log(battle)
-        if not log_text:
-            continue
-        write_replay_html(log_text, file_path)
-        rel_path = os.path.join("by_matchup", file_name)
-        trainer_index.setdefault(trainer_1, []).append(rel_path)
-        trainer_index.setdefault(trainer_2, []).append(rel_path)
-
-    with open(os.path.join(output_dir, "trainer_index.json"), "w", encoding="utf-8") as f:
-        json.dump(trainer_index, f, indent=2)
-
-    for trainer, rel_paths in trainer_index.items():
-        safe_trainer = sanitize_filename(trainer)
-        trainer_index_path = os.path.join(trainer_dir, f"{safe_trainer}.txt")
-        with open(trainer_index_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(rel_paths))
-            f.write("\n")
-    return output_dir
+MAX_ATTEMPTS = 10 # times a single battle is tried before it is given up on
+RETRY_BUDGET = 500 # total reruns of failed battles allowed in a run
+UNRECOVERABLE_FILE = "unrecoverable_battles.json" # battles that still failed, in the tournament_battles.json format
+RESULTS_DB = "results.db" # every battle of every run, see resultsDb.py
+
+def simulation_failed(result):
+    # showdown sometimes fails for some unexpected reason, these are the signs it did
+    if result.startswith("node:internal") or result.startswith("TypeError") or result.startswith("runtime") or re.search(r'Node\.js\s+v\d+\.\d+\.\d+$', result[-30:]):
+        return True
+    # the line after the "A vs B" header, however long the trainer names are
+    lines = result.split("\n", 3)
+    return len(lines) < 3 or lines[2].startswith("TypeError")
 
 # =============================================================================
 # Runs a single simulation for some matchup passed in
 # =============================================================================
-def runSimulation(matchup, threadNo, builds_by_key, teams_by_leader, setLevel):
+def runSimulation(matchup, threadNo, catalog, teams_by_leader, setLevel, attempt=1):
     leader_1, leader_2 = matchup
     team1 = teams_by_leader[leader_1]
     team2 = teams_by_leader[leader_2]
     team1No = leader_1
     team2No = leader_2
 
-    game = str(len(team1)) + "v" + str(len(team2))
-
     # Process the first group of builds
-    write_builds_to_file(builds_by_key, team1, f"./WorkerFiles/{threadNo}1.txt", setLevel)
+    catalog.write_team(team1, f"./WorkerFiles/{threadNo}1.txt", setLevel)
     # Process the second group of builds
-    write_builds_to_file(builds_by_key, team2, f"./WorkerFiles/{threadNo}2.txt", setLevel)
-    RetryCount = 0
-    while True:
-        #mycommand = "cd ../pokemon-showdown && node build && node ./dist/sim/examples/battle-stream-example"
-        mycommand = "cd ../pokemon-showdown && node ./dist/sim/examples/Simulation-test-1 " + threadNo + " " + str(team1No) + " " + str(team2No)
-        result = subprocess.getoutput(mycommand)
-        # if the battle fails we retry, sometimes showdown fails for some unexpected reason
-        if not (result.startswith("node:internal") or result.startswith("TypeError") or result.startswith("runtime") or re.search(r'Node\.js\s+v\d+\.\d+\.\d+$', result[-30:])):
-            try:
-                if not (result[:40].split("\n")[2].startswith("TypeError")):
-                    break
-                else:
-                    if RetryCount > 9:
-                        print("Error occurred with battle 10 times, skipping " + game)
-                        RetryCount = 0
-                        with open ("./ErrorOutputs.txt", "a") as o: 
-                            o.write(result + "\n]]]]]\n")
-                        break
-                    RetryCount += 1
-            except:
-                print("Unexpected error occurred with battle, skipping " + game)
-                RetryCount = 0
-                with open ("./ErrorOutputs.txt", "a") as o: 
-                    o.write(result + "\n]]]]]\n")
-                break
-        else:
-            if RetryCount > 9:
-                print("node:internal error, TypeError or runtime error occurred with battle, skipping " + game)
-                RetryCount = 0
-                with open ("./ErrorOutputs.txt", "a") as o: 
-                    o.write(result + "\n]]]]]\n")
-                break
-            RetryCount += 1
+    catalog.write_team(team2, f"./WorkerFiles/{threadNo}2.txt", setLevel)
+    #mycommand = "cd ../pokemon-showdown && node build && node ./dist/sim/examples/battle-stream-example"
+    mycommand = "cd ../pokemon-showdown && node ./dist/sim/examples/Simulation-test-1 " + threadNo + " " + str(team1No) + " " + str(team2No)
+    result = subprocess.getoutput(mycommand)
+    if simulation_failed(result):
+        # keep failed battles out of the output, they are queued to run again once the main queue is done
+        with open ("./ErrorOutputs.txt", "a") as o: 
+            o.write(result + "\n]]]]]\n")
+        queue_rerun(matchup, attempt)
+        results_db.add_failed(leader_1, leader_2)
+        return result
     with open ("./WorkerOutputs/" + threadNo + ".txt", "a") as o: 
         o.write(result + "\n]]]]]\n")
+    results_db.add_battle(result, leader_1, leader_2)
 
     try:
         # Extract the "vs" line
@@ -243,10 +124,15 @@ teams = teams[:n] # comment this out to simulate all battles
 n = len(teams)
 noOfTeams = len(teams_by_leader)
 
+# check every team and build before any battle runs, a broken ref would otherwise only show up mid run
+if report_problems(validate_inputs(builds_filename, teams_by_leader, teams), show_warnings=False):
+    raise SystemExit("Fix the errors above before running, see validateInputs.py for the warnings")
+
 with open ("./output.txt", "a") as o: 
     o.truncate(0)
 with open ("./ErrorOutputs.txt", "a") as o: 
     o.truncate(0)
+results_db = ResultsWriter(RESULTS_DB, "trainers")
 
 # combine the individual worker outputs into one
 infiles = [str(i+1) for i in range(noOfThreads)]
@@ -262,6 +148,7 @@ start = time.time()
 
 lock = threading.Lock()
 lock2 = threading.Lock()
+rerun_lock = threading.Lock() # own lock, lock2 is held while waiting for a free thread name
 condition = threading.Condition(lock)
 
 thread_names = [str(i+1) for i in range(noOfThreads)]
@@ -269,10 +156,22 @@ thread_names = [str(i+1) for i in range(noOfThreads)]
 simulation_counter = 0
 simulations_since_last_update = 0
 
-builds_by_key = load_builds(builds_filename)
+rerun_queue = [] # (matchup, attempts so far) of failed battles, run after the main queue
+unrecoverable = [] # battles that failed MAX_ATTEMPTS times or ran out of retry budget
+retries_used = 0
+
+def queue_rerun(matchup, attempt):
+    with rerun_lock:
+        if attempt >= MAX_ATTEMPTS:
+            print(f"Battle {matchup[0]} vs {matchup[1]} failed {attempt} times, giving up on it")
+            unrecoverable.append(list(matchup))
+        else:
+            rerun_queue.append((matchup, attempt))
+
+catalog = load_catalog(builds_filename)
 
 # Function to submit simulations and manage thread names
-def submit_simulation(executor, team):
+def submit_simulation(executor, team, attempt=1):
     global simulation_counter
     global simulations_since_last_update
     with condition:  # Use condition variable to wait for an available thread name
@@ -309,9 +208,10 @@ def submit_simulation(executor, team):
                     formatted_time = f"{seconds} second(s)"
 
     # Submit the task
-    future = executor.submit(runSimulation, team, thread_name, builds_by_key, teams_by_leader, setLevel)
+    future = executor.submit(runSimulation, team, thread_name, catalog, teams_by_leader, setLevel, attempt)
     # Attach the callback to the future
     future.add_done_callback(release_thread_name)
+    return future
 
 # Initialize progress bar
 total_teams = len(teams)
@@ -326,17 +226,48 @@ bar_format = (
 progress_bar = trange(total_teams, desc=desc, dynamic_ncols=True, leave=True, mininterval=0.5, bar_format=bar_format, position=2)
 
 with ThreadPoolExecutor(max_workers=noOfThreads) as executor:
-    while teams:
-        with lock2:
-            if teams:
-                team = teams.pop(0)
-                submit_simulation(executor, team)
-                progress_bar.update(1)  # Update progress bar each time a team is processed
+    attempts = [1] * len(teams)
+    while True:
+        futures = []
+        while teams:
+            with lock2:
+                if teams:
+                    team = teams.pop(0)
+                    futures.append(submit_simulation(executor, team, attempts.pop(0)))
+                    progress_bar.update(1)  # Update progress bar each time a team is processed
+        # once everything queued has finished, rerun the battles that failed, as far as the retry budget allows
+        wait(futures)
+        with rerun_lock:
+            reruns = rerun_queue[:max(RETRY_BUDGET - retries_used, 0)]
+            del rerun_queue[:len(reruns)]
+        if not reruns:
+            break
+        retries_used += len(reruns)
+        print(f"Rerunning {len(reruns)} failed battles, {RETRY_BUDGET - retries_used} retries left")
+        teams = [list(matchup) for matchup, _ in reruns]
+        attempts = [attempt + 1 for _, attempt in reruns]
+        progress_bar.total += len(reruns)
+        progress_bar.refresh()
 
 progress_bar.close()  # Close progress bar when done
+results_db.close()
 print(len(teams))  # Keeping track of remaining teams
 end = time.time()
 
+# report the battles that could not be run, so they can be looked into and rerun later
+unrecoverable += [list(matchup) for matchup, _ in rerun_queue]
+with open(UNRECOVERABLE_FILE, "w", encoding="utf-8") as outfile:
+    json.dump(unrecoverable, outfile, indent=2)
+if unrecoverable:
+    print(f"{len(unrecoverable)} battles could not be run after {retries_used} retries, see {UNRECOVERABLE_FILE} and ErrorOutputs.txt:")
+    unrecoverable_counts = {}
+    for matchup in unrecoverable:
+        unrecoverable_counts[tuple(matchup)] = unrecoverable_counts.get(tuple(matchup), 0) + 1
+    for matchup, count in unrecoverable_counts.items():
+        print(f"  {matchup[0]} vs {matchup[1]}: {count}")
+else:
+    print(f"All battles ran, {retries_used} failed battles were rerun")
+
 with open("output.txt", "a") as outfile:
     for i in infiles:
         with open("./WorkerOutputs/" + i + ".txt", "r") as output:
@@ -0,0 +1,216 @@
+import argparse
+import json
+
+import numpy as np
+
+from buildCatalog import build_moves, load_catalog
+from compileTournament import load_plan
+from validateInputs import export_species, normalize
+
+# =============================================================================
+# A cheap estimate of how a Gen 1 build does against a leader's team, from
+# types and move power alone, to leave hopeless builds out before any battle
+# is simulated. For every build and leader pokemon it compares the best
+# damage the build can do (power x accuracy x STAB x effectiveness) with the
+# best damage the leader pokemon can do back, and scores the leg as
+# offense / (offense + threat). A build's score is the mean over the leader's
+# team, a rough stand-in for the share of legs it wins. Stats, levels, speed
+# and status moves are ignored, so it is only good for ranking builds of the
+# same species against each other.
+#
+# All builds against a leader are scored at once with NumPy.
+# =============================================================================
+
+TYPE_CHART_PATH = "UsefulDatasets/gen_1_type-chart.json"
+DEX_TYPES_PATH = "UsefulDatasets/dex_of_types.json"
+MOVES_PATH = "UsefulDatasets/gen_1_moves.json"
+MAX_MOVES = 4
+STAB = 1.5
+DEFAULT_POWER = 50 # threat of a leader pokemon with no known damaging moves, for each of its types
+
+def load_json(file_path):
+    # dex_of_types.json starts with a stray "{", which json won't read
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.startswith("{{"):
+        text = text[1:]
+    return json.loads(text)
+
+def load_surrogate_data(type_chart_path=TYPE_CHART_PATH, dex_types_path=DEX_TYPES_PATH, moves_path=MOVES_PATH):
+    """
+    Load the type chart, species types and move data.
+
+    :return: Dict of 'types' (type names), 'type_ids', 'chart' (attacking type x defending type
+        multipliers, with an extra neutral type last for missing and unknown types), 'species_types'
+        (normalized species -> type names) and 'moves' (normalized move -> (type name, power x accuracy)).
+    """
+    type_chart = load_json(type_chart_path)
+    types = list(type_chart.keys())
+    type_ids = {name: i for i, name in enumerate(types)}
+    chart = np.ones((len(types) + 1, len(types) + 1))
+    for attacker, row in type_chart.items():
+        for defender, multiplier in row.items():
+            chart[type_ids[attacker], type_ids[defender]] = multiplier
+
+    species_types = {}
+    for species, entry in load_json(dex_types_path).items():
+        species_types.setdefault(normalize(species), [entry[key].title() for key in ("type1", "type2") if entry[key]])
+
+    moves = {}
+    for name, info in load_json(moves_path).items():
+        if info["Power"].isdigit():
+            accuracy = info["Accuracy"].rstrip("%")
+            moves[name] = (info["Type"], int(info["Power"]) * (int(accuracy) / 100 if accuracy.isdigit() else 1))
+    return {"types": types, "type_ids": type_ids, "chart": chart, "species_types": species_types, "moves": moves}
+
+def species_type_ids(data, species):
+    # Two type ids of a species, the neutral type for the second of single typed and both of unknown species
+    neutral = len(data["types"])
+    names = data["species_types"].get(normalize(species)) or data["species_types"].get(normalize(species.split("-", 1)[0]), [])
+    ids = [data["type_ids"].get(name, neutral) for name in names[:2]]
+    return ids + [neutral] * (2 - len(ids))
+
+def team_arrays(data, members, default_power=0):
+    """
+    Arrays of a list of builds, each given as its Showdown export lines.
+
+    :param default_power: If not 0, builds without known damaging moves attack with their own types at this power.
+    :return: Tuple of (len(members) x 2 type ids, len(members) x MAX_MOVES move type ids,
+        len(members) x MAX_MOVES move powers with STAB), moves that don't do damage having a power of 0.
+    """
+    neutral = len(data["types"])
+    types = np.full((len(members), 2), neutral, dtype=np.int64)
+    move_types = np.full((len(members), MAX_MOVES), neutral, dtype=np.int64)
+    move_powers = np.zeros((len(members), MAX_MOVES))
+    for i, lines in enumerate(members):
+        types[i] = species_type_ids(data, export_species(lines[0].strip()))
+        damaging = [data["moves"][name] for name in map(normalize, build_moves(lines)) if name in data["moves"]]
+        if not damaging and default_power:
+            damaging = [(data["types"][t], default_power) for t in types[i] if t != neutral]
+        for j, (move_type, power) in enumerate(damaging[:MAX_MOVES]):
+            move_types[i, j] = data["type_ids"].get(move_type, neutral)
+            move_powers[i, j] = power * (STAB if move_types[i, j] in types[i] and move_types[i, j] != neutral else 1)
+    return types, move_types, move_powers
+
+def leg_scores(data, pokemon, leader):
+    """
+    Estimated chance of every build beating every leader pokemon 1v1.
+
+    :param pokemon: team_arrays of the builds.
+    :param leader: team_arrays of the leader's team.
+    :return: builds x leader pokemon array of scores from 0 to 1.
+    """
+    chart = data["chart"]
+    types, move_types, move_powers = pokemon
+    leader_types, leader_move_types, leader_move_powers = leader
+    # builds x moves x leader pokemon
+    effectiveness = chart[move_types[:, :, None], leader_types[None, None, :, 0]] * chart[move_types[:, :, None], leader_types[None, None, :, 1]]
+    offense = (move_powers[:, :, None] * effectiveness).max(axis=1)
+    # builds x leader pokemon x leader moves
+    effectiveness = chart[leader_move_types[None, :, :], types[:, None, None, 0]] * chart[leader_move_types[None, :, :], types[:, None, None, 1]]
+    threat = (leader_move_powers[None, :, :] * effectiveness).max(axis=2)
+    total = offense + threat
+    return np.where(total > 0, offense / np.where(total > 0, total, 1), 0.5)
+
+def score_gauntlets(plan, trainer_catalog, pokemon_catalog, data=None):
+    """
+    Surrogate score of every gauntlet of a compiled tournament (see compileTournament.py).
+
+    :return: Array of the score of each gauntlet's build against its leader's team.
+    """
+    data = data or load_surrogate_data()
+    member_offsets = plan["member_offsets"]
+    member_builds = plan["member_builds"]
+    first_legs = plan["leg_offsets"][:-1]
+    last_legs = plan["leg_offsets"][1:] - 1
+    pokemon_builds = [member_builds[member_offsets[team]] for team in plan["leg_pokemon"][first_legs]]
+    scores = np.zeros(len(first_legs))
+    for leader_id in np.unique(plan["gauntlet_leader"]):
+        gauntlets = np.flatnonzero(plan["gauntlet_leader"] == leader_id)
+        # the last leg of a gauntlet is against the leader's full team
+        team = plan["leg_trainer"][last_legs[gauntlets[0]]]
+        leader = team_arrays(data, [trainer_catalog.builds[b][1] for b in member_builds[member_offsets[team]:member_offsets[team + 1]]], DEFAULT_POWER)
+        pokemon = team_arrays(data, [pokemon_catalog.builds[pokemon_builds[g]][1] for g in gauntlets])
+        scores[gauntlets] = leg_scores(data, pokemon, leader).mean(axis=1)
+    return scores
+
+def species_best(plan, scores):
+    # Best score of any gauntlet of the same leader and species, for every gauntlet
+    groups = plan["gauntlet_leader"].astype(np.int64) * len(plan["species_names"]) + plan["gauntlet_species"]
+    best = np.full(len(plan["leader_names"]) * len(plan["species_names"]), -np.inf)
+    np.maximum.at(best, groups, scores)
+    return best[groups]
+
+def prune_mask(plan, scores, threshold):
+    """
+    Which gauntlets are worth simulating.
+
+    :param threshold: A gauntlet is kept if its score is at least threshold x the best score of
+        the same species against the same leader, so the best build of each species is always kept.
+    :return: Boolean array, True for the gauntlets to keep.
+    """
+    return scores >= threshold * species_best(plan, scores)
+
+def spearman(x, y):
+    # Rank correlation, ties broken by order
+    rank_x = np.argsort(np.argsort(x))
+    rank_y = np.argsort(np.argsort(y))
+    return float(np.corrcoef(rank_x, rank_y)[0, 1]) if len(x) > 1 else float("nan")
+
+def prune_report(plan, scores, keep, simulated_scores=None, simulated_builds=None):
+    """
+    Print how many gauntlets are pruned and how the surrogate agrees with a simulated run.
+
+    :param simulated_scores: scores.json of a run without pruning, leader -> species -> best score.
+    :param simulated_builds: builds.json of the same run, leader -> species -> name of the best build's team.
+    """
+    leader_names = plan["leader_names"]
+    print(f"{int((~keep).sum())} of {len(keep)} gauntlets pruned ({(~keep).mean():.1%})")
+    for leader_id, leader in enumerate(leader_names):
+        of_leader = plan["gauntlet_leader"] == leader_id
+        if of_leader.any():
+            print(f"  {leader}: {int((~keep & of_leader).sum())} of {int(of_leader.sum())} pruned")
+
+    team_ids = {name: i for i, name in enumerate(plan["team_names"])}
+    first_pokemon = plan["leg_pokemon"][plan["leg_offsets"][:-1]]
+    gauntlet_of = {(int(plan["gauntlet_leader"][g]), int(first_pokemon[g])): g for g in range(len(keep))}
+    leader_ids = {name: i for i, name in enumerate(leader_names)}
+    if simulated_builds is not None:
+        kept = total = 0
+        for leader, species_builds in simulated_builds.items():
+            for team_name in species_builds.values():
+                g = gauntlet_of.get((leader_ids.get(leader), team_ids.get(team_name)))
+                if g is not None:
+                    total += 1
+                    kept += bool(keep[g])
+        print(f"{kept} of {total} simulated best builds kept")
+    if simulated_scores is not None:
+        best = species_best(plan, scores)
+        species_ids = {normalize(name): i for i, name in enumerate(plan["species_names"])}
+        best_of = {(int(plan["gauntlet_leader"][g]), int(plan["gauntlet_species"][g])): best[g] for g in range(len(keep))}
+        pairs = [(best_of[key], score) for leader, species_scores in simulated_scores.items() for species, score in species_scores.items()
+                 if (key := (leader_ids.get(leader), species_ids.get(normalize(species)))) in best_of]
+        if pairs:
+            surrogate, simulated = np.array(pairs).T
+            print(f"Rank correlation of surrogate and simulated species scores: {spearman(surrogate, simulated):.3f} over {len(pairs)} leader/species pairs")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the Pokemon mode tournament with the type/power surrogate and report what a threshold prunes.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="keep builds scoring at least this times the best of their species")
+    parser.add_argument("--plan", default="Inputs/tournament_plan.npz", help="compiled by runPokemonSimulations.py")
+    parser.add_argument("--leaders", default="Inputs/GymLeaderPokemon.txt")
+    parser.add_argument("--pokemon", default="Inputs/PokemonBuilds.txt")
+    parser.add_argument("--scores", default=None, help="scores.json of a run without pruning, to compare with")
+    parser.add_argument("--builds", default=None, help="builds.json of a run without pruning, to compare with")
+    args = parser.parse_args()
+
+    plan = load_plan(args.plan)
+    scores = score_gauntlets(plan, load_catalog(args.leaders), load_catalog(args.pokemon))
+    simulated = []
+    for file_path in (args.scores, args.builds):
+        if file_path is None:
+            simulated.append(None)
+        else:
+            with open(file_path, "r") as infile:
+                simulated.append(json.load(infile))
+    prune_report(plan, scores, prune_mask(plan, scores, args.threshold), *simulated)
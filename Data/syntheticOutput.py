@@ -0,0 +1,213 @@
+import argparse
+import json
+import random
+
+# =============================================================================
+# Generates synthetic output.txt files for testing and benchmarking the
+# parsers, error checking tools and replay splitter without running showdown.
+# Battles are written in the same format runSimulations.py produces:
+#   [[[[[
+#   Trainer A vs Trainer B
+#   |...showdown protocol lines...|
+#   |win|Bot 1
+#   ]]]]]
+# =============================================================================
+
+BATTLE_START = "[[[[["
+BATTLE_END = "]]]]]"
+
+DEFAULT_SPECIES = [
+    "Onix", "Golem", "Kabutops", "Tyranitar", "Aerodactyl", "Rhyperior",
+    "Starmie", "Golduck", "Seaking", "Lapras", "Gyarados", "Vaporeon",
+    "Raichu", "Magnezone", "Electrode", "Jolteon", "Electivire", "Zapdos",
+    "Victreebel", "Tangrowth", "Vileplume", "Exeggutor", "Venusaur", "Roserade",
+    "Gengar", "Alakazam", "Machamp", "Dragonite", "Arcanine", "Nidoking",
+]
+
+DEFAULT_MOVES = [
+    "Stone Edge", "Rock Slide", "Earthquake", "Surf", "Ice Beam", "Thunderbolt",
+    "Psychic", "Shadow Ball", "Flamethrower", "Giga Drain", "Sludge Bomb",
+    "Close Combat", "Swords Dance", "Toxic", "Recover", "Thunder Wave",
+]
+
+ERROR_OUTPUTS = [
+    "TypeError: Cannot read properties of undefined (reading 'moveSlots')\n"
+    "    at RandomPlayerAI.chooseMove (/pokemon-showdown/dist/sim/examples/Simulation-test-1.js:412:37)\n"
+    "    at RandomPlayerAI.receiveRequest (/pokemon-showdown/dist/sim/tools/random-player-ai.js:80:22)",
+    "(node:12345) UnhandledPromiseRejectionWarning: Error: Invalid move choice\n"
+    "    at Side.chooseMove (/pokemon-showdown/dist/sim/side.js:540:15)",
+    "Error: Team validation failed\n"
+    "    at Battle.setPlayer (/pokemon-showdown/dist/sim/battle.js:2890:13)",
+    "node:internal/process/promises:288\n"
+    "            triggerUncaughtException(err, true /* fromPromise */);\n"
+    "            ^\n\n"
+    "Node.js v21.6.1",
+]
+
+def make_trainers(trainer_count, rng, species_pool, teams_path=None):
+    # Use real trainer names and species if a teams file is given, otherwise make some up
+    if teams_path is not None:
+        with open(teams_path, "r", encoding="utf-8") as f:
+            teams_by_leader = json.load(f)
+        teams = {leader: [build[0] for build in team] for leader, team in teams_by_leader.items()}
+        return dict(list(teams.items())[:trainer_count])
+    teams = {}
+    for i in range(trainer_count):
+        teams[f"Trainer-{i + 1:04d}"] = rng.sample(species_pool, 6)
+    return teams
+
+def battle_log(team_1, team_2, outcome, rng, timestamp):
+    # Builds the showdown protocol section of a single battle
+    lines = [
+        "|init|battle",
+        "|title|Bot 1 vs. Bot 2",
+        "|j|☆Bot 1",
+        "|j|☆Bot 2",
+        "|t:|" + str(timestamp),
+        "|gametype|singles",
+        "|player|p1|Bot 1||",
+        "|player|p2|Bot 2||",
+        f"|teamsize|p1|{len(team_1)}",
+        f"|teamsize|p2|{len(team_2)}",
+        "|gen|4",
+        "|tier|[Gen 4] Custom Game",
+        "|rule|Sleep Clause Mod: Limit one foe put to sleep",
+        "|",
+        "|start",
+    ]
+    sides = {"p1": list(team_1), "p2": list(team_2)}
+    hp = {"p1": 100, "p2": 100}
+    active = {}
+    for side in ("p1", "p2"):
+        active[side] = sides[side].pop(0)
+        lines.append(f"|switch|{side}a: {active[side]}|{active[side]}, L50|100/100")
+
+    turn = 0
+    while True:
+        turn += 1
+        timestamp += rng.randint(1, 4)
+        lines.append(f"|turn|{turn}")
+        lines.append("|")
+        lines.append("|t:|" + str(timestamp))
+        if outcome == "tie" and turn >= 30:
+            lines.append("|tie")
+            return lines, timestamp
+        for attacker, defender in (("p1", "p2"), ("p2", "p1")) if rng.random() < 0.5 else (("p2", "p1"), ("p1", "p2")):
+            if rng.random() < 0.1 and sides[attacker]:
+                # switch out instead of attacking
+                sides[attacker].append(active[attacker])
+                active[attacker] = sides[attacker].pop(0)
+                hp[attacker] = 100
+                lines.append(f"|switch|{attacker}a: {active[attacker]}|{active[attacker]}, L50|100/100")
+                continue
+            lines.append(f"|move|{attacker}a: {active[attacker]}|{rng.choice(DEFAULT_MOVES)}|{defender}a: {active[defender]}")
+            # the side that is meant to win hits harder so that battles end with the right victor
+            losing_side = "p2" if outcome == "p1" else "p1"
+            damage = rng.randint(35, 70) if defender == losing_side or outcome == "tie" else rng.randint(5, 25)
+            hp[defender] = max(0, hp[defender] - damage)
+            if rng.random() < 0.2:
+                lines.append(f"|-supereffective|{defender}a: {active[defender]}")
+            if hp[defender] == 0:
+                lines.append(f"|-damage|{defender}a: {active[defender]}|0 fnt")
+                lines.append(f"|faint|{defender}a: {active[defender]}")
+                if not sides[defender]:
+                    if outcome == "tie":
+                        lines.append("|tie")
+                    else:
+                        lines.append("|win|" + ("Bot 1" if defender == "p2" else "Bot 2"))
+                    return lines, timestamp
+                active[defender] = sides[defender].pop(0)
+                hp[defender] = 100
+                lines.append("|")
+                lines.append("|upkeep")
+                lines.append(f"|switch|{defender}a: {active[defender]}|{active[defender]}, L50|100/100")
+                break
+            lines.append(f"|-damage|{defender}a: {active[defender]}|{hp[defender]}/100")
+        lines.append("|")
+        lines.append("|upkeep")
+
+def generate_output(file_path, trainer_count=16, battle_count=1000, tie_rate=0.01, error_rate=0.01,
+                    malformed_rate=0.005, seed=0, teams_path=None, unique_logs=2000):
+    """
+    Write a synthetic output file and return a summary of what was written.
+
+    :param trainer_count: Number of trainers taking part in the tournament.
+    :param battle_count: Number of battles to write (errors and malformed entries included).
+    :param tie_rate: Fraction of battles that end in a tie.
+    :param error_rate: Fraction of battles replaced with a showdown crash.
+    :param malformed_rate: Fraction of battles with a missing header, outcome or end marker.
+    :param unique_logs: Number of distinct battle logs to generate and reuse, which keeps
+        generation fast for very large files.
+    :return: A dict of expected counts, useful for checking parsers against.
+    """
+    rng = random.Random(seed)
+    teams = make_trainers(trainer_count, rng, DEFAULT_SPECIES, teams_path)
+    trainers = list(teams.keys())
+    if len(trainers) < 2:
+        raise ValueError("Need at least two trainers to generate battles.")
+
+    # Pre-render a pool of battle logs so huge files don't need a fresh log per battle
+    log_pool = {"p1": [], "p2": [], "tie": []}
+    timestamp = 1700000000
+    pool_size = max(1, unique_logs // 3)
+    for outcome in log_pool:
+        for _ in range(pool_size):
+            team_1, team_2 = rng.sample(trainers, 2)
+            lines, timestamp = battle_log(teams[team_1], teams[team_2], outcome, rng, timestamp)
+            log_pool[outcome].append("\n".join(lines))
+
+    summary = {"battles": 0, "wins_bot_1": 0, "wins_bot_2": 0, "ties": 0, "errors": 0, "malformed": 0}
+    with open(file_path, "w", encoding="utf-8", newline="\n") as f:
+        for _ in range(battle_count):
+            trainer_1, trainer_2 = rng.sample(trainers, 2)
+            roll = rng.random()
+            if roll < error_rate:
+                # showdown crashed, runSimulations still writes the end marker after the output
+                f.write(rng.choice(ERROR_OUTPUTS) + "\n" + BATTLE_END + "\n")
+                summary["errors"] += 1
+                continue
+            roll -= error_rate
+            outcome = "tie" if rng.random() < tie_rate else rng.choice(("p1", "p2"))
+            log = rng.choice(log_pool[outcome])
+            header = f"{BATTLE_START}\n{trainer_1} vs {trainer_2}\n"
+            if roll < malformed_rate:
+                kind = rng.randrange(3)
+                if kind == 0:
+                    # missing "A vs B" header
+                    f.write(BATTLE_START + "\n" + log + "\n" + BATTLE_END + "\n")
+                elif kind == 1:
+                    # battle cut off before a result was written
+                    f.write(header + log.rsplit("\n", 1)[0] + "\n" + BATTLE_END + "\n")
+                else:
+                    # crash partway through a battle
+                    f.write(header + log.split("\n|turn|2", 1)[0] + "\n" + ERROR_OUTPUTS[0] + "\n" + BATTLE_END + "\n")
+                summary["malformed"] += 1
+                continue
+            f.write(header + log + "\n" + BATTLE_END + "\n")
+            summary["battles"] += 1
+            if outcome == "p1":
+                summary["wins_bot_1"] += 1
+            elif outcome == "p2":
+                summary["wins_bot_2"] += 1
+            else:
+                summary["ties"] += 1
+    summary["trainers"] = trainers
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic battle output file.")
+    parser.add_argument("output", nargs="?", default="synthetic_output.txt")
+    parser.add_argument("--trainers", type=int, default=16)
+    parser.add_argument("--battles", type=int, default=1000)
+    parser.add_argument("--tie-rate", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--teams", default=None, help="use trainers from a GymLeaderTeams.json file")
+    parser.add_argument("--unique-logs", type=int, default=2000)
+    args = parser.parse_args()
+
+    summary = generate_output(args.output, args.trainers, args.battles, args.tie_rate, args.error_rate,
+                              args.malformed_rate, args.seed, args.teams, args.unique_logs)
+    summary.pop("trainers")
+    print(summary)
@@ -0,0 +1,192 @@
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+
+from buildFiles import parse_build_key, read_build_blocks
+
+# =============================================================================
+# Checks the builds and teams of a run before any battle is simulated. Every
+# (species, local_id) a team refers to must have a build, and the species in
+# the build's "|Species#id" header must be the one in its Showdown export.
+# Species and moves are also looked up in the dex, and levels and movesets
+# are checked. All problems are collected in one pass and reported together.
+#
+# The dex only goes up to gen 8, so unknown species and moves are warnings,
+# as are moves listed twice, which showdown runs as they are. Everything that
+# would break or silently change a battle is an error.
+# =============================================================================
+
+DEX_PATH = "UsefulDatasets/pokedex.txt"
+# pokedex.txt only lists level up and egg moves, these add the TM moves of the early gens
+MOVE_LISTS = ["UsefulDatasets/gen_1_moves.json", "UsefulDatasets/gen_2_moves.json"]
+MAX_TEAM_SIZE = 6
+MAX_MOVES = 4
+ERROR = "error"
+WARNING = "warning"
+
+def normalize(name):
+    # "Mr. Mime" -> "mrmime", so names compare like the dex's internal names
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+def load_dex(dex_path=DEX_PATH, move_lists=MOVE_LISTS):
+    """
+    Species and move names from a pokedex.txt in the PBS format.
+
+    :return: Tuple of the set of normalized species names and the set of normalized
+        move names any species learns, or (None, None) if there is no dex.
+    """
+    if not os.path.exists(dex_path):
+        return None, None
+    species = set()
+    moves = set()
+    with open(dex_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            key, _, value = line.partition(" = ")
+            if key == "Name":
+                species.add(normalize(value))
+            elif key == "Moves":
+                # level, move, level, move, ...
+                moves.update(normalize(move) for move in value.split(",")[1::2])
+            elif key == "EggMoves":
+                moves.update(normalize(move) for move in value.split(","))
+    for move_list in move_lists:
+        if os.path.exists(move_list):
+            with open(move_list, "r", encoding="utf-8") as f:
+                moves.update(normalize(move) for move in json.load(f))
+    return species, moves
+
+def export_species(first_line):
+    # Species from the first line of a Showdown export, e.g. "Nick (Onix) (M) @ Eviolite" -> "Onix"
+    name = first_line.split(" @ ", 1)[0].strip()
+    name = re.sub(r"\s*\((?:M|F)\)$", "", name)
+    nickname = re.search(r"\(([^()]+)\)$", name)
+    return nickname.group(1).strip() if nickname else name
+
+def known_species(species, dex_species):
+    # Forms like "Rotom-Wash" aren't in the dex, fall back on the base species
+    return normalize(species) in dex_species or normalize(species.split("-", 1)[0]) in dex_species
+
+def check_build(key, location, lines, dex_species, dex_moves, problems, unknown_moves):
+    lines = [line.strip() for line in lines if line.strip()]
+    if not lines:
+        problems.append((ERROR, location, f"Build {key[0]}#{key[1]} is empty"))
+        return
+    species = export_species(lines[0])
+    if normalize(species) != normalize(key[0]):
+        problems.append((ERROR, location, f"Header says {key[0]} but the build is for {species}"))
+    if dex_species is not None and not known_species(species, dex_species):
+        problems.append((WARNING, location, f"Species {species} is not in the dex"))
+
+    moves = []
+    for line in lines[1:]:
+        if line.startswith("- "):
+            moves.append(line[2:].strip())
+        elif line.startswith("Level:"):
+            level = line[6:].strip()
+            if not level.isdigit() or not 1 <= int(level) <= 100:
+                problems.append((ERROR, location, f"Level {level} is not a number from 1 to 100"))
+    if not moves:
+        problems.append((WARNING, location, f"Build {key[0]}#{key[1]} has no moves"))
+    if len(moves) > MAX_MOVES:
+        problems.append((ERROR, location, f"Build {key[0]}#{key[1]} has {len(moves)} moves"))
+    seen = set()
+    for move in moves:
+        # "Hidden Power [Fire]" is Hidden Power in the dex
+        name = normalize(move.split("[", 1)[0])
+        if name in seen:
+            problems.append((WARNING, location, f"Move {move} is listed twice"))
+        seen.add(name)
+        if dex_moves is not None and name not in dex_moves:
+            unknown_moves.setdefault(move, []).append(location)
+
+def validate_inputs(builds_path, teams_by_leader, matchups=(), dex_path=DEX_PATH):
+    """
+    Find every problem with the builds and teams of a run.
+
+    :param teams_by_leader: Dict of leader name to a list of [species, local_id] build refs, as in GymLeaderTeams.json.
+    :param matchups: [leader 1, leader 2] pairs to be simulated, as in tournament_battles.json.
+    :return: List of (severity, location, message) tuples, severity being ERROR or WARNING.
+    """
+    problems = []
+    dex_species, dex_moves = load_dex(dex_path)
+
+    builds = {}
+    unknown_moves = {}  # move -> locations, reported once per move
+    for line_number, header, lines in read_build_blocks(builds_path):
+        location = f"{builds_path}:{line_number}"
+        if header is None:
+            problems.append((ERROR, location, "Build data found before any build header"))
+            continue
+        try:
+            key = parse_build_key(header)
+        except ValueError:
+            problems.append((ERROR, location, f"Header |{header} is not in the Species#id format"))
+            continue
+        if key in builds:
+            problems.append((ERROR, location, f"Duplicate build {key[0]}#{key[1]}, first at line {builds[key]}"))
+            continue
+        builds[key] = line_number
+        check_build(key, location, lines, dex_species, dex_moves, problems, unknown_moves)
+    for move, locations in unknown_moves.items():
+        problems.append((WARNING, locations[0], f"Move {move} is not in the dex ({len(locations)} builds)"))
+
+    ids_by_species = {}
+    for species, local_id in builds:
+        ids_by_species.setdefault(species, []).append(local_id)
+    for leader, team in teams_by_leader.items():
+        location = f"team {leader}"
+        if not team or len(team) > MAX_TEAM_SIZE:
+            problems.append((ERROR, location, f"Team has {len(team)} pokemon"))
+        seen = set()
+        for ref in team:
+            try:
+                species, local_id = ref
+                key = (species, int(local_id))
+            except (TypeError, ValueError):
+                problems.append((ERROR, location, f"Build ref {ref!r} is not a [species, local_id] pair"))
+                continue
+            if key not in builds:
+                if species in ids_by_species:
+                    hint = f"{species} has builds {', '.join(str(i) for i in sorted(ids_by_species[species]))}"
+                else:
+                    close = difflib.get_close_matches(species, ids_by_species.keys(), n=3)
+                    hint = f"did you mean {', '.join(close)}?" if close else f"there are no {species} builds"
+                problems.append((ERROR, location, f"No build {species}#{local_id}, {hint}"))
+            if species in seen:
+                problems.append((WARNING, location, f"{species} is on the team more than once"))
+            seen.add(species)
+
+    for matchup in matchups:
+        for leader in matchup:
+            if leader not in teams_by_leader:
+                problems.append((ERROR, f"matchup {matchup[0]} vs {matchup[1]}", f"{leader} has no team"))
+    return problems
+
+def report_problems(problems, show_warnings=True):
+    # Print problems, errors first, and return the number of errors
+    errors = [problem for problem in problems if problem[0] == ERROR]
+    warnings = [problem for problem in problems if problem[0] == WARNING]
+    for severity, location, message in errors + (warnings if show_warnings else []):
+        print(f"{severity}: {location}: {message}")
+    print(f"{len(errors)} errors, {len(warnings)} warnings")
+    return len(errors)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the builds and teams of a run before simulating it.")
+    parser.add_argument("--builds", default="Inputs/GymLeaderPokemon.txt")
+    parser.add_argument("--teams", default="Inputs/GymLeaderTeams.json")
+    parser.add_argument("--battles", default="Inputs/tournament_battles.json", help="matchups to check, skipped if the file doesn't exist")
+    parser.add_argument("--dex", default=DEX_PATH)
+    parser.add_argument("--no-warnings", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.teams, "r", encoding="utf-8") as infile:
+        teams_by_leader = json.load(infile)
+    matchups = []
+    if os.path.exists(args.battles):
+        with open(args.battles, "r", encoding="utf-8") as infile:
+            matchups = json.load(infile)
+    sys.exit(1 if report_problems(validate_inputs(args.builds, teams_by_leader, matchups, args.dex), not args.no_warnings) else 0)
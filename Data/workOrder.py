@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+
+from validateInputs import normalize
+
+# =============================================================================
+# Orders the gauntlets of a Pokemon-mode run so each species' likely best
+# build against a leader runs first. Once a build sweeps a leader the rest of
+# its species' gauntlets against that leader are cancelled, so the sooner a
+# sweeping build runs, the fewer of its siblings are simulated. Gauntlets are
+# ranked within their (leader, species) by expected score: the build that won
+# in a previous run's builds.json first, then by surrogate score (see
+# surrogateScorer.py). Every group's best guess runs before any group's
+# second guess, groups that swept before going first.
+# =============================================================================
+
+def gauntlet_groups(plan):
+    # (leader, species) group number of every gauntlet
+    return plan["gauntlet_leader"].astype(np.int64) * len(plan["species_names"]) + plan["gauntlet_species"]
+
+def load_previous(file_path):
+    # scores.json or builds.json of a previous run, or None if there isn't one
+    if file_path is None or not os.path.exists(file_path):
+        return None
+    with open(file_path, "r") as infile:
+        return json.load(infile)
+
+def expected_scores(plan, surrogate_scores=None, previous_scores=None, previous_builds=None):
+    """
+    Expected score of every gauntlet and of its (leader, species) group.
+
+    :param surrogate_scores: Surrogate score of every gauntlet, or None to rank by previous results alone.
+    :param previous_scores: scores.json of a previous run, leader -> species -> best score.
+    :param previous_builds: builds.json of a previous run, leader -> species -> name of the best build's team.
+    :return: Tuple of an array of the expected score of every gauntlet, in which a build that won in
+        previous_builds scores above every other build of its group, and an array of the expected
+        score of every gauntlet's group.
+    """
+    groups = gauntlet_groups(plan)
+    expected = np.zeros(len(groups)) if surrogate_scores is None else np.asarray(surrogate_scores, dtype=float).copy()
+    group_prior = np.full(len(plan["leader_names"]) * len(plan["species_names"]), -np.inf)
+    np.maximum.at(group_prior, groups, expected)
+
+    leader_ids = {name: i for i, name in enumerate(plan["leader_names"])}
+    species_ids = {normalize(name): i for i, name in enumerate(plan["species_names"])}
+    for leader, species_scores in (previous_scores or {}).items():
+        for species, score in species_scores.items():
+            if leader in leader_ids and normalize(species) in species_ids:
+                group_prior[leader_ids[leader] * len(plan["species_names"]) + species_ids[normalize(species)]] = score
+
+    if previous_builds:
+        team_names = plan["team_names"]
+        first_pokemon = plan["leg_pokemon"][plan["leg_offsets"][:-1]]
+        winners = {(leader, team_name) for leader, species_builds in previous_builds.items() for team_name in species_builds.values()}
+        for gauntlet in range(len(groups)):
+            if (plan["leader_names"][plan["gauntlet_leader"][gauntlet]], team_names[first_pokemon[gauntlet]]) in winners:
+                expected[gauntlet] = 1 + group_prior[groups[gauntlet]]
+    return expected, group_prior[groups]
+
+def prior_order(plan, gauntlets, expected, group_prior):
+    """
+    Order gauntlets so each group's most promising build runs first.
+
+    :param gauntlets: Gauntlet ids to order.
+    :return: List of the gauntlet ids, by rank within their group, then by group prior, then by id.
+    """
+    gauntlets = np.asarray(list(gauntlets), dtype=np.int64)
+    if len(gauntlets) == 0:
+        return []
+    groups = gauntlet_groups(plan)[gauntlets]
+    # rank of each gauntlet within its group, best first
+    by_group = np.lexsort((gauntlets, -expected[gauntlets], groups))
+    starts = np.flatnonzero(np.r_[True, groups[by_group][1:] != groups[by_group][:-1]])
+    rank = np.empty(len(gauntlets), dtype=np.int64)
+    rank[by_group] = np.arange(len(gauntlets)) - np.repeat(starts, np.diff(np.r_[starts, len(gauntlets)]))
+    return gauntlets[np.lexsort((gauntlets, -group_prior[gauntlets], rank))].tolist()
+
+def savings_report(plan, queued, started, sweepers, battles_run):
+    """
+    Print an estimate of the gauntlets and battles the order saved over a random order.
+
+    For every group that was swept, a random order of its n queued gauntlets with m builds that sweep
+    runs (n + 1) / (m + 1) of them before the first sweep, on average. Gauntlets cancelled before they
+    ran might have swept too, so m is only known to be between the number of builds seen sweeping and
+    that share of the group's started gauntlets extrapolated to all n, and the saving is given as a range.
+
+    :param queued: Gauntlet ids queued at the start of the run.
+    :param started: Gauntlet ids that were started.
+    :param sweepers: Gauntlet ids that scored 1.
+    :param battles_run: Battles the run took, to turn gauntlets into battles.
+    """
+    groups = gauntlet_groups(plan)
+    queued_count = np.bincount(groups[list(queued)], minlength=len(plan["leader_names"]) * len(plan["species_names"]))
+    started_count = np.bincount(groups[list(started)], minlength=len(queued_count)) if len(started) else np.zeros_like(queued_count)
+    sweeper_count = np.bincount(groups[list(sweepers)], minlength=len(queued_count)) if len(sweepers) else np.zeros_like(queued_count)
+    swept = sweeper_count > 0
+    if not swept.any():
+        print("No leader/species was swept, the order saved nothing")
+        return
+    queued_count, started_count, sweeper_count = queued_count[swept], started_count[swept], sweeper_count[swept]
+    most_random = ((queued_count + 1) / (sweeper_count + 1)).sum()
+    least_random = ((queued_count + 1) / (queued_count * sweeper_count / started_count + 1)).sum()
+    battles_per_gauntlet = battles_run / len(started)
+    ran = started_count.sum()
+    print(f"{int(swept.sum())} leader/species swept after {ran} of their gauntlets, a random order would take about "
+          f"{least_random:.0f} to {most_random:.0f}: {least_random - ran:.0f} to {most_random - ran:.0f} gauntlets "
+          f"({(least_random - ran) * battles_per_gauntlet:.0f} to {(most_random - ran) * battles_per_gauntlet:.0f} battles) saved")